@@ -0,0 +1,6 @@
+"""Remove the files that the generated plugin doesn't need."""
+
+from pathlib import Path
+
+if "{{ cookiecutter.include_keystroke_monitor }}" != "y":
+    Path("debounce.py").unlink()
@@ -2,6 +2,9 @@
 
 from pathlib import Path
 from typing import List, Dict
+{%- if cookiecutter.include_keystroke_monitor == 'y' %}
+import importlib.util
+{%- endif %}
 import os
 import shutil
 import subprocess
@@ -56,32 +59,17 @@ class FileBackedVar:
             return f.write(str(val))
 {%- endif %}
 {%- if cookiecutter.include_keystroke_monitor == 'y' %}
-# KeystrokeMonitor class ----------------------------------------------------------------------
-class KeystrokeMonitor:
-    def __init__(self):
-        super(KeystrokeMonitor, self)
-        self.thres = 0.3  # s
-        self.prev_time = time.time()
-        self.curr_time = time.time()
-
-    def report(self):
-        self.prev_time = time.time()
-        self.curr_time = time.time()
-        self.report = self.report_after_first
-
-    def report_after_first(self):
-        # update prev, curr time
-        self.prev_time = self.curr_time
-        self.curr_time = time.time()
-
-    def triggered(self) -> bool:
-        return self.curr_time - self.prev_time > self.thres
-
-    def reset(self) -> None:
-        self.report = self.report_after_first
+# debouncing ----------------------------------------------------------------------------------
+# load debounce module - from the same directory as this file
+dir_ = Path(__file__).absolute().parent
+spec = importlib.util.spec_from_file_location("debounce", dir_ / "debounce.py")
+if spec == None:
+    raise RuntimeError("Couldn't find debounce.py in current dir.")
+debounce = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(debounce)  # type: ignore
 
 # Do not flood the web server with queries, otherwise it may block your IP.
-keys_monitor = KeystrokeMonitor()
+debouncer = debounce.Debouncer(init_delay=0.3, state_path=cache_path / "debounce")
 {%- endif %}
 
 # plugin main functions -----------------------------------------------------------------------
@@ -94,7 +82,12 @@ def initialize():
 
 
 def finalize():
+{%- if cookiecutter.include_keystroke_monitor == 'y' %}
+    v0.info(f"{__title__} - {debouncer.stats}")
+    debouncer.save()
+{%- else %}
     pass
+{%- endif %}
 
 
 def handleQuery(query) -> list:
@@ -113,11 +106,10 @@ def handleQuery(query) -> list:
 
 {%- if cookiecutter.include_keystroke_monitor == 'y' %}
             if len(query_str) < 2:
-                keys_monitor.reset()
+                debouncer.cancel()
                 return results
 
-            keys_monitor.report()
-            if keys_monitor.triggered():
+            if debouncer.wait(query):
                 # modify this...
                 results.append(get_as_item())
 {%- else %}
@@ -0,0 +1,146 @@
+"""Adaptive keystroke debouncing for plugins that hit rate-limited web services.
+
+Albert calls ``handleQuery`` on every keypress. Plugins that send a web request per query
+should only do so once the user has stopped typing. The :class:`Debouncer` learns the
+user's typing cadence, makes every query wait for a pause proportional to that cadence and
+lets only the latest query through - i.e., it issues the trailing request once typing stops
+and drops the superseded ones.
+
+This file is shared verbatim between several plugins and the cookiecutter template - keep
+the copies in sync.
+"""
+
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+
+class DebounceStats:
+    """Requests sent vs requests avoided by a :class:`Debouncer`."""
+
+    def __init__(self):
+        self.sent = 0
+        self.avoided = 0
+
+    @property
+    def total(self) -> int:
+        return self.sent + self.avoided
+
+    @property
+    def avoided_ratio(self) -> float:
+        """Fraction of the queries that didn't result in a request."""
+        return self.avoided / self.total if self.total else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"requests sent: {self.sent}, avoided: {self.avoided}"
+            f" ({self.avoided_ratio:.0%} of {self.total})"
+        )
+
+
+class Debouncer:
+    """Let a query through only after the user has paused typing.
+
+    The delay is ``factor`` times the exponential moving average of the intervals between
+    consecutive keystrokes, clamped to ``[min_delay, max_delay]``. Intervals longer than
+    ``burst_gap`` are pauses, not typing, and don't contribute to the average.
+
+    If ``state_path`` is given, the learnt cadence is loaded from it on construction and
+    written back with :meth:`save`, so that it persists across albert sessions.
+
+    >>> d = Debouncer(init_delay=0.3, min_delay=0.1, max_delay=1.0, factor=2.0)
+    >>> round(d.delay, 2)
+    0.3
+    >>> d._learn(0.1)
+    >>> round(d.delay, 2)
+    0.28
+    >>> d._learn(5.0)  # a pause, ignored
+    >>> round(d.delay, 2)
+    0.28
+    """
+
+    def __init__(
+        self,
+        *,
+        init_delay: float = 0.4,
+        min_delay: float = 0.15,
+        max_delay: float = 1.0,
+        factor: float = 2.0,
+        alpha: float = 0.2,
+        burst_gap: float = 1.5,
+        poll_interval: float = 0.01,
+        state_path: Optional[Path] = None,
+    ):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.alpha = alpha
+        self.burst_gap = burst_gap
+        self.poll_interval = poll_interval
+        self.state_path = state_path
+        self.stats = DebounceStats()
+
+        self._cadence = init_delay / factor
+        self._last_keystroke: Optional[float] = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+        if state_path is not None and state_path.is_file():
+            try:
+                self._cadence = float(state_path.read_text().strip())
+            except ValueError:
+                pass
+
+    @property
+    def delay(self) -> float:
+        """Time that typing has to pause for, before a query is let through."""
+        return min(max(self._cadence * self.factor, self.min_delay), self.max_delay)
+
+    def _learn(self, interval: float) -> None:
+        if interval > self.burst_gap:
+            return
+
+        self._cadence = (1 - self.alpha) * self._cadence + self.alpha * interval
+
+    def wait(self, query=None) -> bool:
+        """Report a keystroke and block until the user pauses typing.
+
+        Return True if the caller should go ahead and send its request, False if a newer
+        keystroke - or the invalidation of the given albert ``query`` - superseded it.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._last_keystroke is not None:
+                self._learn(now - self._last_keystroke)
+            self._last_keystroke = now
+            self._generation += 1
+            generation = self._generation
+            deadline = now + self.delay
+
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            if generation != self._generation or (query is not None and not query.isValid):
+                with self._lock:
+                    self.stats.avoided += 1
+                return False
+
+        with self._lock:
+            if generation != self._generation:
+                self.stats.avoided += 1
+                return False
+
+            self.stats.sent += 1
+            return True
+
+    def cancel(self) -> None:
+        """Drop any pending query, e.g., when the query string became too short."""
+        with self._lock:
+            self._generation += 1
+
+    def save(self) -> None:
+        """Persist the learnt typing cadence to ``state_path``."""
+        if self.state_path is None:
+            return
+
+        self.state_path.write_text(f"{self._cadence}\n")
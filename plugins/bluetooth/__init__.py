@@ -1,10 +1,11 @@
 """Interact with the Linux bluetooth resources."""
 
+import functools
+import importlib.util
 import subprocess
-import threading
 import traceback
 from pathlib import Path
-from typing import List, Mapping, MutableMapping, Optional, Sequence
+from typing import Optional, Sequence, Tuple
 
 import gi
 
@@ -29,53 +30,83 @@ cache_path = Path(cacheLocation()) / "bluetooth"
 config_path = Path(configLocation()) / "bluetooth"
 data_path = Path(dataLocation()) / "bluetooth"
 
-workers: List[threading.Thread] = []
+op_labels = {
+    "trust": "Trusting",
+    "pair": "Pairing",
+    "connect": "Connecting",
+    "disconnect": "Disconnecting",
+}
 
+# how long to show the finished operations for [s]
+op_history_age = 60.0
 
-class BlDevice:
-    """Represent a single bluetooth device."""
 
-    def __init__(self, mac_address: str, name: str):
-        self.mac_address = mac_address
-        self.name = name
+def load_module(name: str):
+    """Load a module from the same directory as this file."""
+    dir_ = Path(__file__).absolute().parent
+    spec = importlib.util.spec_from_file_location(name, dir_ / f"{name}.py")
+    if spec == None:
+        raise RuntimeError(f"Couldn't find {name}.py in current dir.")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+bluez = load_module("bluez")
+opqueue = load_module("opqueue")
 
-        d = self._parse_info()
-        self.is_paired = d["Paired"] == "yes"
-        self.is_trusted = d["Trusted"] == "yes"
-        self.is_blocked = d["Blocked"] == "yes"
-        self.is_connected = d["Connected"] == "yes"
-        self.icon = d.get("Icon", icon_path)
+# devices and their properties - kept up to date over D-Bus
+bluez_state = bluez.BluezState()
 
-    def _parse_info(self) -> Mapping[str, str]:
-        proc = bl_cmd(["info", self.mac_address])
-        lines = [li.decode("utf-8").strip() for li in proc.stdout.splitlines()][1:]
-        d: MutableMapping[str, str] = {}
-        for li in lines:
-            try:
-                key, val = li.split(": ")
-            except ValueError:
-                # ill-formatted key
-                continue
 
-            d[key] = val
+class BlDevice:
+    """Represent a single bluetooth device."""
 
-        return d
+    def __init__(
+        self,
+        mac_address: str,
+        name: str,
+        is_paired: bool = False,
+        is_trusted: bool = False,
+        is_blocked: bool = False,
+        is_connected: bool = False,
+        icon: str = "",
+    ):
+        self.mac_address = mac_address
+        self.name = name
+        self.is_paired = is_paired
+        self.is_trusted = is_trusted
+        self.is_blocked = is_blocked
+        self.is_connected = is_connected
+        self.icon = icon or icon_path
+
+    @classmethod
+    def from_bluez(cls, device) -> "BlDevice":
+        return cls(
+            mac_address=device.address,
+            name=device.name,
+            is_paired=device.paired,
+            is_trusted=device.trusted,
+            is_blocked=device.blocked,
+            is_connected=device.connected,
+            icon=device.icon,
+        )
 
     def trust(self) -> None:
         """Trust a device."""
-        async_bl_cmd(["trust", self.mac_address])
+        async_bl_cmd(["trust", self.mac_address], label=self.name)
 
     def pair(self) -> None:
         """Pair with a device."""
-        async_bl_cmd(["pair", self.mac_address])
+        async_bl_cmd(["pair", self.mac_address], label=self.name)
 
     def connect(self) -> None:
         """Conect to a device."""
-        async_bl_cmd(["connect", self.mac_address])
+        async_bl_cmd(["connect", self.mac_address], label=self.name)
 
     def disconnect(self) -> None:
         """Disconnect an already connected device."""
-        async_bl_cmd(["disconnect", self.mac_address])
+        async_bl_cmd(["disconnect", self.mac_address], label=self.name)
 
 
 class ClipAction(Action):
@@ -103,8 +134,10 @@ class Plugin(QueryHandler):
         for p in (cache_path, config_path, data_path):
             p.mkdir(parents=False, exist_ok=True)
 
+        bluez_state.start()
+
     def finalize(self):
-        pass
+        bluez_state.stop()
 
     def defaultTrigger(self):
         return "bl "
@@ -115,11 +148,43 @@ class Plugin(QueryHandler):
 
         results = []
 
-        # join any previously launched threads
-        for i in range(len(workers)):
-            workers.pop(i).join(2)
-
         try:
+            if not bluez_state.ready.is_set():
+                results.append(
+                    Item(
+                        id=self.name(),
+                        icon=[icon_path],
+                        text="Loading bluetooth devices...",
+                        completion=self.defaultTrigger(),
+                        actions=[],
+                    )
+                )
+            elif bluez_state.error is not None:
+                results.append(
+                    Item(
+                        id=self.name(),
+                        icon=[icon_error_path],
+                        text="Couldn't talk to the bluetooth daemon over D-Bus",
+                        subtext=bluez_state.error,
+                        completion=self.defaultTrigger(),
+                        actions=[],
+                    )
+                )
+            elif bluez_state.powered() is False:
+                # there are adapters, but none of them is on
+                results.append(
+                    self.get_shell_cmd_as_item(
+                        text="Bluetooth adapter is powered off - power it on",
+                        command="bluetoothctl power on",
+                    )
+                )
+
+            # running, queued and recently finished operations
+            results.extend(self.get_op_as_item(op) for op in op_queue.all_pending())
+            results.extend(
+                self.get_op_as_item(op) for op in op_queue.history(max_age=op_history_age)
+            )
+
             # List all available device
             results.extend(self.get_device_as_item(dev) for dev in list_avail_devices())
 
@@ -137,6 +202,8 @@ class Plugin(QueryHandler):
                 )
             )
 
+            query.add(results)
+
         except Exception:  # user to report error
             critical(traceback.format_exc())
             query.add(Item(
@@ -154,6 +221,11 @@ class Plugin(QueryHandler):
 
     def get_device_as_item(self, dev: BlDevice):
         text = dev.name
+        pending = op_queue.pending(dev.mac_address)
+        if pending:
+            text = f"{text} - {op_labels.get(pending[0].name, pending[0].name)}..."
+            if len(pending) > 1:
+                text += f" (+{len(pending) - 1} queued)"
         subtext = (
             f"pair: {dev.is_paired} | "
             f"connect: {dev.is_connected} | "
@@ -182,6 +254,24 @@ class Plugin(QueryHandler):
             actions=actions,
         )
 
+    def get_op_as_item(self, op):
+        """Return an operation as an item - its state and how long it's taken so far."""
+        text = f"{op_labels.get(op.name, op.name)} {op.label}"
+        if op.is_pending:
+            text += "..."
+        subtext = f"{op.state} | {op.latency:.1f}s | mac: {op.mac_address}"
+        if op.message:
+            subtext += f" | {op.message}"
+
+        return Item(
+            id=self.name(),
+            icon=[icon_error_path if op.message else icon_path],
+            text=text,
+            subtext=subtext,
+            completion=self.defaultTrigger(),
+            actions=[ClipAction("Copy device's MAC address", op.mac_address)],
+        )
+
     def get_shell_cmd_as_item(self, *, text: str, command: str):
         """Return shell command as an item - ready to be appended to the items list and be rendered by Albert."""
 
@@ -220,33 +310,53 @@ def notify(
     n.show()
 
 
-def async_bl_cmd(cmd: Sequence[str]):
+def run_op(op, timeout: float) -> str:
+    """Run an operation via bluetoothctl - return its error message, empty on success."""
+    try:
+        proc = subprocess.run(
+            ["bluetoothctl", op.name, op.mac_address], capture_output=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired as e:
+        raise TimeoutError from e
+
+    if proc.returncode == 0:
+        return ""
+
+    msg = f"exit code {proc.returncode}"
+    stdout = proc.stdout.decode("utf-8").strip()
+    stderr = proc.stderr.decode("utf-8").strip()
+    if stdout:
+        msg += f"\n\nSTDOUT:\n\n{stdout}"
+    if stderr:
+        msg += f"\n\nSTDERR:\n\n{stderr}"
+    return msg
+
+
+def notify_op_done(op):
+    if op.state == opqueue.Operation.DONE:
+        notify(msg=f"{op.name} {op.label} - done in {op.latency:.1f}s")
+    else:
+        notify(msg=f"{op.name} {op.label} - {op.state}: {op.message}", image=icon_error_path)
+
+
+# operations on the devices - serialized per device, run in the background
+op_queue = opqueue.OperationQueue(run=run_op, on_done=notify_op_done)
+
+
+def async_bl_cmd(cmd: Sequence[str], label: str = ""):
     """
     Run a bluetoothctl-wrapped command in the background.
 
-    Inform about the result using system nofications.
+    The command is queued behind the rest of the commands for the same device - repeated
+    commands are dropped. Inform about the result using system nofications.
     """
-
-    def _async_bl_cmd():
-        info("Running async bluetoothctl command - {cmd}")
-        proc = bl_cmd(cmd=cmd)
-        if proc.returncode == 0:
-            notify(
-                msg=f"Command {cmd} exited successfully.",
-            )
-        else:
-            msg = f"Command {cmd} failed - " f"{proc.returncode}"
-            stdout = proc.stdout.decode("utf-8").strip()
-            stderr = proc.stderr.decode("utf-8").strip()
-            if stdout:
-                msg += f"\n\nSTDOUT:\n\n{proc.stdout}"
-            if stderr:
-                msg += f"\n\nSTDERR:\n\n{proc.stderr}"
-            notify(msg=msg, image=icon_error_path)
-
-    t = threading.Thread(target=_async_bl_cmd)
-    t.start()
-    workers.append(t)
+    op_name, mac_address = cmd[0], cmd[-1]
+    info(f"Queueing async bluetoothctl command - {cmd}")
+    if op_queue.submit(mac_address, op_name, label) is None:
+        notify(
+            msg=f"Command {cmd} dropped - already queued or too many queued commands",
+            image=icon_error_path,
+        )
 
 
 # BlDevice class ------------------------------------------------------------------------------
@@ -255,24 +365,22 @@ def bl_cmd(cmd: Sequence[str], check: bool = False) -> subprocess.CompletedProce
     return subprocess.run(["bluetoothctl", *cmd], check=check, capture_output=True)
 
 
-def _bl_devices_cmd(cmd: Sequence[str]) -> Sequence[BlDevice]:
-    """Run a command via bluetoothct and parse assuming it returns a Device-per-line output."""
-    proc = bl_cmd(cmd)
-    lines = [li.decode("utf-8").strip() for li in proc.stdout.splitlines()]
-    bl_devices = []
-    for li in lines:
-        tokens = li.strip().split()
-        bl_devices.append(BlDevice(mac_address=tokens[1], name=tokens[2]))
-
-    return bl_devices
+def list_paired_devices() -> Sequence[BlDevice]:
+    return [dev for dev in list_avail_devices() if dev.is_paired]
 
 
-def list_paired_devices() -> Sequence[BlDevice]:
-    return _bl_devices_cmd(["paired-devices"])
+# last snapshot of the bluez state, along with its devices
+_devices_cache: Tuple[Optional[list], Sequence[BlDevice]] = (None, ())
 
 
 def list_avail_devices() -> Sequence[BlDevice]:
-    return _bl_devices_cmd(["devices"])
+    """Devices of the current bluez snapshot - rebuilt only if the snapshot changed."""
+    global _devices_cache
+    snapshot = bluez_state.devices()
+    if _devices_cache[0] is not snapshot:
+        _devices_cache = (snapshot, [BlDevice.from_bluez(dev) for dev in snapshot])
+
+    return _devices_cache[1]
 
 
 # supplementary functions ---------------------------------------------------------------------
@@ -310,6 +418,7 @@ def load_data(data_name) -> str:
     return data
 
 
+@functools.lru_cache(maxsize=None)
 def lookup_icon(icon_name: str) -> Optional[str]:
     icons = list(Path(__file__).parent.glob("*.png"))
 
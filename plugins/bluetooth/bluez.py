@@ -0,0 +1,242 @@
+"""State of the BlueZ devices, kept in memory and up to date over D-Bus.
+
+A single connection to the system bus is kept open for the lifetime of the plugin. All the
+objects of BlueZ are fetched once (ObjectManager.GetManagedObjects) and then kept up to date
+from the InterfacesAdded/InterfacesRemoved and PropertiesChanged signals - reading the
+state never spawns a process nor waits on D-Bus.
+
+The signals are dispatched by a GLib main loop of its own, in a background thread. The same
+thread re-fetches all the objects whenever BlueZ (re)appears on the bus and, as a safety net,
+every :data:`resync_interval` seconds.
+"""
+
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from gi.repository import Gio, GLib  # type: ignore
+
+BUS_NAME = "org.bluez"
+ADAPTER_IFACE = "org.bluez.Adapter1"
+DEVICE_IFACE = "org.bluez.Device1"
+OBJECT_MANAGER_IFACE = "org.freedesktop.DBus.ObjectManager"
+PROPERTIES_IFACE = "org.freedesktop.DBus.Properties"
+DBUS_NAME = "org.freedesktop.DBus"
+DBUS_IFACE = "org.freedesktop.DBus"
+
+# period of the full re-fetches of the state [s]
+resync_interval = 60
+
+Properties = Dict[str, Any]
+
+
+class Device(NamedTuple):
+    """Snapshot of the properties of a device."""
+
+    path: str
+    address: str
+    name: str
+    paired: bool
+    trusted: bool
+    blocked: bool
+    connected: bool
+    icon: str
+
+    @classmethod
+    def from_properties(cls, path: str, props: Properties) -> "Device":
+        address = props.get("Address", "")
+        return cls(
+            path=path,
+            address=address,
+            name=props.get("Alias") or props.get("Name") or address,
+            paired=bool(props.get("Paired", False)),
+            trusted=bool(props.get("Trusted", False)),
+            blocked=bool(props.get("Blocked", False)),
+            connected=bool(props.get("Connected", False)),
+            icon=props.get("Icon", ""),
+        )
+
+
+class BluezState:
+    """Devices and adapters of BlueZ - call :meth:`start` first.
+
+    If the system bus or BlueZ are not reachable, :attr:`error` says why. :attr:`ready` is set
+    once the state is first fetched - or failed to.
+    """
+
+    def __init__(self):
+        # object path -> interface -> properties
+        self._objects: Dict[str, Dict[str, Properties]] = {}
+        self._devices: Optional[List[Device]] = []
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[], None]] = []
+
+        self._thread: Optional[threading.Thread] = None
+        self._context: Optional[GLib.MainContext] = None
+        self._loop: Optional[GLib.MainLoop] = None
+        self._bus: Optional[Gio.DBusConnection] = None
+
+        self.ready = threading.Event()
+        self.error: Optional[str] = None
+
+    # lifetime ------------------------------------------------------------------------------
+    def start(self):
+        self.ready.clear()
+        self.error = None
+        self._context = GLib.MainContext.new()
+        self._loop = GLib.MainLoop.new(self._context, False)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._context is not None and self._loop is not None:
+            # quit from within the loop - works even if it's not running yet
+            loop = self._loop
+            source = GLib.idle_source_new()
+            source.set_callback(lambda *_: loop.quit() or False)
+            source.attach(self._context)
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def add_listener(self, fn: Callable[[], None]):
+        """Call ``fn`` from the D-Bus thread whenever the state changes."""
+        self._listeners.append(fn)
+
+    def _run(self):
+        context, loop = self._context, self._loop
+        context.push_thread_default()
+        subscriptions: List[int] = []
+        try:
+            self._bus = Gio.bus_get_sync(Gio.BusType.SYSTEM, None)
+        except GLib.Error as e:
+            self.error = e.message
+            self.ready.set()
+            context.pop_thread_default()
+            return
+
+        try:
+            # subscribe before fetching the objects - so that no change is lost in between
+            for sender, interface, member, arg0, callback in (
+                (BUS_NAME, OBJECT_MANAGER_IFACE, "InterfacesAdded", None, self._on_added),
+                (BUS_NAME, OBJECT_MANAGER_IFACE, "InterfacesRemoved", None, self._on_removed),
+                (BUS_NAME, PROPERTIES_IFACE, "PropertiesChanged", None, self._on_changed),
+                (DBUS_NAME, DBUS_IFACE, "NameOwnerChanged", BUS_NAME, self._on_owner_changed),
+            ):
+                subscriptions.append(
+                    self._bus.signal_subscribe(
+                        sender,
+                        interface,
+                        member,
+                        None,
+                        arg0,
+                        Gio.DBusSignalFlags.NONE,
+                        callback,
+                    )
+                )
+
+            self._resync()
+            self.ready.set()
+
+            timer = GLib.timeout_source_new_seconds(resync_interval)
+            timer.set_callback(lambda *_: self._resync() or True)
+            timer.attach(context)
+
+            loop.run()
+            timer.destroy()
+        finally:
+            for subscription in subscriptions:
+                self._bus.signal_unsubscribe(subscription)
+            context.pop_thread_default()
+
+    def _resync(self):
+        """Fetch all the objects of BlueZ again."""
+        assert self._bus is not None
+        try:
+            reply = self._bus.call_sync(
+                BUS_NAME,
+                "/",
+                OBJECT_MANAGER_IFACE,
+                "GetManagedObjects",
+                None,
+                GLib.VariantType.new("(a{oa{sa{sv}}})"),
+                Gio.DBusCallFlags.NONE,
+                -1,
+                None,
+            )
+            objects, self.error = reply.unpack()[0], None
+        except GLib.Error as e:
+            # e.g., BlueZ is not running - yet
+            objects, self.error = {}, e.message
+
+        with self._lock:
+            self._objects = objects
+        self._notify()
+
+    # signal handlers -----------------------------------------------------------------------
+    def _on_owner_changed(self, _conn, _sender, _path, _iface, _signal, params):
+        # BlueZ started, stopped or restarted
+        self._resync()
+
+    def _on_added(self, _conn, _sender, _path, _iface, _signal, params):
+        path, interfaces = params.unpack()
+        with self._lock:
+            self._objects.setdefault(path, {}).update(interfaces)
+        self._notify()
+
+    def _on_removed(self, _conn, _sender, _path, _iface, _signal, params):
+        path, interfaces = params.unpack()
+        with self._lock:
+            obj = self._objects.get(path, {})
+            for interface in interfaces:
+                obj.pop(interface, None)
+            if not obj:
+                self._objects.pop(path, None)
+        self._notify()
+
+    def _on_changed(self, _conn, _sender, path, _iface, _signal, params):
+        interface, changed, invalidated = params.unpack()
+        with self._lock:
+            obj = self._objects.get(path)
+            if obj is None or interface not in obj:
+                return
+            props = obj[interface]
+            props.update(changed)
+            for name in invalidated:
+                props.pop(name, None)
+        self._notify()
+
+    def _notify(self):
+        with self._lock:
+            self._devices = None
+        for fn in self._listeners:
+            fn()
+
+    # queries -------------------------------------------------------------------------------
+    def devices(self) -> List[Device]:
+        """Snapshot of all the known devices, sorted by name.
+
+        The same list is returned until the state changes - don't modify it.
+        """
+        with self._lock:
+            if self._devices is None:
+                devices = [
+                    Device.from_properties(path, interfaces[DEVICE_IFACE])
+                    for path, interfaces in self._objects.items()
+                    if DEVICE_IFACE in interfaces
+                ]
+                self._devices = sorted(devices, key=lambda d: (d.name.lower(), d.address))
+            return self._devices
+
+    def powered(self) -> Optional[bool]:
+        """Whether any of the adapters is powered on - None if there are no adapters."""
+        with self._lock:
+            adapters = [
+                interfaces[ADAPTER_IFACE]
+                for interfaces in self._objects.values()
+                if ADAPTER_IFACE in interfaces
+            ]
+
+        if not adapters:
+            return None
+
+        return any(bool(a.get("Powered", False)) for a in adapters)
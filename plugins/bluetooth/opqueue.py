@@ -0,0 +1,157 @@
+"""Queue of the operations on the bluetooth devices.
+
+Each device - MAC address - gets a queue of its own, run by a thread of its own while there
+is anything queued. Operations on the same device run one after the other, operations on
+different devices run in parallel. A click that asks for an operation that's already queued
+or running for the same device is dropped, as is anything beyond :data:`max_per_device`
+queued operations. Every operation is given up on after :data:`op_timeout` seconds.
+
+Finished operations are kept around for a while, along with how long they took.
+"""
+
+import collections
+import threading
+import time
+from typing import Callable, Deque, Dict, List, Optional
+
+# maximum number of queued - not yet running - operations per device
+max_per_device = 3
+# how long an operation can run for [s]
+op_timeout = 30.0
+# how many finished operations to remember
+history_size = 10
+
+
+class Operation:
+    """A single operation - e.g., connect - on a device."""
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    TIMED_OUT = "timed out"
+
+    def __init__(self, mac_address: str, name: str, label: str = ""):
+        self.mac_address = mac_address
+        self.name = name
+        # e.g., the name of the device
+        self.label = label or mac_address
+        self.state = Operation.QUEUED
+        self.message = ""
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def is_pending(self) -> bool:
+        return self.state in (Operation.QUEUED, Operation.RUNNING)
+
+    @property
+    def latency(self) -> float:
+        """Seconds since the operation was submitted - until it finished, if it did."""
+        end = self.finished_at if self.finished_at is not None else time.monotonic()
+        return end - self.submitted_at
+
+    def __repr__(self) -> str:
+        return f"Operation({self.name} {self.mac_address}, {self.state})"
+
+
+class OperationQueue:
+    """Per-device queues of operations - see the module docstring.
+
+    ``run`` carries out an operation - it's given the operation and the timeout and returns
+    an error message, empty on success. It should raise TimeoutError if it timed out.
+    ``on_done`` is called with every finished operation.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[Operation, float], str],
+        on_done: Callable[[Operation], None] = lambda op: None,
+    ):
+        self._run = run
+        self._on_done = on_done
+        self._queues: Dict[str, Deque[Operation]] = {}
+        self._running: Dict[str, Operation] = {}
+        self._history: Deque[Operation] = collections.deque(maxlen=history_size)
+        self._lock = threading.Lock()
+
+    def submit(self, mac_address: str, name: str, label: str = "") -> Optional[Operation]:
+        """Queue an operation - return None if it's dropped."""
+        with self._lock:
+            queue = self._queues.setdefault(mac_address, collections.deque())
+            running = self._running.get(mac_address)
+            if any(op.name == name for op in queue) or (
+                running is not None and running.name == name
+            ):
+                return None
+            if len(queue) - (running is not None) >= max_per_device:
+                return None
+
+            op = Operation(mac_address, name, label)
+            queue.append(op)
+            if running is None:
+                # nothing runs for this device - start its worker
+                self._running[mac_address] = queue[0]
+                threading.Thread(target=self._work, args=(mac_address,), daemon=True).start()
+
+        return op
+
+    def pending(self, mac_address: str) -> List[Operation]:
+        """The running and the queued operations of the device, in order."""
+        with self._lock:
+            running = self._running.get(mac_address)
+            queued = [op for op in self._queues.get(mac_address, ()) if op is not running]
+            return ([running] if running is not None else []) + queued
+
+    def all_pending(self) -> List[Operation]:
+        with self._lock:
+            ops = [op for queue in self._queues.values() for op in queue]
+        return sorted(ops, key=lambda op: op.submitted_at)
+
+    def history(self, max_age: Optional[float] = None) -> List[Operation]:
+        """Finished operations - most recent first - optionally only the recent ones."""
+        now = time.monotonic()
+        with self._lock:
+            ops = list(self._history)
+        return [
+            op
+            for op in reversed(ops)
+            if max_age is None or now - (op.finished_at or now) <= max_age
+        ]
+
+    def _work(self, mac_address: str):
+        while True:
+            with self._lock:
+                queue = self._queues[mac_address]
+                op = queue[0]
+                self._running[mac_address] = op
+                op.state = Operation.RUNNING
+                op.started_at = time.monotonic()
+
+            try:
+                op.message = self._run(op, op_timeout)
+                op.state = Operation.FAILED if op.message else Operation.DONE
+            except TimeoutError:
+                op.state = Operation.TIMED_OUT
+                op.message = f"Timed out after {op_timeout:.0f}s"
+            except Exception as e:
+                op.state = Operation.FAILED
+                op.message = str(e)
+            op.finished_at = time.monotonic()
+
+            with self._lock:
+                queue.popleft()
+                self._history.append(op)
+                # the finished operation mustn't be reported as pending - nor deduplicated
+                # against - while this worker moves on to the next one or exits
+                done = not queue
+                if done:
+                    del self._queues[mac_address]
+                    self._running.pop(mac_address, None)
+                else:
+                    self._running[mac_address] = queue[0]
+
+            self._on_done(op)
+            if done:
+                return
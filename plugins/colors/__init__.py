@@ -1,20 +1,19 @@
 """Visualise color codes."""
 
 # TODO on color selection show
-#   RGB
 #   YCMK
-#   HSL
-#   Similar colors
 
+import importlib.util
+import re
+import threading
+import time
 import traceback
 from pathlib import Path
 from typing import Optional
 
-import matplotlib.pyplot as plt
 import numpy as np
 
 import colour
-from colour import Color
 from fuzzywuzzy import process
 import albert as v0
 
@@ -31,71 +30,159 @@ cache_path = Path(v0.cacheLocation()) / "colors"
 config_path = Path(v0.configLocation()) / "colors"
 data_path = Path(v0.dataLocation()) / "colors"
 
-color_names = colour.COLOR_NAME_TO_RGB.keys()
-h_values = [Color(c).get_hex() for c in color_names]
-color_names_and_hex = list(color_names) + h_values
-h_to_color_name = {h: c for h, c in zip(h_values, color_names)}
+# load colorindex module - from the same directory as this file
+dir_ = Path(__file__).absolute().parent
+spec = importlib.util.spec_from_file_location("colorindex", dir_ / "colorindex.py")
+if spec == None:
+    raise RuntimeError("Couldn't find colorindex.py in current dir.")
+colorindex = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(colorindex)  # type: ignore
+
+# table of the named colors - loaded from the cache in initialize()
+color_index = None
+
+# load thumbnails module - from the same directory as this file
+spec = importlib.util.spec_from_file_location("thumbnails", dir_ / "thumbnails.py")
+if spec == None:
+    raise RuntimeError("Couldn't find thumbnails.py in current dir.")
+thumbnails = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(thumbnails)  # type: ignore
+
+nearest_colors_count = 5
+
+# palette mode - e.g., "pal red", "pal #336699 to white in 5"
+palette_prefix = "pal "
+palette_re = re.compile(
+    r"^(?P<seed>.+?)(?:\s+to\s+(?P<target>.+?))?(?:\s+in\s+(?P<steps>\d+))?$", re.IGNORECASE
+)
+default_gradient_steps = 10
+min_gradient_steps = 2
+max_gradient_steps = 20
 
 
 # supplementary functions ---------------------------------------------------------------------
-def get_color_thumbnail(color: Color) -> Path:
+def get_color_thumbnail(hex_l: str) -> Path:
     """
     Retrieve the thumbnail of the given color. The output name will be the corresponding hex
     strings. If the corresponding file does not exist, it will create it.
     """
+    return thumbnails.write_thumbnail(data_path, hex_l)
 
-    fname = data_path / (str(color.get_hex_l()[1:]) + ".png")
-    if fname.exists():
-        if fname.is_file():
-            return fname
-        else:
-            raise FileNotFoundError(f"Thumbnail file exists but it's not a file -> {fname}")
 
-    # file not there - cache it
-    thumbnail_size = (50, 50)
-    rgb_triad = np.array([c * 255 for c in color.get_rgb()], dtype=np.uint8)
-    mat = np.zeros((*thumbnail_size, 3), dtype=np.uint8) + rgb_triad
+def pregenerate_thumbnails():
+    """Generate the thumbnails of all the named colors - meant to run in the background."""
+    t = time.time()
+    thumbnails.write_thumbnails(data_path, color_index.hex)
+    v0.debug(f"Generated the named color thumbnails - Took {time.time() - t} seconds")
 
-    plt.imsave(fname, mat)
-    return fname
 
+def get_as_item(record, distance: Optional[float] = None, label: str = ""):
+    """Return an item - ready to be appended to the items list and be rendered by Albert.
 
-def get_as_item(color):
-    """Return an item - ready to be appended to the items list and be rendered by Albert."""
-    img_path = str(get_color_thumbnail(color))
+    :param record: colorindex.ColorRecord of the color to show
+    :param distance: Perceptual distance to the color that the user asked for, if any
+    :param label: Prepended to the subtext, e.g., the role of the color in a palette
+    """
+    hl = record.hex
+    img_path = str(get_color_thumbnail(hl))
 
-    rgb = [int(i * 255) for i in color.get_rgb()]
-    hl = color.get_hex_l()
-    if hl in h_to_color_name:
-        name = f" | {h_to_color_name[hl]}"
-    else:
-        name = ""
+    name = record.name
+    if not name:
+        named_id = color_index.find_hex(hl)
+        if named_id is not None:
+            name = color_index.names[named_id]
 
+    rgb = list(record.rgb)
+    hsl = f"hsl({record.hsl[0] * 360:.0f}, {record.hsl[1]:.0%}, {record.hsl[2]:.0%})"
     actions = [
         ClipAction("Copy Hex (Long)", hl),
         ClipAction("Copy RGB", f"{rgb}"),
-        ClipAction("Copy RGB [0, 1]", f"{color.get_rgb()}"),
+        ClipAction("Copy RGB [0, 1]", f"{record.rgb_normalized}"),
+        ClipAction("Copy HSL", hsl),
     ]
 
-    h = color.get_hex()
-    if h != hl:
+    h = colorindex.short_hex(hl)
+    if h is not None:
         actions.insert(0, ClipAction("Copy Hex (Short)", h))
 
+    subtext = f"{rgb}" if distance is None else f"{rgb} | ΔE: {distance:.1f}"
     return v0.Item(
         id=f"{md_name}_{hl}",
         icon=[img_path],
-        text=f"{hl}{name}",
-        subtext=f"{rgb}",
+        text=f"{hl} | {name}" if name else hl,
+        subtext=f"{label} | {subtext}" if label else subtext,
         actions=actions,
     )
 
 
-def get_as_color(s: str) -> Optional[Color]:
-    try:
-        c = Color(s)
-        return c
-    except:
-        return None
+def get_palette_items(palette_str: str) -> list:
+    """Get the items for the palettes of the query, ``<seed> [to <color>] [in <steps>]``.
+
+    Complementary and triadic palettes are generated for the seed color, along with a
+    gradient towards the given color - or the shades of the seed if there's none.
+    """
+    m = palette_re.match(palette_str.strip())
+    if m is None:
+        return []
+
+    seed = get_as_record(m.group("seed"))
+    target = get_as_record(m.group("target")) if m.group("target") else None
+    if seed is None or (m.group("target") and target is None):
+        return []
+
+    steps = int(m.group("steps") or default_gradient_steps)
+    steps = min(max(steps, min_gradient_steps), max_gradient_steps)
+    seed_rgb = np.array(seed.rgb_normalized)
+    palettes = {
+        "Complementary": colorindex.complementary(seed_rgb),
+        "Triadic": colorindex.triadic(seed_rgb),
+    }
+    if target is not None:
+        palettes["Gradient"] = colorindex.gradient(
+            seed_rgb, np.array(target.rgb_normalized), steps
+        )
+    else:
+        palettes["Shades"] = colorindex.shades(seed_rgb, steps)
+
+    # convert and write the thumbnails of all the swatches in one go
+    all_records = colorindex.to_records(np.concatenate(list(palettes.values())))
+    thumbnails.write_thumbnails(data_path, {r.hex: None for r in all_records})
+
+    items = []
+    offset = 0
+    for palette_name, rgbs in palettes.items():
+        records = all_records[offset : offset + len(rgbs)]
+        offset += len(rgbs)
+
+        hex_ls = [r.hex for r in records]
+        items.append(
+            v0.Item(
+                id=f"{md_name}_{palette_name}_{'_'.join(hex_ls)}",
+                icon=[str(thumbnails.write_palette(data_path, hex_ls))],
+                text=f"{palette_name} palette",
+                subtext=" ".join(hex_ls),
+                actions=[ClipAction("Copy Hex codes", ", ".join(hex_ls))],
+            )
+        )
+        items.extend(
+            get_as_item(r, label=f"{palette_name} {i + 1}/{len(records)}")
+            for i, r in enumerate(records)
+        )
+
+    return items
+
+
+def get_as_record(s: str):
+    """Return the colorindex.ColorRecord of the given color name, hex code or RGB triad."""
+    named_id = color_index.find(s)
+    if named_id is not None:
+        return color_index.record(named_id)
+
+    rgb = colorindex.parse_rgb(s)
+    if rgb is not None:
+        return colorindex.to_record(rgb)
+
+    return None
 
 
 def sanitize_string(s: str) -> str:
@@ -161,7 +248,7 @@ class Plugin(v0.QueryHandler):
         return "col "
 
     def synopsis(self):
-        return "some color description ..."
+        return f"color name, hex code or RGB triad | {palette_prefix}<color> [to <color>]"
 
     def initialize(self):
         """Called when the extension is loaded (ticked in the settings) - blocking."""
@@ -170,6 +257,13 @@ class Plugin(v0.QueryHandler):
         for p in (cache_path, config_path, data_path):
             p.mkdir(parents=False, exist_ok=True)
 
+        global color_index
+        color_index = colorindex.ColorIndex.load(
+            cache_path / "named_colors.npz", colour.COLOR_NAME_TO_RGB
+        )
+
+        threading.Thread(target=pregenerate_thumbnails, daemon=True).start()
+
     def finalize(self):
         pass
 
@@ -189,15 +283,42 @@ class Plugin(v0.QueryHandler):
                 )
                 return
 
+            if query_str.startswith(palette_prefix):
+                items = get_palette_items(query_str[len(palette_prefix) :])
+                if not items:
+                    items.append(
+                        v0.Item(
+                            id=md_name,
+                            icon=[icon_path],
+                            text="Give me a seed color, optionally a target and the steps",
+                            subtext=f"e.g., {palette_prefix}#336699 to white in 5",
+                        )
+                    )
+                query.add(items)
+                return
+
             # see if the name matches a color exactly
-            color = get_as_color(query_str)
-            if color:
-                query.add(get_as_item(color))
+            record = get_as_record(query_str)
+            if record:
+                query.add(get_as_item(record))
+
+                # perceptually closest named colors
+                query.add(
+                    [
+                        get_as_item(color_index.record(i), distance=distance)
+                        for i, distance in color_index.nearest(
+                            np.array(record.rgb_normalized), k=nearest_colors_count
+                        )
+                        if distance > 0
+                    ]
+                )
                 return
 
-            # no exact match
-            matched = process.extract(query_str, list(color_names_and_hex), limit=10)
-            query.add([get_as_item(Color(elem[0])) for elem in matched])
+            # no exact match - fuzzy-search the color names
+            matched = process.extract(query_str, color_index.names, limit=10)
+            query.add(
+                [get_as_item(color_index.record(color_index.find(m[0]))) for m in matched]
+            )
 
         except Exception:  # user to report error
             print(traceback.format_exc())
@@ -0,0 +1,412 @@
+"""Table of the named colors and perceptual nearest-color search over them.
+
+All the named colors are kept in NumPy arrays - RGB, hex, HSL and CIE Lab - which are
+computed once and then cached in a binary file. Finding the k colors closest to an arbitrary
+input is a single vectorized distance computation.
+Distances in Lab space (CIE76 delta E) roughly match the perceived difference between two
+colors, unlike the distance between their hex strings.
+"""
+
+import hashlib
+import re
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# sRGB -> XYZ, D65 white point
+_rgb_to_xyz = np.array(
+    [
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ]
+)
+_d65_white = np.array([0.95047, 1.0, 1.08883])
+
+
+def rgb_to_lab(rgb: np.ndarray) -> np.ndarray:
+    """Convert sRGB values in [0, 1] - array of shape (..., 3) - to CIE Lab.
+
+    >>> np.round(rgb_to_lab(np.array([1.0, 1.0, 1.0])), 2) + 0.0
+    array([100.,   0.,   0.])
+    >>> np.round(rgb_to_lab(np.array([[1.0, 0.0, 0.0]])), 1)
+    array([[53.2, 80.1, 67.2]])
+    """
+    rgb = np.asarray(rgb, dtype=np.float64)
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    xyz = linear @ _rgb_to_xyz.T / _d65_white
+
+    eps = 216 / 24389
+    kappa = 24389 / 27
+    f = np.where(xyz > eps, np.cbrt(xyz), (kappa * xyz + 16) / 116)
+
+    return np.stack(
+        [
+            116 * f[..., 1] - 16,
+            500 * (f[..., 0] - f[..., 1]),
+            200 * (f[..., 1] - f[..., 2]),
+        ],
+        axis=-1,
+    )
+
+
+_hex_re = re.compile(r"^#?(?P<hex>[0-9a-f]{3}|[0-9a-f]{6})$", re.IGNORECASE)
+_triad_re = re.compile(
+    r"^(?:rgb)?\s*[(\[]?\s*"
+    r"(?P<r>\d+(?:\.\d*)?)\s*[,\s]\s*(?P<g>\d+(?:\.\d*)?)\s*[,\s]\s*(?P<b>\d+(?:\.\d*)?)"
+    r"\s*[)\]]?$",
+    re.IGNORECASE,
+)
+
+
+def parse_rgb(s: str) -> Optional[np.ndarray]:
+    """Parse a hex string or an RGB triad into RGB values in [0, 1].
+
+    Triads with all the values in [0, 1] and at least one decimal point are taken as
+    normalized, otherwise as 0-255 values. Return None if the string is neither.
+
+    >>> parse_rgb("#ff0001") * 255
+    array([255.,   0.,   1.])
+    >>> parse_rgb("f01") * 255
+    array([255.,   0.,  17.])
+    >>> parse_rgb("(255, 0, 1)") * 255
+    array([255.,   0.,   1.])
+    >>> parse_rgb("0.5 0.5 1.0")
+    array([0.5, 0.5, 1. ])
+    >>> parse_rgb("red") is None
+    True
+    """
+    s = s.strip()
+    m = _hex_re.match(s)
+    if m is not None:
+        h = m.group("hex")
+        if len(h) == 3:
+            h = "".join(c * 2 for c in h)
+        return np.array([int(h[i : i + 2], 16) for i in (0, 2, 4)], dtype=np.float64) / 255
+
+    m = _triad_re.match(s)
+    if m is not None:
+        strs = [m.group(c) for c in "rgb"]
+        values = np.array([float(v) for v in strs])
+        if any("." in v for v in strs) and (values <= 1.0).all():
+            return values
+        if (values <= 255).all():
+            return values / 255
+
+    return None
+
+
+def rgb_to_hex(rgb: np.ndarray) -> str:
+    """
+    >>> rgb_to_hex(np.array([1.0, 0.0, 0.0]))
+    '#ff0000'
+    """
+    return "#" + "".join(f"{int(round(c * 255)):02x}" for c in rgb)
+
+
+def rgb_to_hsl(rgb: np.ndarray) -> np.ndarray:
+    """Convert RGB values in [0, 1] - array of shape (..., 3) - to HSL, all in [0, 1].
+
+    >>> rgb_to_hsl(np.array([[1.0, 0.0, 0.0], [0.0, 0.0, 1.0], [0.5, 0.5, 0.5]]))
+    array([[0.        , 1.        , 0.5       ],
+           [0.66666667, 1.        , 0.5       ],
+           [0.        , 0.        , 0.5       ]])
+    """
+    rgb = np.asarray(rgb, dtype=np.float64)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    c_max = rgb.max(axis=-1)
+    c_min = rgb.min(axis=-1)
+    delta = c_max - c_min
+    lightness = (c_max + c_min) / 2
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        saturation = np.where(delta == 0, 0.0, delta / (1 - np.abs(2 * lightness - 1)))
+        hue = np.select(
+            [delta == 0, c_max == r, c_max == g],
+            [0.0, ((g - b) / delta) % 6, (b - r) / delta + 2],
+            (r - g) / delta + 4,
+        )
+
+    return np.stack([hue / 6, saturation, lightness], axis=-1)
+
+
+def hsl_to_rgb(hsl: np.ndarray) -> np.ndarray:
+    """Convert HSL values in [0, 1] - array of shape (..., 3) - to RGB in [0, 1].
+
+    >>> hsl_to_rgb(np.array([[0.0, 1.0, 0.5], [2 / 3, 1.0, 0.5]]))
+    array([[1., 0., 0.],
+           [0., 0., 1.]])
+    """
+    hsl = np.asarray(hsl, dtype=np.float64)
+    h, sat, lightness = hsl[..., 0:1], hsl[..., 1:2], hsl[..., 2:3]
+    k = (np.array([0, 8, 4]) + h * 12) % 12
+    a = sat * np.minimum(lightness, 1 - lightness)
+    return lightness - a * np.clip(np.minimum(k - 3, 9 - k), -1, 1)
+
+
+def lab_to_rgb(lab: np.ndarray) -> np.ndarray:
+    """Convert CIE Lab values - array of shape (..., 3) - to sRGB, clipped to [0, 1].
+
+    >>> np.round(lab_to_rgb(rgb_to_lab(np.array([0.2, 0.4, 0.6]))), 6)
+    array([0.2, 0.4, 0.6])
+    """
+    lab = np.asarray(lab, dtype=np.float64)
+    fy = (lab[..., 0] + 16) / 116
+    f = np.stack([fy + lab[..., 1] / 500, fy, fy - lab[..., 2] / 200], axis=-1)
+
+    eps = 216 / 24389
+    kappa = 24389 / 27
+    xyz = np.where(f**3 > eps, f**3, (116 * f - 16) / kappa) * _d65_white
+    linear = np.clip(xyz @ np.linalg.inv(_rgb_to_xyz).T, 0, 1)
+
+    return np.where(
+        linear <= 0.0031308, linear * 12.92, 1.055 * linear ** (1 / 2.4) - 0.055
+    ).clip(0, 1)
+
+
+def short_hex(hex_l: str) -> Optional[str]:
+    """Return the 3-digit version of the given hex string, if there is one.
+
+    >>> short_hex("#ff0011")
+    '#f01'
+    >>> short_hex("#ff0001") is None
+    True
+    """
+    digits = hex_l[1:]
+    if all(digits[i] == digits[i + 1] for i in (0, 2, 4)):
+        return "#" + digits[0::2]
+
+    return None
+
+
+class ColorRecord(NamedTuple):
+    """All the representations of a single color."""
+
+    name: str
+    rgb: Tuple[int, int, int]
+    rgb_normalized: Tuple[float, float, float]
+    hex: str
+    hsl: Tuple[float, float, float]
+    lab: Tuple[float, float, float]
+
+
+def to_records(rgbs: np.ndarray) -> List[ColorRecord]:
+    """Compute the records of arbitrary RGB colors - array of shape (N, 3), in [0, 1].
+
+    >>> [r.hex for r in to_records(np.array([[1.0, 0.0, 0.0], [0.0, 0.0, 1.0]]))]
+    ['#ff0000', '#0000ff']
+    """
+    rgbs = np.asarray(rgbs, dtype=np.float64).reshape(-1, 3)
+    rgbs_255 = np.round(rgbs * 255).astype(int)
+    hsls = rgb_to_hsl(rgbs)
+    labs = rgb_to_lab(rgbs)
+
+    return [
+        ColorRecord(
+            name="",
+            rgb=tuple(int(c) for c in rgb_255),
+            rgb_normalized=tuple(float(c) for c in rgb),
+            hex="#" + "".join(f"{c:02x}" for c in rgb_255),
+            hsl=tuple(float(c) for c in hsl),
+            lab=tuple(float(c) for c in lab),
+        )
+        for rgb, rgb_255, hsl, lab in zip(rgbs, rgbs_255, hsls, labs)
+    ]
+
+
+def to_record(rgb: np.ndarray) -> ColorRecord:
+    """Compute the record of an arbitrary RGB color, in [0, 1]."""
+    return to_records(rgb)[0]
+
+
+def normalize_name(name: str) -> str:
+    return "".join(name.lower().split())
+
+
+class ColorIndex:
+    """Table of the named colors, with their RGB, hex, HSL and Lab representations.
+
+    Construct it with :meth:`load`, to have the table cached in a binary file.
+    """
+
+    def __init__(
+        self,
+        names: np.ndarray,
+        rgb: np.ndarray,
+        hex_ls: np.ndarray,
+        hsl: np.ndarray,
+        lab: np.ndarray,
+    ):
+        self.names = [str(name) for name in names]
+        self.rgb = rgb
+        self.hex = hex_ls
+        self.hsl = hsl
+        self.lab = lab
+
+        self._name_to_id = {normalize_name(name): i for i, name in enumerate(self.names)}
+        # name of each distinct color - the first one of its aliases
+        self._hex_to_id: Dict[str, int] = {}
+        for i, h in enumerate(self.hex):
+            self._hex_to_id.setdefault(str(h), i)
+
+    @classmethod
+    def from_names(cls, name_to_rgb: Dict[str, Tuple[int, int, int]]) -> "ColorIndex":
+        """
+        >>> index = ColorIndex.from_names({"red": (255, 0, 0), "blue": (0, 0, 255)})
+        >>> index.record(index.find("Red")).hex
+        '#ff0000'
+        """
+        rgb = np.array(list(name_to_rgb.values()), dtype=np.float64).reshape(-1, 3) / 255
+        return cls(
+            names=np.array(list(name_to_rgb.keys()), dtype=str),
+            rgb=rgb,
+            hex_ls=np.array([rgb_to_hex(c) for c in rgb], dtype=str),
+            hsl=rgb_to_hsl(rgb),
+            lab=rgb_to_lab(rgb),
+        )
+
+    @classmethod
+    def load(cls, path: Path, name_to_rgb: Dict[str, Tuple[int, int, int]]) -> "ColorIndex":
+        """Load the table from the given .npz file, or build and cache it there.
+
+        The cached table is rebuilt if the given named colors have changed.
+        """
+        digest = hashlib.sha256(repr(sorted(name_to_rgb.items())).encode()).hexdigest()
+        if path.is_file():
+            try:
+                with np.load(path, allow_pickle=False) as data:
+                    if str(data["digest"]) == digest:
+                        return cls(
+                            names=data["names"],
+                            rgb=data["rgb"],
+                            hex_ls=data["hex"],
+                            hsl=data["hsl"],
+                            lab=data["lab"],
+                        )
+            except (OSError, ValueError, KeyError):
+                pass
+
+        index = cls.from_names(name_to_rgb)
+        tmp_path = path.with_name(f"{path.stem}.tmp.npz")
+        np.savez(
+            tmp_path,
+            digest=np.array(digest),
+            names=np.array(index.names, dtype=str),
+            rgb=index.rgb,
+            hex=index.hex,
+            hsl=index.hsl,
+            lab=index.lab,
+        )
+        tmp_path.replace(path)
+
+        return index
+
+    def find(self, name: str) -> Optional[int]:
+        """Get the id of the color with the given name, case and whitespace-insensitive."""
+        return self._name_to_id.get(normalize_name(name))
+
+    def find_hex(self, hex_l: str) -> Optional[int]:
+        """Get the id of the named color with the given long hex string, if there is one."""
+        return self._hex_to_id.get(hex_l)
+
+    def record(self, i: int) -> ColorRecord:
+        return ColorRecord(
+            name=self.names[i],
+            rgb=tuple(int(c) for c in np.round(self.rgb[i] * 255)),
+            rgb_normalized=tuple(float(c) for c in self.rgb[i]),
+            hex=str(self.hex[i]),
+            hsl=tuple(float(c) for c in self.hsl[i]),
+            lab=tuple(float(c) for c in self.lab[i]),
+        )
+
+    def nearest(
+        self, rgb: np.ndarray, k: int = 5, space: str = "lab"
+    ) -> List[Tuple[int, float]]:
+        """Return the ids of the k named colors closest to the given RGB and their distances.
+
+        Distances are computed in Lab space by default - pass ``space="rgb"`` for plain
+        euclidean distance in RGB. Names that refer to the same color are only returned once.
+
+        >>> index = ColorIndex.from_names(
+        ...     {"red": (255, 0, 0), "maroon": (128, 0, 0), "blue": (0, 0, 255)}
+        ... )
+        >>> [index.names[i] for i, _ in index.nearest(parse_rgb("#ee0011"), k=2)]
+        ['red', 'maroon']
+        """
+        if space == "lab":
+            points, target = self.lab, rgb_to_lab(rgb)
+        elif space == "rgb":
+            points, target = self.rgb, np.asarray(rgb)
+        else:
+            raise ValueError(f"Unknown color space: {space}")
+
+        dists = np.linalg.norm(points - target, axis=1)
+        # get more candidates than asked, to make up for the aliased names
+        n = min(2 * k, len(dists))
+        candidates = np.argpartition(dists, n - 1)[:n]
+        candidates = candidates[np.argsort(dists[candidates], kind="stable")]
+
+        results = []
+        seen = set()
+        for i in candidates:
+            h = str(self.hex[i])
+            if h in seen:
+                continue
+            seen.add(h)
+            results.append((self._hex_to_id[h], float(dists[i])))
+            if len(results) == k:
+                break
+
+        return results
+
+
+# palettes ------------------------------------------------------------------------------------
+def rotate_hue(rgb: np.ndarray, offsets: List[float]) -> np.ndarray:
+    """Rotate the hue of the given color by each one of the offsets, given in turns.
+
+    >>> rgb_to_hex(rotate_hue(np.array([1.0, 0.0, 0.0]), [1 / 3])[0])
+    '#00ff00'
+    """
+    hsl = np.tile(rgb_to_hsl(rgb), (len(offsets), 1))
+    hsl[:, 0] = (hsl[:, 0] + np.asarray(offsets)) % 1
+    return hsl_to_rgb(hsl)
+
+
+def complementary(rgb: np.ndarray) -> np.ndarray:
+    """
+    >>> [rgb_to_hex(c) for c in complementary(np.array([1.0, 0.0, 0.0]))]
+    ['#ff0000', '#00ffff']
+    """
+    return rotate_hue(rgb, [0, 1 / 2])
+
+
+def triadic(rgb: np.ndarray) -> np.ndarray:
+    """
+    >>> [rgb_to_hex(c) for c in triadic(np.array([1.0, 0.0, 0.0]))]
+    ['#ff0000', '#00ff00', '#0000ff']
+    """
+    return rotate_hue(rgb, [0, 1 / 3, 2 / 3])
+
+
+def gradient(rgb_from: np.ndarray, rgb_to: np.ndarray, n: int) -> np.ndarray:
+    """Interpolate between two colors in n steps - in Lab space, so that the steps are
+    perceptually even.
+
+    >>> [rgb_to_hex(c) for c in gradient(np.zeros(3), np.ones(3), 3)]
+    ['#000000', '#777777', '#ffffff']
+    """
+    weights = np.linspace(0, 1, n)[:, np.newaxis]
+    lab = (1 - weights) * rgb_to_lab(rgb_from) + weights * rgb_to_lab(rgb_to)
+    return lab_to_rgb(lab)
+
+
+def shades(rgb: np.ndarray, n: int) -> np.ndarray:
+    """Shades of the given color in n steps, from dark to light - keeps its Lab hue/chroma.
+
+    >>> [rgb_to_hex(c) for c in shades(np.array([0.5, 0.5, 0.5]), 3)]
+    ['#1b1b1b', '#7d7d7d', '#f1f1f1']
+    """
+    lab = np.tile(rgb_to_lab(rgb), (n, 1))
+    lab[:, 0] = np.linspace(10, 95, n)
+    return lab_to_rgb(lab)
@@ -0,0 +1,110 @@
+"""Solid-color PNG thumbnails, written straight from bytes - no imaging library involved."""
+
+import hashlib
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterable, List, Tuple
+
+thumbnail_size = (50, 50)
+
+_png_signature = b"\x89PNG\r\n\x1a\n"
+
+
+def _png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data))
+        + chunk_type
+        + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF)
+    )
+
+
+def _png(row: bytes, size: Tuple[int, int]) -> bytes:
+    """Encode a PNG image of the given size, with all its scanlines equal to ``row``."""
+    width, height = size
+    # 8-bit truecolor, no interlacing
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    # every scanline starts with filter type 0 - none
+    idat = zlib.compress((b"\x00" + row) * height, 9)
+
+    return (
+        _png_signature
+        + _png_chunk(b"IHDR", ihdr)
+        + _png_chunk(b"IDAT", idat)
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+def solid_png(rgb: Tuple[int, int, int], size: Tuple[int, int] = thumbnail_size) -> bytes:
+    """Encode a PNG image of the given size, filled with the given 0-255 RGB color.
+
+    >>> solid_png((255, 0, 0), (1, 1))[:8] == _png_signature
+    True
+    """
+    return _png(bytes(rgb) * size[0], size)
+
+
+def palette_png(
+    rgbs: List[Tuple[int, int, int]], size: Tuple[int, int] = thumbnail_size
+) -> bytes:
+    """Encode a PNG image of the given size, split in vertical bands, one per color.
+
+    >>> palette_png([])
+    Traceback (most recent call last):
+    ...
+    ValueError: A palette needs at least one color
+    """
+    if not rgbs:
+        raise ValueError("A palette needs at least one color")
+
+    width = size[0]
+    row = b"".join(bytes(rgbs[x * len(rgbs) // width]) for x in range(width))
+    return _png(row, size)
+
+
+def hex_to_rgb(h: str) -> Tuple[int, int, int]:
+    """
+    >>> hex_to_rgb("#ff8000")
+    (255, 128, 0)
+    """
+    h = h.lstrip("#")
+    return int(h[0:2], 16), int(h[2:4], 16), int(h[4:6], 16)
+
+
+def thumbnail_path(thumbnails_dir: Path, hex_l: str) -> Path:
+    """Path to the thumbnail of the given long hex string, e.g., #ff8000."""
+    return thumbnails_dir / f"{hex_l.lstrip('#')}.png"
+
+
+def write_thumbnail(thumbnails_dir: Path, hex_l: str) -> Path:
+    """Write the thumbnail for the given color, unless it's already there."""
+    path = thumbnail_path(thumbnails_dir, hex_l)
+    if path.is_file():
+        return path
+
+    _write_atomically(path, solid_png(hex_to_rgb(hex_l)))
+    return path
+
+
+def write_thumbnails(thumbnails_dir: Path, hex_ls: Iterable[str]) -> List[Path]:
+    """Write the thumbnails for the given colors, skipping the ones that are already there."""
+    return [write_thumbnail(thumbnails_dir, hex_l) for hex_l in hex_ls]
+
+
+def write_palette(thumbnails_dir: Path, hex_ls: List[str]) -> Path:
+    """Write a single thumbnail showing all the given colors, unless it's already there."""
+    digest = hashlib.sha1("".join(hex_ls).encode()).hexdigest()[:16]
+    path = thumbnails_dir / f"palette-{digest}.png"
+    if not path.is_file():
+        _write_atomically(path, palette_png([hex_to_rgb(h) for h in hex_ls]))
+
+    return path
+
+
+def _write_atomically(path: Path, data: bytes):
+    # write to a temporary file first - don't let anyone read a half-written thumbnail
+    tmp_path = path.with_name(f"{path.stem}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(data)
+    tmp_path.replace(path)
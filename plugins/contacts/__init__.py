@@ -1,15 +1,17 @@
 """Contact VCF Viewer."""
 
+import hashlib
+import importlib.util
 import json
-import subprocess
+import os
+import threading
 import traceback
 from pathlib import Path
-from shutil import copyfile, which
-from typing import Any, Dict, List, Optional, Sequence
+from shutil import copyfile
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import albert as v0
 import gi
-from fuzzywuzzy import process
 
 gi.require_version("Notify", "0.7")  # isort:skip
 gi.require_version("GdkPixbuf", "2.0")  # isort:skip
@@ -32,6 +34,8 @@ data_path = Path(v0.dataLocation()) / "contacts"
 
 stats_path = config_path / "stats"
 vcf_path = Path(cache_path / "contacts.vcf")
+# contacts parsed out of vcf_path, along with the mtime/size of the file they came from
+parsed_contacts_path = cache_path / "contacts.json"
 
 
 class Contact:
@@ -40,10 +44,12 @@ class Contact:
         fullname: str,
         telephones: Optional[Sequence[str]],
         emails: Optional[Sequence[str]] = None,
+        organization: str = "",
     ):
         self._fullname = fullname
         self._telephones = telephones or []
         self._emails = emails or []
+        self._organization = organization
 
     @property
     def fullname(self) -> str:
@@ -57,45 +63,209 @@ class Contact:
     def emails(self) -> Sequence[str]:
         return self._emails
 
-    @classmethod
-    def parse(cls, k, v):
-        def values(name: str) -> Sequence[Any]:
-            array = v.get(name)
-            if array is None:
-                return []
+    @property
+    def organization(self) -> str:
+        return self._organization
 
-            return [item["value"] for item in array]
+    @classmethod
+    def from_vcard(cls, card: Dict[str, List[str]]) -> Optional["Contact"]:
+        """Create a contact out of a parsed vCard - None if the card doesn't have a name."""
+        fullname = vcard.unescape(card["FN"][0]).strip() if card.get("FN") else ""
+        if not fullname and card.get("N"):
+            # N is family;given;additional;prefixes;suffixes
+            n = vcard.split_components(card["N"][0])
+            fullname = " ".join(part for part in (*n[3:4], *n[1:3], *n[:1], *n[4:5]) if part)
+        if not fullname:
+            return None
+
+        # ORG is a structured property - organization name, followed by its units
+        orgs = [
+            " ".join(filter(None, vcard.split_components(org))) for org in card.get("ORG", [])
+        ]
 
         return cls(
-            fullname=k,
-            telephones=[tel.replace(" ", "") for tel in values("tel")],
-            emails=values("email"),
+            fullname=fullname,
+            telephones=[
+                vcard.unescape(tel).replace(" ", "")
+                for tel in card.get("TEL", [])
+                if tel.strip()
+            ],
+            emails=[
+                vcard.unescape(email).strip()
+                for email in card.get("EMAIL", [])
+                if email.strip()
+            ],
+            organization=" ".join(org for org in orgs if org),
         )
 
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "fullname": self._fullname,
+            "telephones": list(self._telephones),
+            "emails": list(self._emails),
+            "organization": self._organization,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "Contact":
+        return cls(**d)
+
+
+def load_module(name: str):
+    """Load a module from the same directory as this file."""
+    dir_ = Path(__file__).absolute().parent
+    spec = importlib.util.spec_from_file_location(name, dir_ / f"{name}.py")
+    if spec == None:
+        raise RuntimeError(f"Couldn't find {name}.py in current dir.")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+contactindex = load_module("contactindex")
+vcard = load_module("vcard")
+
+contact_index = contactindex.ContactIndex([])
+
+# digest of every vCard block of the vcf file, in file order, along with its contact - None
+# if the block doesn't hold a usable contact
+parsed_cards: List[Tuple[str, Optional[Contact]]] = []
+# mtime/size of the vcf file parsed_cards was read from
+parsed_key: Optional[Dict[str, int]] = None
+reindex_lock = threading.Lock()
 
-contacts: List[Contact]
-fullnames_to_contacts: Dict[str, Contact]
+# how often to check whether the vcf file changed [s]
+watch_interval = 2.0
 
 # create plugin locations
 for p in (cache_path, config_path, data_path):
     p.mkdir(parents=False, exist_ok=True)
 
 
-def reindex_contacts() -> None:
-    global contacts, fullnames_to_contacts
-    contacts = get_new_contacts()
-    fullnames_to_contacts = {c.fullname: c for c in contacts}
+def get_vcf_key() -> Optional[Dict[str, int]]:
+    try:
+        st = vcf_path.stat()
+    except OSError:
+        return None
+
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
 
 
-def get_new_contacts() -> List[Contact]:
-    proc = subprocess.run(
-        ["vcfxplr", "-c", str(vcf_path), "json", "-g", "fn"],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
+def reindex_contacts() -> None:
+    """Re-read the vcf file and replace the index.
+
+    The index is swapped in a single step - queries running in parallel keep on using the
+    previous one.
+    """
+    global contact_index
+    with reindex_lock:
+        contacts = get_new_contacts()
+        if contacts is not None:
+            contact_index = contactindex.ContactIndex(contacts)
+
+
+def load_parsed_cards() -> None:
+    global parsed_cards, parsed_key
+    try:
+        cached = json.loads(parsed_contacts_path.read_text())
+        parsed_key = cached["key"]
+        parsed_cards = [
+            (digest, None if d is None else Contact.from_dict(d))
+            for digest, d in cached["cards"]
+        ]
+    except (OSError, ValueError, KeyError, TypeError):
+        parsed_key, parsed_cards = None, []
+
+
+def save_parsed_cards() -> None:
+    tmp_path = parsed_contacts_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(
+        json.dumps(
+            {
+                "key": parsed_key,
+                "cards": [
+                    (digest, None if c is None else c.to_dict()) for digest, c in parsed_cards
+                ],
+            }
+        )
     )
+    tmp_path.replace(parsed_contacts_path)
+
+
+def get_new_contacts() -> Optional[List[Contact]]:
+    """Get the contacts of the vcf file - None if there's no vcf file.
+
+    The file is parsed incrementally - only the vCard blocks that changed since the last
+    time are parsed again, the contacts of the rest are reused. If the file itself didn't
+    change, the contacts are read back from the cache as they are.
+    """
+    global parsed_cards, parsed_key
+    if parsed_key is None:
+        load_parsed_cards()
+
+    key = get_vcf_key()
+    if key is None:
+        return None
+
+    if key != parsed_key:
+        previous = dict(parsed_cards)
+        cards = []
+        n_parsed = 0
+        for block in vcard.read_blocks(vcf_path):
+            digest = hashlib.sha1(block.encode()).hexdigest()
+            if digest in previous:
+                contact = previous[digest]
+            else:
+                contact = Contact.from_vcard(vcard.parse_block(block))
+                n_parsed += 1
+            cards.append((digest, contact))
+
+        v0.info(
+            f"{md_name} - read {len(cards)} cards out of {vcf_path}, {n_parsed} of them"
+            " new or changed"
+        )
+        parsed_cards, parsed_key = cards, key
+        save_parsed_cards()
+
+    return [c for _, c in parsed_cards if c is not None]
+
 
-    contacts_json = json.loads(proc.stdout)
-    return [Contact.parse(k, v) for k, v in contacts_json.items()]
+class VcfWatcher:
+    """Reindex the contacts in the background whenever the vcf file changes.
+
+    The file is polled and reindexed only once its mtime/size stay the same across two
+    polls - i.e., not while it's still being written to.
+    """
+
+    def __init__(self, interval: float = watch_interval):
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        last_seen = get_vcf_key()
+        while not self._stop.wait(self._interval):
+            key = get_vcf_key()
+            if key is not None and key == last_seen and key != parsed_key:
+                try:
+                    reindex_contacts()
+                except Exception:
+                    v0.critical(traceback.format_exc())
+            last_seen = key
+
+
+vcf_watcher = VcfWatcher()
 
 
 # FileBackedVar class -------------------------------------------------------------------------
@@ -179,27 +349,6 @@ def save_vcf_file(query: str):
 
 
 def setup(query) -> bool:  # type: ignore
-    if not which("vcfxplr"):
-        query.add(
-            v0.Item(
-                id=md_name,
-                icon=[icon_path],
-                text='"vcfxplr" is not installed.',
-                subtext=(
-                    "You can install it via pip - <u>pip3 install --user --upgrade vcfxplr</u>"
-                ),
-                actions=[
-                    ClipAction(
-                        "Copy install command", "pip3 install --user --upgrade vcfxplr"
-                    ),
-                    UrlAction(
-                        'Open "vcfxplr" page', "https://github.com/bergercookie/vcfxplr"
-                    ),
-                ],
-            )
-        )
-        return True
-
     if vcf_path.exists() and not vcf_path.is_file():
         raise RuntimeError(f"vcf file exists but it's not a file -> {vcf_path}")
 
@@ -254,15 +403,16 @@ class Plugin(v0.QueryHandler):
         return "c "
 
     def synopsis(self):
-        return "TODO"
+        return "name, email, phone number or organization"
 
     def initialize(self):
         """Called when the extension is loaded (ticked in the settings) - blocking."""
         if vcf_path.is_file():
             reindex_contacts()
+        vcf_watcher.start()
 
     def finalize(self):
-        pass
+        vcf_watcher.stop()
 
     def handleQuery(self, query) -> None:
         """Hook that is called by albert with *every new keypress*."""  # noqa
@@ -287,11 +437,12 @@ class Plugin(v0.QueryHandler):
                 )
                 results.append(self.get_reindex_item(query))
             else:
-                matched = process.extract(query_str, fullnames_to_contacts.keys(), limit=10)
+                # snapshot - the index may be replaced while the query is running
+                index = contact_index
                 results.extend(
                     [
-                        self.get_contact_as_item(query, fullnames_to_contacts[m[0]])
-                        for m in matched
+                        self.get_contact_as_item(query, index.contacts[i])
+                        for i in index.search(query_str, limit=10)
                     ]
                 )
 
@@ -327,6 +478,8 @@ class Plugin(v0.QueryHandler):
         Return an item - ready to be appended to the items list and be rendered by Albert.
         """
         text = contact.fullname
+        if contact.organization:
+            text = f"{text} ({contact.organization})"
         phones_and_emails = set(contact.emails).union(contact.telephones)
         subtext = " | ".join(phones_and_emails)
         completion = f"{query.trigger}{contact.fullname}"
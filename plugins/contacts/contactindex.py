@@ -0,0 +1,142 @@
+"""Field-aware search index over the contacts.
+
+Every contact is indexed by its position in the contacts list - two contacts with the same
+name are still two separate entries. The index holds tokens from the full name, the emails,
+the organization and the phone numbers (digits only, all their suffixes so that a number can
+be found without its country code). A query hits the exact/prefix token index first and
+only falls back to fuzzy-matching the names if that doesn't match anything.
+"""
+
+import bisect
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set
+
+from fuzzywuzzy import process
+
+# minimum number of digits for a query to be looked up in the phone numbers
+min_phone_digits = 3
+
+_word_sep_re = re.compile(r"[\s.,;_+@\-]+")
+_phone_query_re = re.compile(r"^\+?[\d\s\-/().]+$")
+
+
+def normalize_phone(phone: str) -> str:
+    """
+    >>> normalize_phone("+30 (694) 123-4567")
+    '306941234567'
+    """
+    return "".join(c for c in phone if c.isdigit())
+
+
+def get_text_tokens(s: str) -> List[str]:
+    """
+    >>> get_text_tokens("John.Smith@Example.com")
+    ['john.smith@example.com', 'john', 'smith', 'example', 'com']
+    """
+    s = s.strip().lower()
+    if not s:
+        return []
+
+    return [s, *[w for w in _word_sep_re.split(s) if w and w != s]]
+
+
+def get_phone_tokens(phone: str) -> List[str]:
+    """All the suffixes of the number, so that a prefix lookup works as a substring search.
+
+    >>> get_phone_tokens("+30 694 12")
+    ['3069412', '069412', '69412', '9412', '412']
+    """
+    digits = normalize_phone(phone)
+    return [digits[i:] for i in range(len(digits) - min_phone_digits + 1)]
+
+
+class ContactIndex:
+    """Index of the given contacts - look them up with :meth:`search`.
+
+    >>> from types import SimpleNamespace as C
+    >>> index = ContactIndex([
+    ...     C(fullname="John Smith", emails=["js@work.com"], telephones=["+306941234567"],
+    ...       organization="ACME"),
+    ...     C(fullname="John Smith", emails=["john@home.org"], telephones=[],
+    ...       organization=""),
+    ...     C(fullname="Jane Doe", emails=["jane@work.com"], telephones=["2101234567"],
+    ...       organization="ACME"),
+    ... ])
+    >>> index.search("john")
+    [0, 1]
+    >>> index.search("1234567")
+    [2, 0]
+    >>> index.search("acme ja")
+    [2]
+    >>> index.search("jn smth", limit=2)
+    [0, 1]
+    """
+
+    def __init__(self, contacts: Iterable):
+        self._contacts = list(contacts)
+        self._tokens: Dict[str, Set[int]] = defaultdict(set)
+        self._phone_tokens: Dict[str, Set[int]] = defaultdict(set)
+
+        for i, contact in enumerate(self._contacts):
+            for field in (contact.fullname, contact.organization, *contact.emails):
+                for token in get_text_tokens(field):
+                    self._tokens[token].add(i)
+            for phone in contact.telephones:
+                for token in get_phone_tokens(phone):
+                    self._phone_tokens[token].add(i)
+
+        self._sorted_tokens = sorted(self._tokens)
+        self._sorted_phone_tokens = sorted(self._phone_tokens)
+        self._names = {i: c.fullname for i, c in enumerate(self._contacts)}
+
+    @property
+    def contacts(self) -> List:
+        return self._contacts
+
+    @staticmethod
+    def _lookup(
+        word: str, tokens: Dict[str, Set[int]], sorted_tokens: List[str]
+    ) -> Dict[int, int]:
+        """Map the ids of the contacts with a token starting with the word to a score.
+
+        Exact matches score 2, prefix matches 1.
+        """
+        scores: Dict[int, int] = {}
+        i = bisect.bisect_left(sorted_tokens, word)
+        while i < len(sorted_tokens) and sorted_tokens[i].startswith(word):
+            token = sorted_tokens[i]
+            score = 2 if token == word else 1
+            for contact_id in tokens[token]:
+                scores[contact_id] = max(scores.get(contact_id, 0), score)
+            i += 1
+
+        return scores
+
+    def search(self, query_str: str, limit: int = 10) -> List[int]:
+        """Return the ids of up to ``limit`` contacts that match the query, best first."""
+        query_str = query_str.strip().lower()
+        if not query_str:
+            return []
+
+        digits = normalize_phone(query_str)
+        if _phone_query_re.match(query_str) and len(digits) >= min_phone_digits:
+            scores = self._lookup(digits, self._phone_tokens, self._sorted_phone_tokens)
+        else:
+            # every word of the query has to match - the whole query may also match as is,
+            # e.g., an email address
+            scores = self._lookup(query_str, self._tokens, self._sorted_tokens)
+            words = [w for w in _word_sep_re.split(query_str) if w]
+            if len(words) > 1 or not scores:
+                per_word = [self._lookup(w, self._tokens, self._sorted_tokens) for w in words]
+                common = set.intersection(*(set(s) for s in per_word)) if per_word else set()
+                for contact_id in common:
+                    score = sum(s[contact_id] for s in per_word)
+                    scores[contact_id] = max(scores.get(contact_id, 0), score)
+
+        if scores:
+            ranked = sorted(scores, key=lambda i: (-scores[i], self._names[i], i))
+            return ranked[:limit]
+
+        # fall back to fuzzy-matching the names
+        return [m[2] for m in process.extract(query_str, self._names, limit=limit)]
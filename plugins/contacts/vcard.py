@@ -0,0 +1,176 @@
+"""Streaming vCard (.vcf) parser.
+
+The file is read line by line and one card is yielded at a time, so even exports with tens
+of thousands of contacts are parsed in a single pass without loading the whole file in
+memory. A card can also be read as its raw block of text first (:func:`iter_blocks`) and
+parsed later on (:func:`parse_block`), e.g., only if the block changed since the last read.
+Supports vCard 2.1, 3.0 and 4.0 - folded lines, property groups (``item1.EMAIL``),
+parameters, escaped characters and quoted-printable values.
+"""
+
+import quopri
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+VCard = Dict[str, List[str]]
+
+
+def unfold(lines: Iterable[str]) -> Iterator[str]:
+    """Join folded lines - continuations start with a space or a tab.
+
+    Quoted-printable values (vCard 2.1) are folded with a trailing ``=`` instead.
+
+    >>> list(unfold(["FN:John", " Smith", "NOTE;ENCODING=QUOTED-PRINTABLE:a=", "b"]))
+    ['FN:JohnSmith', 'NOTE;ENCODING=QUOTED-PRINTABLE:ab']
+    """
+    current = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if current is not None and line[:1] in (" ", "\t"):
+            current += line[1:]
+        elif current is not None and current.endswith("=") and _is_quoted_printable(current):
+            # soft line break
+            current = current[:-1] + line
+        else:
+            if current is not None:
+                yield current
+            current = line
+
+    if current is not None:
+        yield current
+
+
+def _is_quoted_printable(line: str) -> bool:
+    name_and_params = line.split(":", 1)[0].upper()
+    return "QUOTED-PRINTABLE" in name_and_params
+
+
+def unescape(value: str) -> str:
+    r"""
+    >>> unescape(r"Line 1\nLine 2\, with a comma\; and a semicolon")
+    'Line 1\nLine 2, with a comma; and a semicolon'
+    """
+    out = []
+    chars = iter(value)
+    for c in chars:
+        if c == "\\":
+            nxt = next(chars, "")
+            out.append("\n" if nxt in ("n", "N") else nxt)
+        else:
+            out.append(c)
+
+    return "".join(out)
+
+
+def split_components(value: str) -> List[str]:
+    r"""Split a structured value - e.g., N or ORG - on its unescaped semicolons.
+
+    >>> split_components(r"ACME\; Inc.;R&D")
+    ['ACME; Inc.', 'R&D']
+    """
+    components = []
+    current = []
+    chars = iter(value)
+    for c in chars:
+        if c == "\\":
+            current.append(c + next(chars, ""))
+        elif c == ";":
+            components.append(unescape("".join(current)))
+            current = []
+        else:
+            current.append(c)
+    components.append(unescape("".join(current)))
+
+    return components
+
+
+def parse_line(line: str) -> Tuple[str, Dict[str, str], str]:
+    """Parse a content line into its name, its parameters and its raw value.
+
+    >>> parse_line("item1.TEL;TYPE=CELL;PREF:+30 694 1234567")
+    ('TEL', {'TYPE': 'CELL', 'PREF': ''}, '+30 694 1234567')
+    """
+    head, _, value = line.partition(":")
+    name, *params = head.split(";")
+    name = name.rsplit(".", 1)[-1].upper()
+
+    param_dict = {}
+    for param in params:
+        key, _, val = param.partition("=")
+        param_dict[key.upper()] = val
+
+    return name, param_dict, value
+
+
+def decode_value(params: Dict[str, str], value: str) -> str:
+    if params.get("ENCODING", "").upper() == "QUOTED-PRINTABLE":
+        charset = params.get("CHARSET", "utf-8")
+        return quopri.decodestring(value.encode()).decode(charset, errors="replace")
+
+    return value
+
+
+def iter_blocks(lines: Iterable[str]) -> Iterator[str]:
+    r"""Yield the raw text of every BEGIN:VCARD ... END:VCARD block, without parsing it.
+
+    >>> list(iter_blocks(["junk", "BEGIN:VCARD", "FN:Jane", "END:VCARD"]))
+    ['BEGIN:VCARD\nFN:Jane\nEND:VCARD']
+    """
+    block = None
+    for line in lines:
+        line = line.rstrip("\r\n")
+        stripped = line.strip().upper()
+        if stripped == "BEGIN:VCARD":
+            block = [line]
+        elif block is not None:
+            block.append(line)
+            if stripped == "END:VCARD":
+                yield "\n".join(block)
+                block = None
+
+
+def parse_block(block: str) -> VCard:
+    r"""Parse a single BEGIN:VCARD ... END:VCARD block.
+
+    The card maps the upper-case property names to their raw values - still escaped, so
+    that structured values can be split on their semicolons.
+
+    >>> parse_block("BEGIN:VCARD\nFN:John Smith\nTEL:123\nTEL:456\nEND:VCARD")
+    {'FN': ['John Smith'], 'TEL': ['123', '456']}
+    """
+    card: VCard = {}
+    for line in unfold(block.splitlines()):
+        if not line.strip():
+            continue
+
+        name, params, value = parse_line(line)
+        if name in ("BEGIN", "END"):
+            continue
+        card.setdefault(name, []).append(decode_value(params, value))
+
+    return card
+
+
+def iter_vcards(lines: Iterable[str]) -> Iterator[VCard]:
+    """Yield the cards in the given lines, one at a time.
+
+    >>> cards = list(iter_vcards([
+    ...     "BEGIN:VCARD", "VERSION:3.0", "FN:John Smith", "TEL:123", "END:VCARD",
+    ...     "BEGIN:VCARD", "FN:Jane", "END:VCARD",
+    ... ]))
+    >>> cards[0]["TEL"], cards[1]["FN"]
+    (['123'], ['Jane'])
+    """
+    return map(parse_block, iter_blocks(lines))
+
+
+def parse_file(path: Path) -> Iterator[VCard]:
+    """Yield the cards of the given .vcf file, one at a time."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        yield from iter_vcards(f)
+
+
+def read_blocks(path: Path) -> Iterator[str]:
+    """Yield the raw blocks of the given .vcf file, one at a time - see :func:`iter_blocks`."""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        yield from iter_blocks(f)
@@ -9,12 +9,15 @@ Check available languages here: https://cloud.google.com/translate/docs/language
 20191229 - bergercookie: Send a request only when the user has "slowed-down" typing (0.3s diff
 between two consecutive chars) so that we send less requests to google. This way the IP is not
 blocked.
+
+The length of that pause is now learnt from the user's typing cadence and the request is sent
+as soon as typing stops, see debounce.py.
 """
 
 import ast
+import importlib.util
 import json
 import subprocess
-import time
 import traceback
 import urllib.parse
 import urllib.request
@@ -67,32 +70,19 @@ def flush_history():
             f.write(f"{di}\n")
 
 
-# plugin main functions -----------------------------------------------------------------------
-class KeystrokeMonitor:
-    def __init__(self):
-        super(KeystrokeMonitor, self)
-        self.thres = 0.4  # s
-        self.prev_time = time.time()
-        self.curr_time = time.time()
-
-    def report(self):
-        self.prev_time = time.time()
-        self.curr_time = time.time()
-        self.report = self.report_after_first  # type: ignore
-
-    def report_after_first(self):
-        # update prev, curr time
-        self.prev_time = self.curr_time
-        self.curr_time = time.time()
-
-    def triggered(self) -> bool:
-        return self.curr_time - self.prev_time > self.thres
+# debouncing ----------------------------------------------------------------------------------
+# load debounce module - from the same directory as this file
+dir_ = Path(__file__).absolute().parent
+spec = importlib.util.spec_from_file_location("debounce", dir_ / "debounce.py")
+if spec == None:
+    raise RuntimeError("Couldn't find debounce.py in current dir.")
+debounce = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(debounce)  # type: ignore
 
-    def reset(self) -> None:
-        self.report = self.report_after_first  # type: ignore
+debouncer = debounce.Debouncer(init_delay=0.4, state_path=cache_path / "debounce")
 
 
-keys_monitor = KeystrokeMonitor()
+# plugin main functions -----------------------------------------------------------------------
 
 
 def select_item(lang_config: Dict[str, str], result: str):
@@ -160,6 +150,8 @@ class Plugin(v0.QueryHandler):
 
     def finalize(self):
         flush_history()
+        v0.info(f"{md_name} - {debouncer.stats}")
+        debouncer.save()
 
     def get_history_item(self, query, *, src: str, dst: str, src_txt: str, dst_txt) -> v0.Item:
         return v0.Item(
@@ -194,7 +186,7 @@ class Plugin(v0.QueryHandler):
         try:
             fields = query.string.split()
             if len(fields) < 3:
-                keys_monitor.reset()
+                debouncer.cancel()
                 query.add(self.get_sample_item())
                 return
 
@@ -208,8 +200,7 @@ class Plugin(v0.QueryHandler):
             subtext = ""
             actions = []
 
-            keys_monitor.report()
-            if keys_monitor.triggered():
+            if debouncer.wait(query):
                 url = url_template % (src, dst, urllib.parse.quote_plus(txt))
                 req = urllib.request.Request(url, headers={"User-Agent": ua})
                 with urllib.request.urlopen(req) as response:
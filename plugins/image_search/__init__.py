@@ -3,7 +3,6 @@
 import concurrent.futures
 import importlib.util
 import subprocess
-import time
 import traceback
 from pathlib import Path
 from typing import Iterator, List
@@ -42,33 +41,16 @@ if cache_path.exists():
         img.unlink()
 
 
-# Keystroke Monitor ---------------------------------------------------------------------------
-class KeystrokeMonitor:
-    def __init__(self):
-        super(KeystrokeMonitor, self)
-        self.thres = 0.4  # s
-        self.prev_time = time.time()
-        self.curr_time = time.time()
-
-    def report(self):
-        self.prev_time = time.time()
-        self.curr_time = time.time()
-        self.report = self.report_after_first  # type: ignore
-
-    def report_after_first(self):
-        # update prev, curr time
-        self.prev_time = self.curr_time
-        self.curr_time = time.time()
-
-    def triggered(self) -> bool:
-        return self.curr_time - self.prev_time > self.thres
-
-    def reset(self) -> None:
-        self.report = self.report_after_first  # type: ignore
-
+# debouncing ----------------------------------------------------------------------------------
+# load debounce module - from the same directory as this file
+spec = importlib.util.spec_from_file_location("debounce", dir_ / "debounce.py")
+if spec == None:
+    raise RuntimeError("Couldn't find debounce.py in current dir.")
+debounce = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(debounce)  # type: ignore
 
 # Do not flood the web server with queries, otherwise it may block your IP.
-keys_monitor = KeystrokeMonitor()
+debouncer = debounce.Debouncer(init_delay=0.4, state_path=config_path / "debounce")
 
 
 # supplementary functions ---------------------------------------------------------------------
@@ -172,7 +154,8 @@ class Plugin(v0.QueryHandler):
             p.mkdir(parents=False, exist_ok=True)
 
     def finalize(self):
-        pass
+        v0.info(f"{md_name} - {debouncer.stats}")
+        debouncer.save()
 
     def get_as_item(self, query, result: BingImage):
         """Return an item.
@@ -213,10 +196,9 @@ class Plugin(v0.QueryHandler):
             query_str = query.string
 
             if len(query_str) < 2:
-                keys_monitor.reset()
+                debouncer.cancel()
 
-            keys_monitor.report()
-            if not keys_monitor.triggered():
+            if not debouncer.wait(query):
                 return
 
             bing_images = list(bing_search_set_download(query=query_str, limit=3))
@@ -1,5 +1,6 @@
 """Access UNIX Password Manager Items using fuzzy search."""
 
+import importlib.util
 import os
 import shutil
 import subprocess
@@ -10,7 +11,6 @@ from typing import Sequence
 
 import albert as v0
 import gi
-from fuzzywuzzy import process
 
 gi.require_version("Notify", "0.7")  # isort:skip
 gi.require_version("GdkPixbuf", "2.0")  # isort:skip
@@ -40,6 +40,7 @@ pass_dir = Path(
 # https://gist.github.com/bergercookie/d808bade22e62afbb2abe64fb1d20688
 # For an updated version feel free to contact me.
 pass_open_doc = shutil.which("pass_open_doc")
+has_pass_open_doc = shutil.which("pass-open-doc") is not None
 pass_open_doc_exts = [
     ".jpg",
     ".jpeg",
@@ -50,37 +51,35 @@ pass_open_doc_exts = [
 
 def pass_open_doc_compatible(path: Path) -> bool:
     """Determine if the given path can be opened via pass_open_doc."""
-    if not shutil.which("pass-open-doc"):
+    if not has_pass_open_doc:
         return False
 
     return len(path.suffixes) >= 2 and path.suffixes[-2] in pass_open_doc_exts
 
 
-# passwords cache -----------------------------------------------------------------------------
-class PasswordsCacheManager:
-    def __init__(self, pass_dir: Path):
-        self.refresh = True
-        self._pass_dir = pass_dir
+def load_module(name: str):
+    """Load a module from the same directory as this file."""
+    dir_ = Path(__file__).absolute().parent
+    spec = importlib.util.spec_from_file_location(name, dir_ / f"{name}.py")
+    if spec == None:
+        raise RuntimeError(f"Couldn't find {name}.py in current dir.")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore
+    return module
 
-    def _refresh_passwords(self) -> Sequence[Path]:
-        passwords = tuple(self._pass_dir.rglob("**/*.gpg"))
-        save_data("\n".join((str(p) for p in passwords)), "password_paths")
 
-        return passwords
+decrypt = load_module("decrypt")
+passindex = load_module("passindex")
+passsearch = load_module("passsearch")
 
-    def get_all_gpg_files(self) -> Sequence[Path]:
-        """Get a list of all the ggp-encrypted files under the given dir."""
-        passwords: Sequence[Path]
-        if self.refresh is True or not data_exists("password_paths"):
-            passwords = self._refresh_passwords()
-            self.refresh = False
-        else:
-            passwords = tuple(Path(p) for p in load_data("password_paths"))
+# runs the decryptions - one at a time, off the UI thread
+decrypt_worker = decrypt.DecryptWorker(on_error=lambda msg: v0.critical(msg))
 
-        return passwords
-
-
-passwords_cache = PasswordsCacheManager(pass_dir=pass_dir)
+# all the entries of the password store - kept up to date in the background
+pass_index = passindex.PassIndex(root=pass_dir, index_path=cache_path / "index.json")
+# updated in place, entry by entry, from the thread that updates pass_index
+search_index = passsearch.SearchIndex()
+pass_index.add_listener(lambda added, removed: search_index.update(added, removed))
 
 
 # plugin main functions -----------------------------------------------------------------------
@@ -92,6 +91,21 @@ def do_notify(msg: str, image=None):
     n.show()
 
 
+def copy_password(name: str):
+    """Copy the given password to the clipboard - in the background.
+
+    pass itself does the copying, so that it also restores the clipboard after a while.
+    """
+
+    def job():
+        proc = subprocess.run(["pass", "--clip", name], capture_output=True, check=False)
+        if proc.returncode != 0:
+            do_notify(f"Couldn't copy {name}: {proc.stderr.decode(errors='replace').strip()}")
+
+    if not decrypt_worker.submit(name, job):
+        do_notify("Still decrypting - please try again in a bit.")
+
+
 def generate_passwd_cmd(passwd_name: str) -> str:
     return f"pass generate -c -f {passwd_name}"
 
@@ -119,7 +133,7 @@ def get_as_item(query, password_path: Path):
     actions.insert(0, ProcAction("Edit", ["pass", "edit", full_path_rel_root_str]))
     actions.insert(
         0,
-        ProcAction("Copy", ["pass", "--clip", full_path_rel_root_str]),
+        FuncAction("Copy", lambda name=full_path_rel_root_str: copy_password(name)),
     )
 
     if pass_open_doc_compatible(password_path):
@@ -215,8 +229,12 @@ class Plugin(v0.QueryHandler):
         for p in (cache_path, config_path, data_path):
             p.mkdir(parents=False, exist_ok=True)
 
+        pass_index.start()
+        decrypt_worker.start()
+
     def finalize(self):
-        pass
+        decrypt_worker.stop()
+        pass_index.stop()
 
     def handleQuery(self, query) -> None:
         results = []
@@ -224,7 +242,6 @@ class Plugin(v0.QueryHandler):
         try:
             query_str = query.string.strip()
             if len(query_str) == 0:
-                passwords_cache.refresh = True
                 results.append(
                     v0.Item(
                         id=md_name,
@@ -274,13 +291,9 @@ class Plugin(v0.QueryHandler):
                         )
                     )
 
-            # get a list of all the paths under pass_dir
-            gpg_files = passwords_cache.get_all_gpg_files()
-
-            # fuzzy search on the paths list
-            matched = process.extract(query_str, gpg_files, limit=10)
-            for m in [elem[0] for elem in matched]:
-                results.append(get_as_item(query, m))
+            # search on the names of the entries - pass-compatible paths
+            for name in search_index.search(query_str, limit=10):
+                results.append(get_as_item(query, pass_index.path(name)))
 
         except Exception:  # user to report error
             print(traceback.format_exc())
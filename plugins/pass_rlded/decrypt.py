@@ -0,0 +1,279 @@
+"""Decrypt password-store entries off the UI thread.
+
+All the jobs go through a single worker thread with a bounded queue. Running them one at a
+time lets gpg-agent ask for the passphrase once - the jobs queued after the first one find
+it cached in the agent instead of popping up a pinentry dialog each. Jobs for a key that's
+already queued are dropped, as are new jobs while the queue is full.
+
+Decrypted secrets can be kept around for a short while, so that using the same one a few
+times in a row doesn't invoke gpg each time. They're held in mlock-ed - never swapped out -
+buffers, which are zeroed as soon as they expire.
+"""
+
+import ctypes
+import ctypes.util
+import queue
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+gpg_decrypt_cmd = ["gpg", "--quiet", "--yes", "--batch", "--use-agent", "--decrypt"]
+
+# maximum size of a decrypted secret [bytes]
+secret_capacity = 16 * 1024
+
+_libc: Optional[ctypes.CDLL]
+try:
+    _libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+except OSError:
+    _libc = None
+
+
+def _buffer_address(buf: bytearray) -> Tuple[ctypes.c_void_p, ctypes.c_size_t]:
+    c_buf = (ctypes.c_char * len(buf)).from_buffer(buf)
+    return ctypes.c_void_p(ctypes.addressof(c_buf)), ctypes.c_size_t(len(buf))
+
+
+class SecretBuffer:
+    """Fixed-size buffer for a secret - mlock-ed if possible, zeroed by :meth:`wipe`."""
+
+    def __init__(self, capacity: int = secret_capacity):
+        self._buf = bytearray(capacity)
+        self._len = 0
+        self._locked = False
+        if _libc is not None and hasattr(_libc, "mlock"):
+            self._locked = _libc.mlock(*_buffer_address(self._buf)) == 0
+
+    @property
+    def data(self) -> memoryview:
+        """The secret - don't hold on to it, it's zeroed once the buffer is wiped."""
+        return memoryview(self._buf)[: self._len]
+
+    @property
+    def locked(self) -> bool:
+        return self._locked
+
+    def read_from(self, f):
+        """Read the whole of the given unbuffered binary stream into the buffer."""
+        view = memoryview(self._buf)
+        while True:
+            if self._len == len(self._buf):
+                if f.read(1):
+                    raise ValueError(f"Secret exceeds {len(self._buf)} bytes")
+                break
+
+            n = f.readinto(view[self._len :])
+            if not n:
+                break
+            self._len += n
+
+    def wipe(self):
+        ctypes.memset(_buffer_address(self._buf)[0], 0, len(self._buf))
+        self._len = 0
+        if self._locked:
+            _libc.munlock(*_buffer_address(self._buf))  # type: ignore
+            self._locked = False
+
+    def __del__(self):
+        self.wipe()
+
+
+def decrypt_file(path: Path) -> SecretBuffer:
+    """Decrypt the given file with gpg, straight into a :class:`SecretBuffer`."""
+    secret = SecretBuffer()
+    proc = subprocess.Popen(
+        [*gpg_decrypt_cmd, str(path)],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        bufsize=0,
+    )
+    try:
+        secret.read_from(proc.stdout)
+    finally:
+        proc.stdout.close()  # type: ignore
+        stderr = proc.stderr.read().decode(errors="replace")  # type: ignore
+        proc.stderr.close()  # type: ignore
+        returncode = proc.wait()
+
+    if returncode != 0:
+        secret.wipe()
+        raise RuntimeError(f"Couldn't decrypt {path}: {stderr.strip()}")
+
+    return secret
+
+
+class SecretCache:
+    """Decrypted secrets, each one kept for ``ttl`` seconds since it was decrypted."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._secrets: Dict[Path, Tuple[SecretBuffer, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: Path) -> Optional[SecretBuffer]:
+        with self._lock:
+            entry = self._secrets.get(path)
+            if entry is None or entry[1] < time.monotonic():
+                return None
+            return entry[0]
+
+    def use(self, path: Path, fn: Callable[[SecretBuffer], T]) -> Optional[T]:
+        """Call ``fn`` with the cached secret - None if it's not cached.
+
+        The secret can't expire while ``fn`` is running.
+        """
+        with self._lock:
+            entry = self._secrets.get(path)
+            if entry is None or entry[1] < time.monotonic():
+                return None
+            return fn(entry[0])
+
+    def put(self, path: Path, secret: SecretBuffer):
+        with self._lock:
+            previous = self._secrets.pop(path, None)
+            if previous is not None:
+                previous[0].wipe()
+            self._secrets[path] = (secret, time.monotonic() + self.ttl)
+
+    def discard(self, path: Path):
+        """Wipe the secret of the given file, if it's cached."""
+        with self._lock:
+            entry = self._secrets.pop(path, None)
+            if entry is not None:
+                entry[0].wipe()
+
+    def expire(self):
+        """Wipe the secrets that expired."""
+        now = time.monotonic()
+        with self._lock:
+            for path, (secret, expiry) in list(self._secrets.items()):
+                if expiry < now:
+                    secret.wipe()
+                    del self._secrets[path]
+
+    def clear(self):
+        with self._lock:
+            for secret, _ in self._secrets.values():
+                secret.wipe()
+            self._secrets.clear()
+
+
+class DecryptWorker:
+    """Single thread running the decryption jobs - see the module docstring.
+
+    Errors of the jobs are passed to ``on_error``, as text.
+    """
+
+    def __init__(
+        self,
+        max_pending: int = 8,
+        ttl: float = 30.0,
+        on_error: Callable[[str], None] = print,
+    ):
+        self._queue: "queue.Queue[Optional[Tuple[str, Callable[[], None]]]]" = queue.Queue(
+            maxsize=max_pending
+        )
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._cache = SecretCache(ttl)
+        self._on_error = on_error
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def ttl(self) -> float:
+        """How long to keep the cached secrets around [s]."""
+        return self._cache.ttl
+
+    @ttl.setter
+    def ttl(self, ttl: float):
+        self._cache.ttl = ttl
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            # wakes the worker up if it's idle - if the queue is full, it's busy anyway
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass
+            # don't hang around for a pinentry dialog nobody answers
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        self._cache.clear()
+
+    def submit(self, key: str, job: Callable[[], None]) -> bool:
+        """Queue a job - return False if it's dropped.
+
+        Jobs are dropped if there's already one pending for the same key or if the queue is
+        full.
+        """
+        with self._lock:
+            if key in self._pending:
+                return False
+            try:
+                self._queue.put_nowait((key, job))
+            except queue.Full:
+                return False
+            self._pending.add(key)
+
+        return True
+
+    def decrypt(self, path: Path, cache: bool = False) -> SecretBuffer:
+        """Decrypt the given file - to be called from within a job.
+
+        With ``cache``, the secret is kept for a while and must not be wiped by the caller.
+        Otherwise it's the caller's to wipe.
+        """
+        if not cache:
+            return decrypt_file(path)
+
+        secret = self._cache.get(path)
+        if secret is None:
+            secret = decrypt_file(path)
+            self._cache.put(path, secret)
+
+        return secret
+
+    def use_cached(self, path: Path, fn: Callable[[SecretBuffer], T]) -> Optional[T]:
+        """Call ``fn`` with the cached secret of the given file - from any thread.
+
+        Return None if the secret is not cached - nothing gets decrypted.
+        """
+        return self._cache.use(path, fn)
+
+    def forget(self, path: Path):
+        """Wipe the cached secret of the given file, if there's one - from any thread."""
+        self._cache.discard(path)
+
+    def _run(self):
+        # the queued jobs are dropped once stopped
+        while not self._stop.is_set():
+            try:
+                item = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                self._cache.expire()
+                continue
+
+            if item is None or self._stop.is_set():
+                break
+
+            key, job = item
+            try:
+                job()
+            except Exception as e:
+                self._on_error(f"{key}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(key)
+                self._cache.expire()
@@ -0,0 +1,303 @@
+"""In-memory index of the entries of a password store.
+
+The store is walked once and the index is then kept up to date via inotify - queries never
+touch the filesystem. The entries are also persisted (JSON, one entry per list item - any
+character allowed), so that the index is usable right away on the next start, while the
+store is being walked again in the background.
+
+inotify is accessed directly through libc. Where it's not available, the store is walked
+periodically instead.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import select
+import struct
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+suffix = ".gpg"
+
+# period of the full walks, when inotify is not available [s]
+poll_interval = 30.0
+# how long to wait for more changes before persisting the index [s]
+save_delay = 2.0
+
+# inotify(7) --------------------------------------------------------------------------------
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+_watch_mask = (
+    IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+) | IN_ONLYDIR
+_event_header = struct.Struct("iIII")
+
+
+class Inotify:
+    """Minimal inotify wrapper - raises OSError if inotify is not available."""
+
+    def __init__(self):
+        libname = ctypes.util.find_library("c")
+        if libname is None:
+            raise OSError(errno.ENOSYS, "libc not found")
+
+        self._libc = ctypes.CDLL(libname, use_errno=True)
+        if not hasattr(self._libc, "inotify_init1"):
+            raise OSError(errno.ENOSYS, "inotify is not available")
+
+        self.fd = self._libc.inotify_init1(os.O_CLOEXEC | os.O_NONBLOCK)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: Path, mask: int = _watch_mask) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(path))
+
+        return wd
+
+    def read(self, timeout: float) -> List[Tuple[int, int, int, str]]:
+        """Wait up to ``timeout`` seconds for events - (wd, mask, cookie, name) tuples."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        events = []
+        i = 0
+        while i < len(buf):
+            wd, mask, cookie, length = _event_header.unpack_from(buf, i)
+            i += _event_header.size
+            name = os.fsdecode(buf[i : i + length].rstrip(b"\0"))
+            i += length
+            events.append((wd, mask, cookie, name))
+
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+# index -------------------------------------------------------------------------------------
+class PassIndex:
+    """Names of all the entries in the store - relative paths without the .gpg suffix.
+
+    Call :meth:`start` to load the persisted index, walk the store and start watching it
+    in the background and :meth:`stop` to stop watching it.
+    """
+
+    def __init__(self, root: Path, index_path: Path):
+        self._root = root
+        self._index_path = index_path
+        self._names: Set[str] = set()
+        self._sorted: Optional[Tuple[str, ...]] = ()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[Set[str], Set[str]], None]] = []
+
+        self._inotify: Optional[Inotify] = None
+        self._wds: Dict[int, str] = {}
+
+    @property
+    def root(self) -> Path:
+        return self._root
+
+    @property
+    def names(self) -> Tuple[str, ...]:
+        """Sorted snapshot of the entry names - cheap unless the store changed."""
+        with self._lock:
+            if self._sorted is None:
+                self._sorted = tuple(sorted(self._names))
+            return self._sorted
+
+    def path(self, name: str) -> Path:
+        return self._root / f"{name}{suffix}"
+
+    def add_listener(self, fn: Callable[[Set[str], Set[str]], None]):
+        """Call ``fn(added, removed)`` from the indexing thread whenever the entries change."""
+        self._listeners.append(fn)
+
+    # persistence ---------------------------------------------------------------------------
+    def load(self) -> bool:
+        try:
+            data = json.loads(self._index_path.read_text())
+            if data["root"] != str(self._root):
+                return False
+            names = set(data["names"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+        self._replace(names)
+        return True
+
+    def save(self):
+        tmp_path = self._index_path.with_name(f"{self._index_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({"root": str(self._root), "names": list(self.names)}))
+        tmp_path.replace(self._index_path)
+
+    # updates -------------------------------------------------------------------------------
+    def _replace(self, names: Set[str]):
+        with self._lock:
+            old_names = self._names
+            self._names = names
+            self._sorted = None
+        self._notify(names - old_names, old_names - names)
+
+    def _update(
+        self, added: Iterable[str] = (), removed: Iterable[str] = (), removed_dir: str = ""
+    ):
+        with self._lock:
+            removed_names = self._names.intersection(removed)
+            if removed_dir:
+                prefix = f"{removed_dir}/"
+                removed_names.update(n for n in self._names if n.startswith(prefix))
+            self._names.difference_update(removed_names)
+            added_names = set(added).difference(self._names)
+            self._names.update(added_names)
+            if removed_names or added_names:
+                self._sorted = None
+        # only what actually changed - a re-created entry is both removed and added
+        self._notify(added_names, removed_names)
+
+    def _notify(self, added: Set[str], removed: Set[str]):
+        if not added and not removed:
+            return
+
+        for fn in self._listeners:
+            fn(added, removed)
+
+    def _scan(self, subdir: str = "") -> Set[str]:
+        """Walk the given subdirectory - relative to the root.
+
+        Every directory is watched before it's listed, so that nothing created in the
+        meantime is missed. Hidden directories - e.g., .git - are skipped.
+        """
+        names: Set[str] = set()
+        stack = [subdir]
+        while stack:
+            rel = stack.pop()
+            dir_ = self._root / rel
+            if self._inotify is not None:
+                try:
+                    self._wds[self._inotify.add_watch(dir_)] = rel
+                except OSError:
+                    pass
+
+            try:
+                entries = list(os.scandir(dir_))
+            except OSError:
+                continue
+
+            for entry in entries:
+                entry_rel = os.path.join(rel, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    if not entry.name.startswith("."):
+                        stack.append(entry_rel)
+                elif entry.name.endswith(suffix):
+                    names.add(entry_rel[: -len(suffix)])
+
+        return names
+
+    def rescan(self):
+        """Walk the whole store again."""
+        self._wds.clear()
+        self._replace(self._scan())
+
+    # background thread ---------------------------------------------------------------------
+    def start(self):
+        self.load()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        try:
+            self._inotify = Inotify()
+        except OSError:
+            self._inotify = None
+
+        try:
+            self.rescan()
+            self.save()
+            if self._inotify is None:
+                while not self._stop.wait(poll_interval):
+                    self.rescan()
+                    self.save()
+            else:
+                self._watch()
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+
+    def _watch(self):
+        assert self._inotify is not None
+        dirty = False
+        while not self._stop.is_set():
+            events = self._inotify.read(timeout=save_delay if dirty else 1.0)
+            if not events:
+                if dirty:
+                    self.save()
+                    dirty = False
+                continue
+
+            for wd, mask, _, name in events:
+                dirty = True
+                if mask & IN_Q_OVERFLOW:
+                    self.rescan()
+                    break
+
+                if mask & IN_IGNORED:
+                    self._wds.pop(wd, None)
+                    continue
+
+                parent = self._wds.get(wd)
+                if parent is None or not name:
+                    continue
+
+                rel = os.path.join(parent, name)
+                if mask & IN_ISDIR:
+                    if name.startswith("."):
+                        continue
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._update(added=self._scan(rel))
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        self._unwatch(rel)
+                        self._update(removed_dir=rel)
+                elif name.endswith(suffix):
+                    entry = rel[: -len(suffix)]
+                    if mask & (IN_CREATE | IN_MOVED_TO):
+                        self._update(added=[entry])
+                    elif mask & (IN_DELETE | IN_MOVED_FROM):
+                        self._update(removed=[entry])
+
+    def _unwatch(self, rel: str):
+        """Forget about the watches of a directory that's gone - or moved elsewhere."""
+        prefix = f"{rel}/"
+        for wd, dir_rel in list(self._wds.items()):
+            if dir_rel == rel or dir_rel.startswith(prefix):
+                del self._wds[wd]
@@ -0,0 +1,220 @@
+"""Search over the entries of a password store, by their path segments.
+
+Every entry is split into its path segments - folders and basename, relative to the store,
+without the .gpg suffix - and every segment into its words. A query is a list of terms,
+each one a chain of ``/``-separated query segments that has to match consecutive segments
+of the entry - as prefixes or abbreviations, e.g., ``w/gh`` matches ``work/github/me``.
+Only if nothing matches that way are the relative names fuzzy-matched.
+"""
+
+import bisect
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+from fuzzywuzzy import process
+
+_word_sep_re = re.compile(r"[\s.,;_+@\-]+")
+
+
+def get_segments(name: str) -> List[str]:
+    """
+    >>> get_segments("Work/GitHub/me@mail.com")
+    ['work', 'github', 'me@mail.com']
+    """
+    return [s for s in name.lower().split("/") if s]
+
+
+def get_words(segment: str) -> List[str]:
+    """
+    >>> get_words("me@mail.com")
+    ['me@mail.com', 'me', 'mail', 'com']
+    """
+    return [segment, *[w for w in _word_sep_re.split(segment) if w and w != segment]]
+
+
+def is_abbreviation(prefix: str, segment: str) -> bool:
+    """
+    >>> is_abbreviation("gh", "github"), is_abbreviation("hb", "github")
+    (True, False)
+    """
+    if not prefix or not segment.startswith(prefix[0]):
+        return False
+
+    chars = iter(segment)
+    return all(c in chars for c in prefix)
+
+
+def match_segment(prefix: str, segment: str) -> int:
+    """Score of a segment against a query segment - 0 if they don't match.
+
+    In decreasing order - equal, prefix, prefix of one of its words, abbreviation.
+    """
+    if segment == prefix:
+        return 8
+    if segment.startswith(prefix):
+        return 6
+    if any(w.startswith(prefix) for w in get_words(segment)[1:]):
+        return 4
+    if is_abbreviation(prefix, segment):
+        return 2
+    return 0
+
+
+def match_chain(chain: Sequence[str], segments: Sequence[str]) -> int:
+    """Best score of the chain of prefixes against consecutive segments - 0 if no match.
+
+    Matches that end on the basename get a bonus.
+
+    >>> match_chain(["w", "gh"], ["work", "github", "me"])
+    8
+    >>> match_chain(["gh", "me"], ["work", "github", "me"])
+    11
+    >>> match_chain(["me", "w"], ["work", "github", "me"])
+    0
+    """
+    best = 0
+    for start in range(len(segments) - len(chain) + 1):
+        scores = [match_segment(p, s) for p, s in zip(chain, segments[start:])]
+        if all(scores):
+            score = sum(scores) + (1 if start + len(chain) == len(segments) else 0)
+            best = max(best, score)
+
+    return best
+
+
+def parse_query(query_str: str) -> List[List[str]]:
+    """
+    >>> parse_query(" w/gh  me ")
+    [['w', 'gh'], ['me']]
+    """
+    return [get_segments(term) for term in query_str.split() if get_segments(term)]
+
+
+class SearchIndex:
+    """Index over the given entry names - look them up with :meth:`search`.
+
+    Entries can be added and removed one at a time, without rebuilding the whole index -
+    from any thread.
+
+    >>> index = SearchIndex(["work/github/me", "work/gitlab", "home/wifi", "shops/work-shoes"])
+    >>> index.search("w/gh")
+    ['work/github/me']
+    >>> index.search("work")
+    ['work/gitlab', 'work/github/me', 'shops/work-shoes']
+    >>> index.search("git me")
+    ['work/github/me']
+    >>> index.search("wfi", limit=1)
+    ['home/wifi']
+    >>> index.update(added=["work/gitea"], removed=["work/gitlab"])
+    >>> index.search("work/git")
+    ['work/gitea', 'work/github/me']
+    """
+
+    def __init__(self, names: Iterable[str] = ()):
+        # entry id -> name/segments - None for the ids of removed entries, reused later on
+        self._names: List[Optional[str]] = []
+        self._segments: List[List[str]] = []
+        self._ids: Dict[str, int] = {}
+        self._free: List[int] = []
+
+        self._words: Dict[str, Set[int]] = defaultdict(set)
+        self._sorted_words: List[str] = []
+        self._lock = threading.Lock()
+
+        self.update(added=names)
+
+    @property
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._ids)
+
+    def update(self, added: Iterable[str] = (), removed: Iterable[str] = ()):
+        """Remove and then add the given entries."""
+        with self._lock:
+            for name in removed:
+                self._remove(name)
+            for name in added:
+                self._add(name)
+
+    def _add(self, name: str):
+        if name in self._ids:
+            return
+
+        i = self._free.pop() if self._free else len(self._names)
+        if i == len(self._names):
+            self._names.append(None)
+            self._segments.append([])
+        self._names[i] = name
+        self._segments[i] = get_segments(name)
+        self._ids[name] = i
+
+        for word in self._words_of(i):
+            ids = self._words[word]
+            if not ids:
+                bisect.insort(self._sorted_words, word)
+            ids.add(i)
+
+    def _remove(self, name: str):
+        i = self._ids.pop(name, None)
+        if i is None:
+            return
+
+        for word in self._words_of(i):
+            ids = self._words[word]
+            ids.discard(i)
+            if not ids:
+                del self._words[word]
+                del self._sorted_words[bisect.bisect_left(self._sorted_words, word)]
+
+        self._names[i] = None
+        self._segments[i] = []
+        self._free.append(i)
+
+    def _words_of(self, i: int) -> Set[str]:
+        return {word for segment in self._segments[i] for word in get_words(segment)}
+
+    def _candidates(self, prefix: str) -> Set[int]:
+        """Ids of the entries with a segment or a word starting with the prefix.
+
+        Abbreviations only share their first character with the segment - that's all that
+        can be looked up.
+        """
+        ids: Set[int] = set()
+        i = bisect.bisect_left(self._sorted_words, prefix)
+        while i < len(self._sorted_words) and self._sorted_words[i].startswith(prefix):
+            ids.update(self._words[self._sorted_words[i]])
+            i += 1
+
+        return ids
+
+    def search(self, query_str: str, limit: int = 10) -> List[str]:
+        """Return up to ``limit`` names that match the query, best first."""
+        chains = parse_query(query_str)
+        if not chains:
+            return []
+
+        with self._lock:
+            candidates: Optional[Set[int]] = None
+            for chain in chains:
+                for prefix in chain:
+                    ids = self._candidates(prefix[0])
+                    candidates = ids if candidates is None else candidates & ids
+
+            scores: Dict[int, int] = {}
+            for i in candidates or ():
+                chain_scores = [match_chain(chain, self._segments[i]) for chain in chains]
+                if all(chain_scores):
+                    scores[i] = sum(chain_scores)
+
+            if scores:
+                ranked = sorted(
+                    scores, key=lambda i: (-scores[i], len(self._segments[i]), self._names[i])
+                )
+                return [self._names[i] for i in ranked[:limit]]  # type: ignore
+
+            choices = {i: name for i, name in enumerate(self._names) if name is not None}
+
+        # fall back to fuzzy-matching the relative names
+        return [m[0] for m in process.extract(query_str, choices, limit=limit)]
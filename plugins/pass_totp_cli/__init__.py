@@ -1,9 +1,11 @@
-"""2FA codes using otp-cli and pass."""
+"""2FA codes out of the seeds stored in pass - by totp-cli or pass-otp."""
 
+import importlib.util
 import os
-import subprocess
+import time
 import traceback
 from pathlib import Path
+from typing import Optional, Sequence, Tuple
 
 import albert as v0
 import gi
@@ -13,14 +15,14 @@ gi.require_version("GdkPixbuf", "2.0")  # isort:skip
 from gi.repository import GdkPixbuf, Notify  # isort:skip  # type: ignore
 
 md_name = "OTP/2FA Codes"
-md_description = "Fetch OTP codes using otp-cli and pass"
+md_description = "Generate OTP codes out of the seeds stored in pass"
 md_iid = "0.5"
 md_version = "0.2"
 md_maintainers = "Nikos Koukis"
 md_url = (
     "https://github.com/bergercookie/awesome-albert-plugins/blob/master/plugins/pass_totp_cli"
 )
-md_bin_dependencies = ["pass", "totp"]
+md_bin_dependencies = ["gpg"]
 
 icon_path = str(Path(__file__).parent / "pass_totp_cli")
 
@@ -45,28 +47,135 @@ def do_notify(msg: str, image=None):
     n.show()
 
 
+def load_module(name: str):
+    """Load a module from the same directory as this file."""
+    dir_ = Path(__file__).absolute().parent
+    spec = importlib.util.spec_from_file_location(name, dir_ / f"{name}.py")
+    if spec == None:
+        raise RuntimeError(f"Couldn't find {name}.py in current dir.")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+decrypt = load_module("decrypt")
+otp = load_module("otp")
+passindex = load_module("passindex")
+
+# how long to keep the decrypted seeds around [s] - override it in config_path/secret_ttl
+default_secret_ttl = 30.0
+
+# runs the decryptions - one at a time, off the UI thread
+decrypt_worker = decrypt.DecryptWorker(on_error=lambda msg: v0.critical(msg))
+
+# all the 2FA entries - kept up to date in the background
+totp_index = passindex.PassIndex(root=pass_2fa_dir, index_path=cache_path / "index.json")
+
+
 # supplementary functions ---------------------------------------------------------------------
-def totp_show(name: str) -> str:
+def get_display_name(entry: str) -> str:
+    """Name of an entry, as shown to the user.
+
+    totp-cli stores the seeds as 2fa/<name>/code - anything else is shown as is.
+
+    >>> get_display_name("github/code"), get_display_name("acme/me")
+    ('github', 'acme/me')
+    """
+    parent, _, basename = entry.rpartition("/")
+    return parent if parent and basename == "code" else entry
+
+
+def get_cached_code(path: Path, t: Optional[float] = None) -> Optional[Tuple[str, int]]:
+    """The code of the given entry at ``t`` - now by default - and its validity.
+
+    None unless the seed of the entry is cached - nothing gets decrypted.
+    """
+    return decrypt_worker.use_cached(path, lambda seed: otp.code_of(seed.data, t))
+
+
+def is_cached(path: Path) -> bool:
+    return decrypt_worker.use_cached(path, lambda seed: True) is not None
+
+
+def cache_seed(path: Path) -> bool:
+    """Decrypt the seed of the given entry and keep it around - to be called from a job.
+
+    Return False if the entry is not a TOTP seed - it's not kept around then.
+    """
+    seed = decrypt_worker.decrypt(path, cache=True)
     try:
-        return subprocess.check_output(["totp", "show", name]).decode("utf-8")
-    except Exception:
-        exc = f"Exception:\n\n{traceback.format_exc()}"
-        v0.critical(exc)
-        do_notify(f"Couldn't fetch the OTP code. {exc}")
-        return ""
+        key, _ = otp.parse_seed(seed.data)
+    except ValueError:
+        decrypt_worker.forget(path)
+        return False
+
+    otp.wipe(key)
+    return True
+
+
+def copy_code(name: str, path: Path):
+    """Copy the current code of the given entry to the clipboard - if its seed is cached.
+
+    Otherwise the seed is decrypted in the background and the code is copied the next time
+    around - the clipboard can only be used from the UI thread.
+    """
+    try:
+        cached = get_cached_code(path)
+    except ValueError:
+        decrypt_worker.forget(path)
+        do_notify(f"{name} is not a TOTP seed")
+        return
+    if cached is not None:
+        v0.setClipboardText(cached[0])
+        return
+
+    def job():
+        if cache_seed(path):
+            do_notify(f"2FA code for {name} ready - press [ENTER] again to copy it")
+        else:
+            do_notify(f"{name} is not a TOTP seed")
+
+    if not decrypt_worker.submit(name, job):
+        do_notify("Still decrypting - please try again in a bit.")
+
 
+def decrypt_all(paths: Sequence[Path]):
+    """Decrypt the seeds of the given entries in the background - to show their codes."""
+
+    def job():
+        for path in paths:
+            cache_seed(path)
+        do_notify("2FA codes ready - re-run the query to see them")
+
+    if not decrypt_worker.submit("decrypt-all", job):
+        do_notify("Still decrypting - please try again in a bit.")
+
+
+def get_as_item(query, entry: str, now: float):
+    name = get_display_name(entry)
+    path = totp_index.path(entry)
+
+    subtext = "Press [ENTER] to copy the code"
+    try:
+        cached = get_cached_code(path, now)
+    except ValueError:
+        # e.g., recovery codes stored next to the seeds
+        cached = None
+        subtext = "Not a TOTP seed"
+    if cached is not None:
+        code, validity = cached
+        subtext = f"{code} - valid for {validity}s"
 
-def get_as_item(path: Path):
-    name = str(path.relative_to(pass_2fa_dir).parent)
     return v0.Item(
         id=md_name,
         icon=[icon_path],
         text=name,
-        completion="",
+        subtext=subtext,
+        completion=f"{query.trigger}{name}",
         actions=[
             FuncAction(
                 "Copy 2FA code",
-                lambda name=name: totp_show(name=name).strip(),
+                lambda name=name, path=path: copy_code(name=name, path=path),
             )
         ],
     )
@@ -126,15 +235,46 @@ class Plugin(v0.QueryHandler):
         for p in (cache_path, config_path, data_path):
             p.mkdir(parents=False, exist_ok=True)
 
+        try:
+            decrypt_worker.ttl = float(load_data("secret_ttl"))
+        except (OSError, IndexError, ValueError):
+            decrypt_worker.ttl = default_secret_ttl
+        decrypt_worker.start()
+        totp_index.start()
+
     def finalize(self):
-        pass
+        totp_index.stop()
+        decrypt_worker.stop()
 
     def handleQuery(self, query) -> None:
         results = []
 
         try:
-            for path in pass_2fa_dir.glob("**/*.gpg"):
-                results.append(get_as_item(path))
+            query_str = query.string.strip().lower()
+            entries = [
+                entry
+                for entry in totp_index.names
+                if query_str in get_display_name(entry).lower()
+            ]
+
+            now = time.time()
+            for entry in entries:
+                results.append(get_as_item(query, entry, now))
+
+            paths = [totp_index.path(entry) for entry in entries]
+            if not all(is_cached(path) for path in paths):
+                results.append(
+                    v0.Item(
+                        id=md_name,
+                        icon=[icon_path],
+                        text="Show the codes",
+                        subtext=f"Decrypt the seeds of the {len(paths)} entries listed",
+                        completion=query.trigger + query.string,
+                        actions=[
+                            FuncAction("Decrypt seeds", lambda paths=paths: decrypt_all(paths))
+                        ],
+                    )
+                )
 
         except Exception:  # user to report error
             results.insert(
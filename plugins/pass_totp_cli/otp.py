@@ -0,0 +1,182 @@
+"""One-time passwords (RFC 4226, RFC 6238), computed in-process.
+
+The seed is either a bare base32 secret - as stored by totp-cli - or an otpauth:// URI - as
+stored by pass-otp - in which case its digits, period and algorithm are honoured as well.
+The secrets are only handled as bytearrays/memoryviews, so that the caller can zero them
+once done.
+"""
+
+import hmac
+import struct
+import time
+from typing import Iterator, NamedTuple, Optional, Tuple
+from urllib.parse import unquote
+
+
+class OtpParams(NamedTuple):
+    digits: int = 6
+    period: int = 30
+    algorithm: str = "sha1"
+
+
+_b32_alphabet = b"ABCDEFGHIJKLMNOPQRSTUVWXYZ234567"
+_b32_values = {c: i for i, c in enumerate(_b32_alphabet)}
+_b32_values.update({c + 32: i for i, c in enumerate(_b32_alphabet) if c >= ord("A")})
+
+
+def first_line(data: memoryview) -> memoryview:
+    r"""
+    >>> bytes(first_line(memoryview(b"JBSWY3DPEHPK3PXP\nuser: me")))
+    b'JBSWY3DPEHPK3PXP'
+    """
+    for i, c in enumerate(data):
+        if c == ord("\n"):
+            return data[:i]
+
+    return data
+
+
+def iter_lines(data: memoryview) -> Iterator[memoryview]:
+    start = 0
+    for i, c in enumerate(data):
+        if c == ord("\n"):
+            yield data[start:i]
+            start = i + 1
+    yield data[start:]
+
+
+def parse_seed(data: memoryview) -> Tuple[bytearray, OtpParams]:
+    r"""Get the key and the parameters out of a decrypted entry.
+
+    >>> key, params = parse_seed(memoryview(b"JBSWY3DPEHPK3PXP\n"))
+    >>> bytes(key), params
+    (b'Hello!\xde\xad\xbe\xef', OtpParams(digits=6, period=30, algorithm='sha1'))
+    >>> key, params = parse_seed(memoryview(
+    ...     b"pass\notpauth://totp/ACME:me?secret=JBSWY3DPEHPK3PXP&digits=8&algorithm=SHA256"
+    ... ))
+    >>> bytes(key), params
+    (b'Hello!\xde\xad\xbe\xef', OtpParams(digits=8, period=30, algorithm='sha256'))
+    """
+    for line in iter_lines(data):
+        if bytes(line[:10]).lower() == b"otpauth://":
+            return _parse_uri(line)
+
+    return b32decode(first_line(data)), OtpParams()
+
+
+def _parse_uri(uri: memoryview) -> Tuple[bytearray, OtpParams]:
+    # the secret is decoded straight out of the URI - it's never copied into a str
+    query_start = next((i + 1 for i, c in enumerate(uri) if c == ord("?")), len(uri))
+    key = None
+    params = {}
+    start = query_start
+    for i in range(query_start, len(uri) + 1):
+        if i < len(uri) and uri[i] != ord("&"):
+            continue
+
+        field = uri[start:i]
+        eq = next((j for j, c in enumerate(field) if c == ord("=")), len(field))
+        name = bytes(field[:eq]).decode(errors="replace").lower()
+        if name == "secret":
+            key = b32decode(field[eq + 1 :])
+        elif name:
+            params[name] = unquote(bytes(field[eq + 1 :]).decode(errors="replace"))
+        start = i + 1
+
+    if key is None:
+        raise ValueError("otpauth URI without a secret")
+
+    return key, OtpParams(
+        digits=int(params.get("digits", 6)),
+        period=int(params.get("period", 30)),
+        algorithm=params.get("algorithm", "sha1").lower(),
+    )
+
+
+def b32decode(encoded: memoryview) -> bytearray:
+    r"""Decode a base32 secret - case, whitespace, dashes and padding don't matter.
+
+    >>> bytes(b32decode(memoryview(b"jbsw y3dp ehpk 3pxp\n")))
+    b'Hello!\xde\xad\xbe\xef'
+    """
+    out = bytearray()
+    acc = 0
+    n_bits = 0
+    for c in encoded:
+        value = _b32_values.get(c)
+        if value is None:
+            if c in b" \t\r\n-=":
+                continue
+            raise ValueError("Invalid base32 secret")
+
+        acc = ((acc << 5) | value) & 0xFFFF
+        n_bits += 5
+        if n_bits >= 8:
+            n_bits -= 8
+            out.append((acc >> n_bits) & 0xFF)
+
+    return out
+
+
+def hotp(key: bytearray, counter: int, digits: int = 6, algorithm: str = "sha1") -> str:
+    """
+    >>> hotp(bytearray(b"12345678901234567890"), 1)
+    '287082'
+    """
+    digest = hmac.new(key, struct.pack(">Q", counter), algorithm).digest()
+    offset = digest[-1] & 0x0F
+    code = struct.unpack(">I", digest[offset : offset + 4])[0] & 0x7FFFFFFF
+    return str(code % 10**digits).zfill(digits)
+
+
+def totp(
+    key: bytearray,
+    t: Optional[float] = None,
+    period: int = 30,
+    digits: int = 6,
+    algorithm: str = "sha1",
+) -> str:
+    """
+    >>> totp(bytearray(b"12345678901234567890"), t=59, digits=8)
+    '94287082'
+    >>> key = bytearray(b"12345678901234567890123456789012")
+    >>> totp(key, t=59, digits=8, algorithm="sha256")
+    '46119246'
+    """
+    if t is None:
+        t = time.time()
+
+    return hotp(key, int(t // period), digits, algorithm)
+
+
+def remaining(t: float, period: int = 30) -> int:
+    """Seconds the code at ``t`` is still valid for.
+
+    >>> remaining(59.5)
+    1
+    """
+    return period - int(t) % period
+
+
+def code_of(data: memoryview, t: Optional[float] = None) -> Tuple[str, int]:
+    """The code of the given decrypted entry at ``t`` - now by default - and its validity.
+
+    The validity is the number of seconds the code is still valid for.
+
+    >>> code_of(memoryview(b"GEZDGNBVGY3TQOJQGEZDGNBVGY3TQOJQ"), t=59)
+    ('287082', 1)
+    """
+    if t is None:
+        t = time.time()
+
+    key, params = parse_seed(data)
+    try:
+        code = totp(key, t, params.period, params.digits, params.algorithm)
+    finally:
+        wipe(key)
+
+    return code, remaining(t, params.period)
+
+
+def wipe(key: bytearray):
+    key[:] = bytes(len(key))
@@ -1,11 +1,11 @@
 """PulseAudio - Set I/O Audio devices and Profile."""
 
+import importlib.util
 import traceback
 from pathlib import Path
 from threading import Lock
-from typing import Dict, List, Union
+from typing import List, Sequence, Union
 
-from fuzzywuzzy import process
 from pulsectl import Pulse, pulsectl
 
 
@@ -35,6 +35,76 @@ data_path = Path(dataLocation()) / "pulse_control"
 
 pulse = Pulse("albert-client")
 
+# step of the volume actions - 5%
+volume_step = 0.05
+
+
+def load_module(name: str):
+    """Load a module from the same directory as this file."""
+    dir_ = Path(__file__).absolute().parent
+    spec = importlib.util.spec_from_file_location(name, dir_ / f"{name}.py")
+    if spec == None:
+        raise RuntimeError(f"Couldn't find {name}.py in current dir.")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+pulsestate = load_module("pulsestate")
+# sinks, sources, streams and cards - kept up to date by the events of the server
+pulse_state = pulsestate.PulseState("albert-client-events")
+
+
+def run_locked(fn):
+    """Run an action on the server - the actions of successive clicks may overlap."""
+    with pulse_lock:
+        fn()
+
+
+def move_all_streams(sink):
+    # the streams of the latest snapshot - as of the click, not as of the query
+    sink_inputs = pulse_state.snapshot.sink_inputs
+    run_locked(lambda: pulsestate.move_streams(pulse, sink_inputs, sink))
+
+
+def get_sink_actions(sink) -> list:
+    """Actions of a sink, besides switching its port.
+
+    Moving the streams and making it the default sink - the one of the streams to come - are
+    separate actions.
+    """
+    return [
+        FuncAction("Move all streams here", lambda: move_all_streams(sink)),
+        FuncAction(
+            "Set as the default sink", lambda: run_locked(lambda: pulse.sink_default_set(sink))
+        ),
+    ]
+
+
+def get_volume_actions(obj) -> list:
+    percent = round(volume_step * 100)
+    return [
+        FuncAction(
+            f"Volume +{percent}%",
+            lambda: run_locked(lambda: pulsestate.change_volume(pulse, obj, volume_step)),
+        ),
+        FuncAction(
+            f"Volume -{percent}%",
+            lambda: run_locked(lambda: pulsestate.change_volume(pulse, obj, -volume_step)),
+        ),
+        FuncAction(
+            "Unmute" if obj.mute else "Mute",
+            lambda: run_locked(lambda: pulse.mute(obj, not obj.mute)),
+        ),
+    ]
+
+
+def get_volume_str(obj) -> str:
+    if obj.mute:
+        return "muted"
+
+    return f"{round(obj.volume.value_flat * 100)}%"
+
 
 class ClipAction(Action):
     def __init__(self, name, copy_text):
@@ -66,8 +136,10 @@ class Plugin(QueryHandler):
         for p in (cache_path, config_path, data_path):
             p.mkdir(parents=False, exist_ok=True)
 
+        pulse_state.start()
+
     def finalize(self):
-        pass
+        pulse_state.stop()
 
     def handleQuery(self, query) -> list:
         """Hook that is called by albert with *every new keypress*."""  # noqa
@@ -76,20 +148,28 @@ class Plugin(QueryHandler):
         try:
             query_str = query.string.strip()
 
-            # avoid racing conditions when multiple queries are running simultaneously (i.e,
-            # current and previous query due to successive keystrokes)
-            pulse_lock.acquire()
-            sources_sinks: List[Union[pulsectl.PulseSourceInfo, pulsectl.PulseSinkInfo]] = [
-                *pulse.sink_list(),
-                *pulse.source_list(),
-            ]
-            cards: List[pulsectl.PulseCardInfo] = pulse.card_list()
-            pulse_lock.release()
-
-            if not query_str:
-                results.extend(self.render_noargs(query, sources_sinks, cards))
+            # a single, consistent snapshot of the state for the whole query
+            snapshot = pulse_state.snapshot
+            if not pulse_state.ready.is_set():
+                results.append(self.get_status_item(query, "Connecting to PulseAudio..."))
+            elif pulse_state.error:
+                results.append(
+                    self.get_status_item(
+                        query, "Couldn't connect to PulseAudio", pulse_state.error
+                    )
+                )
+            elif not query_str:
+                results.extend(
+                    self.render_noargs(
+                        query, [*snapshot.sinks, *snapshot.sources], snapshot.cards
+                    )
+                )
+                results.extend(
+                    self.get_stream_item(snapshot, si, query.trigger)
+                    for si in snapshot.sink_inputs
+                )
             else:
-                results.extend(self.render_search(sources_sinks, cards, query))
+                results.extend(self.render_search(snapshot, query))
 
         except Exception:  # user to report error
             print(traceback.format_exc())
@@ -114,8 +194,8 @@ class Plugin(QueryHandler):
     def render_noargs(
         self,
         query,
-        sources_sinks: List[Union[pulsectl.PulseSourceInfo, pulsectl.PulseSinkInfo]],
-        cards: List[pulsectl.PulseCardInfo],
+        sources_sinks: Sequence[Union[pulsectl.PulseSourceInfo, pulsectl.PulseSinkInfo]],
+        cards: Sequence[pulsectl.PulseCardInfo],
     ) -> List[Item]:
         """Display current source, sink and card profiles."""
         results = []
@@ -130,16 +210,21 @@ class Plugin(QueryHandler):
 
             # fill actions
             actions = [
-                FuncAction(p.description, lambda s=s, p=p: pulse.port_set(s, p))
+                FuncAction(
+                    p.description, lambda s=s, p=p: run_locked(lambda: pulse.port_set(s, p))
+                )
                 for p in s.port_list
             ]
+            if is_sink(s):
+                actions.extend(get_sink_actions(s))
+            actions.extend(get_volume_actions(s))
 
             results.append(
                 Item(
                     id=self.name(),
                     icon=[icon],
                     text=s.port_active.description,
-                    subtext=s.description,
+                    subtext=f"{s.description} | {get_volume_str(s)}",
                     completion=query.trigger,
                     actions=actions,
                 )
@@ -149,7 +234,8 @@ class Plugin(QueryHandler):
         for c in cards:
             actions = [
                 FuncAction(
-                    prof.description, lambda c=c, prof=prof: pulse.card_profile_set(c, prof)
+                    prof.description,
+                    lambda c=c, prof=prof: run_locked(lambda: pulse.card_profile_set(c, prof)),
                 )
                 for prof in c.profile_list
             ]
@@ -167,58 +253,88 @@ class Plugin(QueryHandler):
 
         return results
 
-    def render_search(
-        self,
-        sources_sinks: List[Union[pulsectl.PulseSourceInfo, pulsectl.PulseSinkInfo]],
-        cards: List[pulsectl.PulseCardInfo],
-        query,
-    ) -> List[Item]:
+    def render_search(self, snapshot, query) -> List[Item]:
         results = []
 
-        # sinks, sources
-        search_str_to_props: Dict[str, list] = {
-            p.description: [
-                sink_icon_path if is_sink(s) else src_icon_path,
-                s.description,
-                lambda s=s, p=p: pulse.port_set(s, p),
-            ]
-            for s in sources_sinks
-            for p in s.port_list
-        }
-
-        # profiles
-        search_str_to_props.update(
-            {
-                prof.description: [
-                    config_icon_path,
-                    f"Profile | {c.name}",
-                    lambda c=c, prof=prof: pulse.card_profile_set(c, prof),
-                ]
-                for c in cards
-                for prof in c.profile_list
-            }
-        )
+        # the search keys are computed along with the snapshot
+        for entry in snapshot.search(query.string, limit=10):
+            if entry.kind == "stream":
+                results.append(
+                    self.get_stream_item(
+                        snapshot, entry.target, " ".join([query.trigger, query.string])
+                    )
+                )
+                continue
+
+            if entry.kind == "profile":
+                icon = config_icon_path
+                subtext = f"Profile | {entry.owner.name}"
+                action = FuncAction(
+                    entry.description,
+                    lambda e=entry: run_locked(
+                        lambda: pulse.card_profile_set(e.owner, e.target)
+                    ),
+                )
+            else:
+                icon = sink_icon_path if entry.kind == "sink" else src_icon_path
+                subtext = entry.owner.description
+                action = FuncAction(
+                    entry.description,
+                    lambda e=entry: run_locked(lambda: pulse.port_set(e.owner, e.target)),
+                )
 
-        # add albert items
-        matched = process.extract(query.string, list(search_str_to_props.keys()), limit=10)
-        for m in [elem[0] for elem in matched]:
-            icon = search_str_to_props[m][0]
-            subtext = search_str_to_props[m][1]
-            action = FuncAction(m, search_str_to_props[m][2])
+            actions = [action]
+            if entry.kind == "sink":
+                actions.extend(get_sink_actions(entry.owner))
 
             results.append(
                 Item(
                     id=self.name(),
                     icon=[icon],
-                    text=m,
+                    text=entry.description,
                     subtext=subtext,
                     completion=" ".join([query.trigger, query.string]),
-                    actions=[action],
+                    actions=actions,
                 )
             )
 
         return results
 
+    def get_stream_item(self, snapshot, sink_input, completion: str) -> Item:
+        """Item of a stream - sink input - to move it to another sink or change its volume."""
+        sink = next((s for s in snapshot.sinks if s.index == sink_input.sink), None)
+        sink_name = sink.description if sink is not None else "unknown sink"
+
+        actions = [
+            FuncAction(
+                f"Move to {s.description}",
+                lambda s=s: run_locked(
+                    lambda: pulse.sink_input_move(sink_input.index, s.index)
+                ),
+            )
+            for s in snapshot.sinks
+            if s.index != sink_input.sink
+        ]
+        actions.extend(get_volume_actions(sink_input))
+
+        return Item(
+            id=self.name(),
+            icon=[sink_icon_path],
+            text=pulsestate.stream_name(sink_input),
+            subtext=f"Stream | {sink_name} | {get_volume_str(sink_input)}",
+            completion=completion,
+            actions=actions,
+        )
+
+    def get_status_item(self, query, text: str, subtext: str = "") -> Item:
+        return Item(
+            id=self.name(),
+            icon=[config_icon_path],
+            text=text,
+            subtext=subtext,
+            completion=query.trigger,
+        )
+
 
 def get_as_subtext_field(field, field_title=None) -> str:
     """Get a certain variable as part of the subtext, along with a title for that variable."""
@@ -0,0 +1,203 @@
+"""State of the PulseAudio server, kept in memory and up to date via its events.
+
+A dedicated thread - with a connection to the server of its own - subscribes to the sink,
+source, sink input, card and server events and re-reads the sinks, sources, streams and
+cards whenever any of them changes. Every re-read produces a new, immutable
+:class:`Snapshot`, that replaces the previous one in a single assignment - readers just grab
+:attr:`PulseState.snapshot`, no locking involved.
+
+The search keys of all the ports, profiles and streams are precomputed along with each
+snapshot.
+"""
+
+import functools
+import threading
+from typing import Any, Dict, List, NamedTuple, Sequence, Tuple
+
+import pulsectl
+from fuzzywuzzy import fuzz, process, utils
+
+# how long to wait for more events before re-reading the state [s]
+coalesce_delay = 0.05
+# how long to wait before reconnecting to the server [s]
+reconnect_delay = 5.0
+
+
+class SearchEntry(NamedTuple):
+    """A port of a sink/source, a profile of a card or a stream."""
+
+    description: str
+    # "sink", "source", "profile" or "stream"
+    kind: str
+    # the sink/source, the card or - for streams - the sink it plays on, if known
+    owner: Any
+    # the port, the profile or the sink input
+    target: Any
+
+
+def stream_name(sink_input: pulsectl.PulseSinkInputInfo) -> str:
+    """Name of a stream - e.g., "Firefox - Some video"."""
+    app = sink_input.proplist.get("application.name", "")
+    media = sink_input.proplist.get("media.name", "") or sink_input.name
+    if app and media and app != media:
+        return f"{app} - {media}"
+
+    return app or media or f"Stream #{sink_input.index}"
+
+
+class Snapshot(NamedTuple):
+    sinks: Tuple[pulsectl.PulseSinkInfo, ...] = ()
+    sources: Tuple[pulsectl.PulseSourceInfo, ...] = ()
+    cards: Tuple[pulsectl.PulseCardInfo, ...] = ()
+    sink_inputs: Tuple[pulsectl.PulseSinkInputInfo, ...] = ()
+    entries: Tuple[SearchEntry, ...] = ()
+    # id of each entry -> its preprocessed search key
+    search_keys: Dict[int, str] = {}
+
+    @classmethod
+    def from_pulse(cls, pulse: pulsectl.Pulse) -> "Snapshot":
+        sinks = tuple(pulse.sink_list())
+        sources = tuple(pulse.source_list())
+        cards = tuple(pulse.card_list())
+        sink_inputs = tuple(pulse.sink_input_list())
+
+        entries: List[SearchEntry] = []
+        for kind, devices in (("sink", sinks), ("source", sources)):
+            for dev in devices:
+                entries.extend(SearchEntry(p.description, kind, dev, p) for p in dev.port_list)
+        for card in cards:
+            entries.extend(
+                SearchEntry(prof.description, "profile", card, prof)
+                for prof in card.profile_list
+            )
+        sinks_by_index = {sink.index: sink for sink in sinks}
+        entries.extend(
+            SearchEntry(stream_name(si), "stream", sinks_by_index.get(si.sink), si)
+            for si in sink_inputs
+        )
+
+        return cls(
+            sinks=sinks,
+            sources=sources,
+            cards=cards,
+            sink_inputs=sink_inputs,
+            entries=tuple(entries),
+            search_keys={i: utils.full_process(e.description) for i, e in enumerate(entries)},
+        )
+
+    def streams_of(self, sink: pulsectl.PulseSinkInfo) -> List[pulsectl.PulseSinkInputInfo]:
+        return [si for si in self.sink_inputs if si.sink == sink.index]
+
+    def search(self, query_str: str, limit: int = 10) -> List[SearchEntry]:
+        """Fuzzy-search the ports, the profiles and the streams - best first."""
+        query_str = utils.full_process(query_str)
+        if not query_str or not self.search_keys:
+            return []
+
+        matched = process.extract(
+            query_str,
+            self.search_keys,
+            processor=None,
+            scorer=functools.partial(fuzz.WRatio, full_process=False),
+            limit=limit,
+        )
+        return [self.entries[m[2]] for m in matched]
+
+
+class PulseState:
+    """Latest :class:`Snapshot` of the server - call :meth:`start` first."""
+
+    def __init__(self, client_name: str):
+        self._client_name = client_name
+        self._stop = threading.Event()
+        self._thread = None
+        self._pulse = None
+        self._dirty = False
+
+        self.snapshot = Snapshot()
+        self.ready = threading.Event()
+        self.error = ""
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        pulse = self._pulse
+        if pulse is not None:
+            pulse.event_listen_stop()
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def _on_event(self, _event):
+        self._dirty = True
+        # re-reading the state can't happen from within the callback
+        raise pulsectl.PulseLoopStop
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with pulsectl.Pulse(self._client_name) as pulse:
+                    self._pulse = pulse
+                    pulse.event_mask_set("sink", "source", "sink_input", "card", "server")
+                    pulse.event_callback_set(self._on_event)
+                    self._listen(pulse)
+            except pulsectl.PulseError as e:
+                self.error = str(e)
+                self.ready.set()
+            finally:
+                self._pulse = None
+
+            self._stop.wait(reconnect_delay)
+
+    def _listen(self, pulse: pulsectl.Pulse):
+        while not self._stop.is_set():
+            self.snapshot = Snapshot.from_pulse(pulse)
+            self.error = ""
+            self.ready.set()
+
+            # block until something changes - then wait for the rest of the burst of events
+            self._dirty = False
+            pulse.event_listen()
+            while self._dirty and not self._stop.is_set():
+                self._dirty = False
+                pulse.event_listen(timeout=coalesce_delay)
+
+
+def move_streams(
+    pulse: pulsectl.Pulse,
+    sink_inputs: Sequence[pulsectl.PulseSinkInputInfo],
+    sink: pulsectl.PulseSinkInfo,
+) -> int:
+    """Move the given streams to the sink - the default sink is left alone.
+
+    The streams come from a snapshot, so nothing gets listed again - the streams that ended in
+    the meantime are skipped. Return the number of streams moved.
+    """
+    moved = 0
+    for si in sink_inputs:
+        if si.sink == sink.index:
+            continue
+        try:
+            pulse.sink_input_move(si.index, sink.index)
+            moved += 1
+        except pulsectl.PulseOperationFailed:
+            # the stream is gone
+            pass
+
+    return moved
+
+
+def change_volume(pulse: pulsectl.Pulse, obj: Any, delta: float):
+    """Change the volume of a sink, a source or a stream by ``delta`` - e.g., 0.05 for 5%.
+
+    All the channels end up at the same volume, which never goes below 0 and isn't raised
+    beyond 100% - volumes that already are above it are never lowered by raising them,
+    though. The object itself - part of a snapshot - is left alone.
+    """
+    current = obj.volume.value_flat
+    value = min(max(current + delta, 0.0), max(1.0, current))
+    pulse.volume_set(obj, pulsectl.PulseVolumeInfo(value, len(obj.volume.values)))
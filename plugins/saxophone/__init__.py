@@ -1,10 +1,6 @@
 """Saxophone - Play internet radio streams from albert."""
 
-import select
-import socket
-import json
-import operator
-import random
+import importlib.util
 import traceback
 from enum import Enum
 from pathlib import Path
@@ -46,14 +42,6 @@ def notify(
     n.show()
 
 
-def sort_random(streams):
-    random.shuffle(streams)
-
-
-def sort_favorite(streams):
-    streams.sort(key=operator.attrgetter("favorite"), reverse=True)
-
-
 icon_path = get_icon("saxophone")
 stop_icon_path = get_icon("stop_icon")
 repeat_icon_path = get_icon("repeat_icon")
@@ -61,18 +49,35 @@ repeat_icon_path = get_icon("repeat_icon")
 cache_path = Path(v0.cacheLocation()) / "saxophone"
 pids_path = cache_path / "streams_on"
 data_path = Path(v0.dataLocation()) / "saxophone"
+# more stations - e.g., dumps of radio-browser.info - one JSON file each
+stations_path = data_path / "stations"
 
 json_config = str(Path(__file__).parent / "config" / "saxophone.json")
 
-sort_fn = sort_random
-# sort_fn = sort_favorite
+# maximum number of stations to show
+max_items = 100
 
 vlc_socket = Path("/tmp/cvlc.unix")
-socket_timeout = 0.2
 
 # Classes & supplementary functions -----------------------------------------------------------
 
 
+def load_module(name: str):
+    """Load a module from the same directory as this file."""
+    dir_ = Path(__file__).absolute().parent
+    spec = importlib.util.spec_from_file_location(name, dir_ / f"{name}.py")
+    if spec == None:
+        raise RuntimeError(f"Couldn't find {name}.py in current dir.")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)  # type: ignore
+    return module
+
+
+vlcrc = load_module("vlcrc")
+prober = load_module("prober")
+catalogue = load_module("catalogue")
+
+
 class UrlType(Enum):
     PLAYLIST = 0
     RAW_STREAM = 1
@@ -80,33 +85,6 @@ class UrlType(Enum):
     INVALID = 3
 
 
-def issue_cmd(cmd: str) -> str:
-    if not cmd.endswith("\n"):
-        cmd += "\n"
-    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
-        s.settimeout(socket_timeout)
-        s.connect(str(vlc_socket))
-
-        to_send = str.encode(cmd)
-        s.sendall(to_send)
-
-        # we don't want to block
-        res = ""
-        try:
-            ready = select.select([s], [], [], socket_timeout)
-            if ready[0]:
-                while True:
-                    b = s.recv(4096)
-                    if b:
-                        res += b.decode("utf-8")
-                    else:
-                        break
-        except socket.timeout:
-            pass
-
-        return res
-
-
 class Stream:
     def __init__(self, url: str, name: str, **kargs):
         super(Stream, self).__init__()
@@ -117,6 +95,7 @@ class Stream:
         self.homepage: Optional[str] = kargs.get("homepage")
         self._icon: Optional[str] = kargs.get("icon")
         self.favorite: bool = kargs.get("favorite", False)
+        self.tags: List[str] = kargs.get("tags") or []
 
         self._url_type: Optional[UrlType] = None
         if self.url.endswith(".pls") or self.url.endswith(".m3u"):
@@ -135,19 +114,14 @@ class Stream:
         return get_icon(self._icon)
 
 
-streams: List[Stream] = []
+# all the stations, along with their favorites and play counts
+station_catalogue = catalogue.Catalogue(
+    [Path(json_config)], cache_path / "catalogue.json", data_path / "stats.json"
+)
 
 
 def init_streams():
-    global streams
-    streams.clear()
-
-    with open(json_config) as f:
-        conts = json.load(f)
-
-        for item in conts["all"]:
-            streams.append(Stream(**item))
-    sort_fn(streams)
+    station_catalogue.load([Path(json_config), *sorted(stations_path.glob("*.json"))])
 
 
 def launch_vlc():
@@ -162,33 +136,42 @@ def launch_vlc():
 
 
 def is_radio_on() -> bool:
-    res = issue_cmd("is_playing")
-    return int(res) == 1
+    # as of the last reply of VLC - never waits on the socket
+    return vlc.status.playing
 
 
 def stop_radio():
     """Turn off the radio."""
-    res = issue_cmd("stop")
-    v0.debug(f"Stopping radio,\n{res}")
+    vlc.submit("stop", lambda lines: v0.debug(f"Stopping radio,\n{lines}"))
 
 
 def start_stream(stream: Stream):
-    res = issue_cmd(f"add {stream.url}")
-    v0.debug(f"Starting stream,\n{res}")
+    vlc.submit(f"add {stream.url}", lambda lines: v0.debug(f"Starting stream,\n{lines}"))
+    station_catalogue.record_play(stream.url)
 
 
 # calls ---------------------------------------------------------------------------------------
 
-# initialise all available streams
-init_streams()
-
 # launch VLC
 launch_vlc()
 
+# connection to the RC interface of VLC - kept open while the plugin is loaded
+vlc = vlcrc.VlcRc(vlc_socket)
+
+# reachability and now playing titles of the streams - checked in the background
+stream_prober = prober.Prober()
+
 # supplementary functions ---------------------------------------------------------------------
 def get_as_item(stream: Stream):
     icon = stream.icon() or icon_path
     actions = [FuncAction("Play", lambda stream=stream: start_stream(stream))]
+    if station_catalogue.is_favorite(stream.url):
+        favorite_label = "Remove from favorites"
+    else:
+        favorite_label = "Add to favorites"
+    actions.append(
+        FuncAction(favorite_label, lambda: station_catalogue.toggle_favorite(stream.url))
+    )
     if stream.homepage:
         actions.append(UrlAction("Go to radio homepage", stream.homepage))
 
@@ -196,12 +179,30 @@ def get_as_item(stream: Stream):
         id=f"{md_name}_{stream.name}",
         icon=[icon],
         text=stream.name,
-        subtext=stream.description if stream.description else "",
+        subtext=get_probe_subtext(stream),
         completion="",
         actions=actions,
     )
 
 
+def get_probe_subtext(stream: Stream) -> str:
+    """Description of the stream, along with what the last probe of it found - if anything."""
+    description = stream.description if stream.description else ""
+    result = stream_prober.get(stream.url)
+    if result is None:
+        return description
+
+    if not result.ok:
+        return f"Unreachable: {result.error}"
+
+    fields = [
+        f"Now playing: {result.now_playing}" if result.now_playing else description,
+        f"{result.latency * 1000:.0f} ms" if result.latency is not None else "",
+        f"{result.bitrate} kbps" if result.bitrate else "",
+    ]
+    return " | ".join(f for f in fields if f)
+
+
 def get_as_subtext_field(field, field_title=None) -> str:
     """Get a certain variable as part of the subtext, along with a title for that variable."""
     s = ""
@@ -257,6 +258,7 @@ class Plugin(v0.QueryHandler):
                     id=f"{md_name}_stop",
                     icon=[stop_icon_path],
                     text="Stop Radio",
+                    subtext=vlc.status.title,
                     actions=[FuncAction("Stop Radio", lambda: stop_radio())],
                 ),
             )
@@ -271,17 +273,19 @@ class Plugin(v0.QueryHandler):
         try:
             query_str = query.string.strip().lower()
 
+            # the favorites and the most played ones first, if there's no query
+            matched = [
+                Stream(**rec) for rec in station_catalogue.search(query_str, limit=max_items)
+            ]
+
+            # never waits - the results show up in the items of the next queries
+            stream_prober.request([stream.url for stream in matched])
+
             if not query_str:
                 results.append(reindex_item)
-                for stream in streams:
-                    results.append(get_as_item(stream))
+                results.extend(get_as_item(stream) for stream in matched)
             else:
-                for stream in streams:
-                    if query_str in stream.name.lower() or (
-                        stream.description and query_str.lower() in stream.description.lower()
-                    ):
-                        results.append(get_as_item(stream))
-
+                results.extend(get_as_item(stream) for stream in matched)
                 # reindex goes at the end of the list if we are searching for a stream
                 results.append(reindex_item)
 
@@ -309,11 +313,17 @@ class Plugin(v0.QueryHandler):
         # Called when the extension is loaded (ticked in the settings) - blocking
 
         # create plugin locations
-        for p in (cache_path, data_path, pids_path):
+        for p in (cache_path, data_path, pids_path, stations_path):
             p.mkdir(parents=False, exist_ok=True)
 
+        # initialise all available streams
+        init_streams()
+
+        vlc.start()
+        stream_prober.start()
 
     def finalize(self):
-        issue_cmd("logout")
+        stream_prober.stop()
+        vlc.stop()
 
 
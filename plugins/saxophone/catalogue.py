@@ -0,0 +1,321 @@
+"""Catalogue of the radio stations - parsed once, searched through indices.
+
+The stations come from JSON files, either in the format of ``config/saxophone.json`` or a
+list of stations as exported by radio-browser.info. The normalized stations, along with the
+words of their names, descriptions and tags, are stored in an on-disk index, which is only
+rebuilt when any of the source files changes.
+
+Searching looks the words of the query up by prefix in a sorted list of all the words,
+falling back to the closest words of the vocabulary for typos - ``#jazz`` terms filter by
+tag. The favorites and the play counts are kept in a file of their own; the ranking they
+define is updated one station at a time, whenever a station is played or (un)favorited.
+"""
+
+import bisect
+import difflib
+import json
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# version of the format of the index - bump to rebuild the existing ones
+index_version = 2
+
+Record = Dict[str, Any]
+
+
+def get_words(text: str) -> List[str]:
+    """Lowercase, accent-free words of the given text.
+
+    >>> get_words("Radio Café - Jazz & Soul (128k)")
+    ['radio', 'cafe', 'jazz', 'soul', '128k']
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"\w+", text)
+
+
+def get_tags(tags: Any) -> List[str]:
+    """
+    >>> get_tags("Jazz,smooth jazz, ,Lounge")
+    ['jazz', 'smooth jazz', 'lounge']
+    >>> get_tags(["Ambient"])
+    ['ambient']
+    """
+    if isinstance(tags, str):
+        tags = tags.split(",")
+
+    return [" ".join(get_words(tag)) for tag in tags or () if get_words(tag)]
+
+
+def normalize_record(rec: Record) -> Optional[Record]:
+    """A station in the common format - None if it's not usable.
+
+    >>> normalize_record({"name": " KEXP ", "url_resolved": "https://kexp/aac", "url": "x",
+    ...                   "tags": "indie,rock", "homepage": "https://kexp.org"})["url"]
+    'https://kexp/aac'
+    >>> normalize_record({"name": "No URL"}) is None
+    True
+    """
+    url = (rec.get("url_resolved") or rec.get("url") or "").strip()
+    name = (rec.get("name") or "").strip()
+    if not url or not name:
+        return None
+
+    return {
+        "url": url,
+        "name": name,
+        "description": rec.get("description") or None,
+        "homepage": rec.get("homepage") or None,
+        "icon": rec.get("icon") or None,
+        "favorite": bool(rec.get("favorite", False)),
+        "tags": get_tags(rec.get("tags")),
+    }
+
+
+def read_records(path: Path) -> List[Record]:
+    with open(path) as f:
+        conts = json.load(f)
+
+    # saxophone.json has them under "all", radio-browser dumps are plain lists
+    raw = conts["all"] if isinstance(conts, dict) else conts
+    records = (normalize_record(rec) for rec in raw if isinstance(rec, dict))
+    return [rec for rec in records if rec is not None]
+
+
+class _Index:
+    """Words of all the stations - immutable once built."""
+
+    def __init__(self, records: List[Record]):
+        self.records = records
+        # url -> ids of the stations - different stations may share a stream
+        self.ids: Dict[str, List[int]] = {}
+        for i, rec in enumerate(records):
+            self.ids.setdefault(rec["url"], []).append(i)
+        # (word, station id, whether the word is in the name), sorted
+        words: Set[Tuple[str, int, bool]] = set()
+        self.tags: Dict[str, Set[int]] = {}
+        for i, rec in enumerate(records):
+            words.update((w, i, True) for w in get_words(rec["name"]))
+            other = " ".join([rec["description"] or "", *rec["tags"]])
+            words.update((w, i, False) for w in get_words(other))
+            for tag in rec["tags"]:
+                self.tags.setdefault(tag, set()).add(i)
+
+        self.words = sorted(words)
+        self.vocabulary = sorted({w for w, _, _ in self.words})
+
+    def lookup(self, term: str) -> Dict[int, int]:
+        """Station id -> score of the given word of a query."""
+        scores: Dict[int, int] = {}
+        for word, i, in_name in self._starting_with(term):
+            score = (3 if word == term else 2) + in_name
+            scores[i] = max(scores.get(i, 0), score)
+
+        if scores:
+            return scores
+
+        # a typo, probably
+        for word in difflib.get_close_matches(term, self.vocabulary, n=5, cutoff=0.75):
+            for w, i, in_name in self._starting_with(word):
+                if w == word:
+                    scores[i] = max(scores.get(i, 0), 1 + in_name)
+
+        return scores
+
+    def _starting_with(self, prefix: str) -> Iterator[Tuple[str, int, bool]]:
+        # walks the sorted words in place - slicing them would copy the whole tail
+        pos = bisect.bisect_left(self.words, (prefix,))
+        while pos < len(self.words) and self.words[pos][0].startswith(prefix):
+            yield self.words[pos]
+            pos += 1
+
+    def lookup_tag(self, term: str) -> Set[int]:
+        ids = self.tags.get(term)
+        if ids is not None:
+            return ids
+
+        return {i for tag, ids in self.tags.items() if tag.startswith(term) for i in ids}
+
+
+class Catalogue:
+    """All the stations of the given source files - see the module docstring.
+
+    Stations are records - dicts - as returned by :func:`normalize_record`. Their favorite
+    status and play counts are kept per URL, i.e., shared by the stations of the same stream.
+    """
+
+    def __init__(self, sources: Iterable[Path], index_path: Path, stats_path: Path):
+        self._sources = list(sources)
+        self._index_path = index_path
+        self._stats_path = stats_path
+        self._index = _Index([])
+        # url -> {"plays": int, "favorite": bool, "last_played": float}
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        # (rank key, station id) - best first
+        self._ranked: List[Tuple[Tuple[bool, int, int], int]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def records(self) -> List[Record]:
+        return self._index.records
+
+    # loading -------------------------------------------------------------------------------
+    def load(self, sources: Optional[Iterable[Path]] = None):
+        """(Re)load the stations - from the on-disk index, if it's up to date."""
+        if sources is not None:
+            self._sources = list(sources)
+
+        key = self._get_key()
+        records = self._load_index(key)
+        if records is None:
+            records = []
+            for path in self._sources:
+                try:
+                    records.extend(read_records(path))
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    print(f"Couldn't read the stations of {path}: {e}")
+            # the same station may be in more than one of the sources
+            records = list({(rec["name"], rec["url"]): rec for rec in records}.values())
+            self._save_index(key, records)
+
+        index = _Index(records)
+        stats = self._load_stats()
+        with self._lock:
+            self._index = index
+            self._stats = stats
+            self._ranked = sorted((self._rank_key(i), i) for i in range(len(records)))
+
+    def _get_key(self) -> List[Any]:
+        key: List[Any] = [index_version]
+        for path in self._sources:
+            try:
+                st = path.stat()
+                key.append([str(path), st.st_mtime_ns, st.st_size])
+            except OSError:
+                key.append([str(path), None, None])
+
+        return key
+
+    def _load_index(self, key: List[Any]) -> Optional[List[Record]]:
+        try:
+            with open(self._index_path) as f:
+                conts = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if conts.get("key") != key:
+            return None
+
+        return conts["stations"]
+
+    def _save_index(self, key: List[Any], records: List[Record]):
+        tmp = self._index_path.with_suffix(".tmp")
+        try:
+            with open(tmp, "w") as f:
+                json.dump({"key": key, "stations": records}, f)
+            tmp.replace(self._index_path)
+        except OSError as e:
+            print(f"Couldn't save the index of the stations: {e}")
+
+    def _load_stats(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._stats_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_stats(self):
+        tmp = self._stats_path.with_suffix(".tmp")
+        with self._lock:
+            conts = json.dumps(self._stats)
+        try:
+            tmp.write_text(conts)
+            tmp.replace(self._stats_path)
+        except OSError as e:
+            print(f"Couldn't save the play counts of the stations: {e}")
+
+    # ranking -------------------------------------------------------------------------------
+    def is_favorite(self, url: str) -> bool:
+        stats = self._stats.get(url, {})
+        if "favorite" in stats:
+            return stats["favorite"]
+
+        return any(self.records[i]["favorite"] for i in self._index.ids.get(url, ()))
+
+    def plays(self, url: str) -> int:
+        return self._stats.get(url, {}).get("plays", 0)
+
+    def _rank_key(self, station_id: int) -> Tuple[bool, int, int]:
+        url = self._index.records[station_id]["url"]
+        return (not self.is_favorite(url), -self.plays(url), station_id)
+
+    def _update_stats(self, url: str, **changes):
+        with self._lock:
+            station_ids = self._index.ids.get(url, [])
+            old_keys = [self._rank_key(i) for i in station_ids]
+            self._stats.setdefault(url, {}).update(changes)
+
+            # move just the stations of this stream within the ranking
+            for station_id, old_key in zip(station_ids, old_keys):
+                pos = bisect.bisect_left(self._ranked, (old_key, station_id))
+                if pos < len(self._ranked) and self._ranked[pos][1] == station_id:
+                    del self._ranked[pos]
+                bisect.insort(self._ranked, (self._rank_key(station_id), station_id))
+
+        self._save_stats()
+
+    def record_play(self, url: str):
+        self._update_stats(url, plays=self.plays(url) + 1, last_played=time.time())
+
+    def toggle_favorite(self, url: str):
+        self._update_stats(url, favorite=not self.is_favorite(url))
+
+    def ranked(self, limit: Optional[int] = None) -> List[Record]:
+        """The favorites first, then by play count."""
+        with self._lock:
+            return [self._index.records[i] for _, i in self._ranked[:limit]]
+
+    # search --------------------------------------------------------------------------------
+    def search(self, query_str: str, limit: Optional[int] = None) -> List[Record]:
+        """Stations matching all the words of the query, best first.
+
+        ``#tag`` terms only keep the stations with the given tag - or a tag that starts with
+        it.
+        """
+        index = self._index
+        candidates: Optional[Dict[int, int]] = None
+        for term in query_str.split():
+            if term.startswith("#"):
+                tag = " ".join(get_words(term[1:]))
+                if not tag:
+                    continue
+                ids = index.lookup_tag(tag)
+                scores = {i: 0 for i in ids}
+            else:
+                scores = {}
+                for word in get_words(term):
+                    for i, score in index.lookup(word).items():
+                        scores[i] = scores.get(i, 0) + score
+
+            if candidates is None:
+                candidates = scores
+            else:
+                candidates = {
+                    i: score + scores[i] for i, score in candidates.items() if i in scores
+                }
+            if not candidates:
+                return []
+
+        if candidates is None:
+            return self.ranked(limit)
+
+        with self._lock:
+            if index is not self._index:
+                # reloaded in the meantime
+                return []
+            matches = sorted(candidates.items(), key=lambda m: (-m[1], self._rank_key(m[0])))
+        return [index.records[i] for i, _ in matches[:limit]]
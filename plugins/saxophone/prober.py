@@ -0,0 +1,322 @@
+"""Check the streams in the background - reachability, latency and now playing title.
+
+The probes run on an asyncio loop of their own, in a background thread, at most
+:data:`max_concurrent` at a time. A probe:
+
+* resolves .pls/.m3u playlists to the first stream they list,
+* connects to the stream and asks for its ICY (SHOUTcast/Icecast) metadata,
+* times how long the stream took to answer and reads the title that's playing, if the
+  stream sends one.
+
+The results are cached for :data:`result_ttl` seconds - asking for a stream whose result is
+still fresh, or that's being probed already, does nothing.
+"""
+
+import asyncio
+import re
+import ssl
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import urljoin, urlsplit
+
+# maximum number of probes running at the same time
+max_concurrent = 8
+# how long a probe can take [s]
+probe_timeout = 8.0
+# how long to wait for the title, once the stream answered [s]
+title_timeout = 3.0
+# how long the results are valid for [s]
+result_ttl = 300.0
+# maximum number of redirects - and nested playlists - to follow
+max_redirects = 5
+# maximum size of a playlist [bytes]
+max_playlist_size = 64 * 1024
+
+user_agent = "saxophone-albert-plugin"
+
+playlist_content_types = (
+    "audio/x-scpls",
+    "audio/scpls",
+    "audio/x-mpegurl",
+    "audio/mpegurl",
+    "application/x-mpegurl",
+    "application/vnd.apple.mpegurl",
+    "application/pls+xml",
+)
+
+
+class ProbeResult(NamedTuple):
+    url: str
+    # the stream itself - after resolving playlists and following redirects
+    stream_url: str = ""
+    ok: bool = False
+    # time to the response of the stream [s]
+    latency: Optional[float] = None
+    error: str = ""
+    # e.g., the name of the station
+    icy_name: str = ""
+    now_playing: str = ""
+    bitrate: str = ""
+    # time.monotonic() of the probe
+    probed_at: float = 0.0
+
+
+def is_playlist_url(url: str) -> bool:
+    """
+    >>> is_playlist_url("http://example.com/listen.pls")
+    True
+    >>> is_playlist_url("https://example.com/gen/?u=http://host/listen.pls&t=.m3u")
+    True
+    >>> is_playlist_url("http://example.com/stream.mp3")
+    False
+    """
+    return url.lower().endswith((".pls", ".m3u", ".m3u8"))
+
+
+def parse_playlist(text: str) -> List[str]:
+    """URLs of the entries of a .pls or .m3u playlist, in order.
+
+    >>> parse_playlist("[playlist]\\nNumberOfEntries=2\\nFile1=http://a/1\\nFile2=http://a/2")
+    ['http://a/1', 'http://a/2']
+    >>> parse_playlist("#EXTM3U\\n#EXTINF:-1,Radio\\nhttp://a/stream\\n")
+    ['http://a/stream']
+    """
+    urls = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith(("#", "[")):
+            continue
+        match = re.match(r"File\d+\s*=\s*(.+)", line, re.IGNORECASE)
+        if match:
+            urls.append(match.group(1).strip())
+        elif "=" not in line or "://" in line:
+            urls.append(line)
+
+    return [url for url in urls if "://" in url]
+
+
+def parse_icy_metadata(block: bytes) -> Dict[str, str]:
+    """
+    >>> parse_icy_metadata(b"StreamTitle='Artist - It''s a Song';StreamUrl='';\\0\\0")
+    {'StreamTitle': "Artist - It's a Song", 'StreamUrl': ''}
+    """
+    text = block.rstrip(b"\0").decode("utf-8", errors="replace")
+    return {
+        key: value.replace("''", "'")
+        for key, value in re.findall(r"(\w+)='((?:[^']|'')*)';", text)
+    }
+
+
+def parse_headers(head: bytes) -> Tuple[int, Dict[str, str]]:
+    r"""Status code and headers - with lowercase names - of an HTTP or ICY response.
+
+    >>> parse_headers(b"ICY 200 OK\r\nicy-name: Radio\r\nicy-metaint: 16000\r\n\r\n")
+    (200, {'icy-name': 'Radio', 'icy-metaint': '16000'})
+    """
+    lines = head.decode("latin-1").split("\r\n")
+    status_parts = lines[0].split()
+    if len(status_parts) < 2 or not status_parts[1].isdigit():
+        raise ValueError(f"Invalid response: {lines[0]!r}")
+
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+
+    return int(status_parts[1]), headers
+
+
+async def _open(url: str):
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        raise ValueError(f"Unsupported scheme: {parts.scheme}")
+
+    https = parts.scheme == "https"
+    port = parts.port or (443 if https else 80)
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, port, ssl=ssl.create_default_context() if https else None
+    )
+    path = parts.path or "/"
+    if parts.query:
+        path += f"?{parts.query}"
+    # HTTP/1.0 - so that the servers don't send the playlists chunked
+    writer.write(
+        (
+            f"GET {path} HTTP/1.0\r\n"
+            f"Host: {parts.netloc}\r\n"
+            f"User-Agent: {user_agent}\r\n"
+            "Icy-MetaData: 1\r\n"
+            "Accept: */*\r\n"
+            "\r\n"
+        ).encode()
+    )
+    await writer.drain()
+    return reader, writer
+
+
+async def probe(url: str) -> ProbeResult:
+    """Probe the given stream - see the module docstring. Doesn't raise."""
+    started = time.monotonic()
+    current = url
+    try:
+        for _ in range(max_redirects + 1):
+            reader, writer = await _open(current)
+            try:
+                status, headers = parse_headers(await reader.readuntil(b"\r\n\r\n"))
+                latency = time.monotonic() - started
+
+                if status in (301, 302, 303, 307, 308) and "location" in headers:
+                    current = urljoin(current, headers["location"])
+                    continue
+                if status >= 400:
+                    return ProbeResult(url, current, error=f"HTTP {status}", latency=latency)
+
+                content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+                if content_type in playlist_content_types or (
+                    is_playlist_url(current) and not content_type.startswith("audio/mpeg")
+                ):
+                    entries = parse_playlist(
+                        (await _read_some(reader, max_playlist_size)).decode(errors="replace")
+                    )
+                    if not entries:
+                        return ProbeResult(url, current, error="Empty playlist")
+                    current = entries[0]
+                    continue
+
+                now_playing = ""
+                metaint = headers.get("icy-metaint", "")
+                if metaint.isdigit() and int(metaint) > 0:
+                    try:
+                        now_playing = await asyncio.wait_for(
+                            _read_title(reader, int(metaint)), title_timeout
+                        )
+                    except asyncio.TimeoutError:
+                        # reachable nevertheless
+                        pass
+
+                return ProbeResult(
+                    url,
+                    current,
+                    ok=True,
+                    latency=latency,
+                    icy_name=headers.get("icy-name", ""),
+                    now_playing=now_playing,
+                    bitrate=headers.get("icy-br", ""),
+                )
+            finally:
+                writer.close()
+
+        return ProbeResult(url, current, error="Too many redirects")
+    except asyncio.TimeoutError:
+        return ProbeResult(url, current, error="Timed out")
+    except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError) as e:
+        return ProbeResult(url, current, error=str(e) or type(e).__name__)
+
+
+async def _read_some(reader: asyncio.StreamReader, limit: int) -> bytes:
+    data = b""
+    while len(data) < limit:
+        chunk = await reader.read(limit - len(data))
+        if not chunk:
+            break
+        data += chunk
+
+    return data
+
+
+async def _read_title(reader: asyncio.StreamReader, metaint: int) -> str:
+    # the first metadata block comes after ``metaint`` bytes of audio
+    await reader.readexactly(metaint)
+    length = (await reader.readexactly(1))[0] * 16
+    if not length:
+        return ""
+
+    return parse_icy_metadata(await reader.readexactly(length)).get("StreamTitle", "")
+
+
+class Prober:
+    """Probes the streams in the background - call :meth:`start` first.
+
+    ``on_result`` is called from the background thread with every new result.
+    """
+
+    def __init__(self, on_result: Callable[[ProbeResult], None] = lambda result: None):
+        self._on_result = on_result
+        self._results: Dict[str, ProbeResult] = {}
+        self._pending: Set[str] = set()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+
+    def get(self, url: str) -> Optional[ProbeResult]:
+        """The latest result for the given stream - stale or not - if there's any."""
+        return self._results.get(url)
+
+    def request(self, urls: List[str], force: bool = False):
+        """Probe the given streams - the ones without a fresh result. Never blocks.
+
+        With ``force``, probe them even if their result is fresh.
+        """
+        if self._loop is None:
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            to_probe = [
+                url
+                for url in dict.fromkeys(urls)
+                if url not in self._pending
+                and (force or url not in self._results or self._is_stale(url, now))
+            ]
+            self._pending.update(to_probe)
+
+        for url in to_probe:
+            asyncio.run_coroutine_threadsafe(self._probe(url), self._loop)
+
+    def _is_stale(self, url: str, now: float) -> bool:
+        return now - self._results[url].probed_at > result_ttl
+
+    def _run(self):
+        assert self._loop is not None
+        asyncio.set_event_loop(self._loop)
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        try:
+            self._loop.run_forever()
+        finally:
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._loop.close()
+            self._loop = None
+
+    async def _probe(self, url: str):
+        assert self._semaphore is not None
+        try:
+            async with self._semaphore:
+                try:
+                    result = await asyncio.wait_for(probe(url), probe_timeout)
+                except asyncio.TimeoutError:
+                    result = ProbeResult(url, error="Timed out")
+        finally:
+            with self._lock:
+                self._pending.discard(url)
+
+        result = result._replace(probed_at=time.monotonic())
+        self._results[url] = result
+        self._on_result(result)
@@ -0,0 +1,281 @@
+"""Long-lived client of the RC (remote control) interface of VLC.
+
+A single connection to the UNIX socket of VLC is kept open by a background thread, which
+sends the queued commands one at a time and reads the replies line by line. A reply ends
+with the "> " prompt of VLC or, if the prompt is off, once VLC has been quiet for
+:data:`reply_idle` seconds.
+
+While there's nothing to send, the thread asks VLC for its status every
+:data:`poll_interval` seconds, and the asynchronous "status change" lines update it as well.
+The latest status is a :class:`Status` snapshot that can be read at any time without
+touching the socket. If VLC is not up - yet - the thread keeps reconnecting.
+"""
+
+import queue
+import re
+import select
+import socket
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+# how often to ask VLC for its status [s]
+poll_interval = 1.0
+# how long VLC has to be quiet for its reply to be considered complete [s]
+reply_idle = 0.1
+# how long to wait for a reply at most [s]
+reply_timeout = 2.0
+# how long to wait before reconnecting [s]
+reconnect_delay = 1.0
+# maximum number of queued commands
+max_pending = 16
+
+PROMPT = "> "
+
+_status_re = re.compile(
+    r"\(\s*(new input|audio volume|state|play state|stop state)[:\s]\s*(.*?)\s*\)"
+)
+
+
+class Status(NamedTuple):
+    """What VLC is up to, as of the last reply."""
+
+    connected: bool = False
+    playing: bool = False
+    # URL of the current input
+    url: str = ""
+    # title of the current input - e.g., the now playing title of the stream
+    title: str = ""
+    volume: Optional[int] = None
+
+
+def split_lines(buf: str) -> Tuple[List[str], str, bool]:
+    """Split the received text into complete lines and the incomplete rest.
+
+    The prompts are dropped - the last item says whether the text ended with one.
+
+    >>> split_lines("1\\n> ")
+    (['1'], '', True)
+    >>> split_lines("> ( state playing )\\n( audio volume: 256 )\\n( new in")
+    (['( state playing )', '( audio volume: 256 )'], '( new in', False)
+    """
+    *lines, rest = buf.split("\n")
+    lines = [line.rstrip("\r") for line in lines]
+    lines = [line[len(PROMPT) :] if line.startswith(PROMPT) else line for line in lines]
+    prompt = rest == PROMPT or rest == PROMPT.rstrip()
+    if prompt:
+        rest = ""
+
+    return [line for line in lines if line.strip()], rest, prompt
+
+
+def parse_status(lines: List[str], status: Status) -> Status:
+    """Update the given status with the reply to "status" or the "status change" lines.
+
+    >>> lines = ["( new input: http://radio )", "( audio volume: 256 )", "( state playing )"]
+    >>> parse_status(lines, Status(connected=True))
+    Status(connected=True, playing=True, url='http://radio', title='', volume=256)
+    >>> parse_status(["status change: ( stop state: 5 )"], Status(playing=True))
+    Status(connected=False, playing=False, url='', title='', volume=None)
+    """
+    for line in lines:
+        for field, value in _status_re.findall(line):
+            if field == "new input":
+                status = status._replace(url=value)
+            elif field == "audio volume":
+                try:
+                    status = status._replace(volume=int(float(value)))
+                except ValueError:
+                    pass
+            elif field == "state":
+                status = status._replace(playing=value == "playing")
+            elif field == "play state":
+                # 3 is playing, 4 is paused
+                status = status._replace(playing=value.split()[0] == "3")
+            elif field == "stop state":
+                status = status._replace(playing=False)
+
+    return status
+
+
+class VlcRc:
+    """Client of the RC interface at ``socket_path`` - call :meth:`start` first.
+
+    ``on_change`` is called from the background thread with every new :class:`Status`.
+    """
+
+    def __init__(
+        self,
+        socket_path: Path,
+        on_change: Callable[[Status], None] = lambda status: None,
+    ):
+        self._socket_path = socket_path
+        self._on_change = on_change
+        self._queue: "queue.Queue[Optional[Tuple[str, Callable[[List[str]], None]]]]" = (
+            queue.Queue(maxsize=max_pending)
+        )
+        self._sock: Optional[socket.socket] = None
+        self._buf = ""
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+        self.status = Status()
+        self.error = ""
+
+    # lifetime ------------------------------------------------------------------------------
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, logout: bool = True):
+        """Stop the client - with ``logout``, let VLC know as well."""
+        if self._thread is None:
+            return
+
+        if logout:
+            self.submit("logout")
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._stop.set()
+        self._thread.join(timeout=reply_timeout + 1.0)
+        self._thread = None
+
+    # commands ------------------------------------------------------------------------------
+    def submit(self, cmd: str, on_reply: Callable[[List[str]], None] = lambda lines: None):
+        """Queue a command - return False if the queue is full.
+
+        ``on_reply`` is called from the background thread with the lines of the reply.
+        """
+        try:
+            self._queue.put_nowait((cmd, on_reply))
+        except queue.Full:
+            return False
+
+        return True
+
+    # background thread ---------------------------------------------------------------------
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._connect()
+                self._serve()
+            except OSError as e:
+                self.error = str(e)
+            finally:
+                self._disconnect()
+
+            self._stop.wait(reconnect_delay)
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(str(self._socket_path))
+        except OSError:
+            sock.close()
+            raise
+        sock.setblocking(False)
+        self._sock = sock
+        self._buf = ""
+        self.error = ""
+        # the greeting of VLC
+        self._read_reply()
+        self._set_status(self.status._replace(connected=True))
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        if self.status.connected:
+            self._set_status(Status())
+
+    def _serve(self):
+        next_poll = 0.0
+        while True:
+            timeout = max(next_poll - time.monotonic(), 0.0)
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                # the queued commands - e.g., logout - are sent before stopping
+                if self._stop.is_set():
+                    break
+                item = ("", lambda lines: None)
+
+            if item is None:
+                break
+
+            cmd, on_reply = item
+            if cmd:
+                lines = self._command(cmd)
+                on_reply(lines)
+                if cmd == "logout":
+                    break
+                # the command probably changed what's playing - find out right away
+                next_poll = 0.0
+                continue
+
+            self._poll()
+            next_poll = time.monotonic() + poll_interval
+
+    def _poll(self):
+        # the reply only has the input if there's one
+        status = parse_status(self._command("status"), self.status._replace(url=""))
+        title = ""
+        if status.playing:
+            title = next(iter(self._command("get_title")), "")
+        self._set_status(status._replace(title=title))
+
+    def _command(self, cmd: str) -> List[str]:
+        assert self._sock is not None
+        # whatever VLC said on its own - e.g., status changes - goes before the command
+        self._set_status(parse_status(self._read_available(), self.status))
+
+        self._sock.sendall(f"{cmd}\n".encode())
+        lines = self._read_reply()
+        self._set_status(parse_status(lines, self.status))
+
+        return lines
+
+    def _read_available(self) -> List[str]:
+        """Lines that arrived without being asked for - never blocks."""
+        assert self._sock is not None
+        lines: List[str] = []
+        while select.select([self._sock], [], [], 0)[0]:
+            new_lines, _ = self._recv()
+            lines.extend(new_lines)
+
+        return lines
+
+    def _read_reply(self) -> List[str]:
+        assert self._sock is not None
+        lines: List[str] = []
+        deadline = time.monotonic() + reply_timeout
+        while True:
+            timeout = min(reply_idle, deadline - time.monotonic())
+            if timeout <= 0 or not select.select([self._sock], [], [], timeout)[0]:
+                # VLC went quiet
+                break
+
+            new_lines, prompt = self._recv()
+            lines.extend(new_lines)
+            if prompt:
+                break
+
+        return lines
+
+    def _recv(self) -> Tuple[List[str], bool]:
+        assert self._sock is not None
+        data = self._sock.recv(4096)
+        if not data:
+            raise ConnectionResetError("VLC closed the connection")
+
+        lines, self._buf, prompt = split_lines(self._buf + data.decode(errors="replace"))
+        return lines, prompt
+
+    def _set_status(self, status: Status):
+        if status != self.status:
+            self.status = status
+            self._on_change(status)
@@ -1,21 +1,17 @@
 """Timezones lookup."""
 
-import concurrent.futures
+import importlib.util
 
 # TODO Remove this
 import pprint
-import time
 import traceback
-from datetime import datetime
+from datetime import datetime, time
 from pathlib import Path
+from typing import List
 
 import albert as v0  # type: ignore
-import pycountry
 import pytz
-import requests
 import tzlocal
-from thefuzz import process
-from PIL import Image
 
 md_name = "Timezones"
 md_description = "Timezones lookup based on city/country"
@@ -40,116 +36,72 @@ config_path = Path(v0.configLocation()) / "timezones"
 data_path = Path(v0.dataLocation()) / "timezones"
 country_logos_path = data_path / "logos"
 
-# country code -> cities
-code_to_cities = dict({k: v for k, v in pytz.country_timezones.items()})
-codes = list(code_to_cities.keys())
-city_to_code = {vi: k for k, v in pytz.country_timezones.items() for vi in v}
-cities = list(city_to_code.keys())
-country_to_code = {c.name: c.alpha_2 for c in pycountry.countries if c.alpha_2 in codes}
-country_to_cities = {
-    country: code_to_cities[code] for country, code in country_to_code.items()
-}
-countries = list(country_to_code.keys())
-local_tz_str = tzlocal.get_localzone().zone
-
-
-def get_pretty_city_name(city: str) -> str:
-    return "".join(city.split("/")[-1].split("_"))
-
-
-full_name_to_city = {
-    f"{city_to_code[city]}{country.replace(' ', '')}{get_pretty_city_name(city)}": city
-    for country in countries
-    for city in country_to_cities[country]
-}
-
-
-def download_logo_for_code(code: str) -> bytes:
-    """
-    Download the logo of the given code.
-
-    .. raises:: KeyError if given code is invalid.
-    """
-    ret = requests.get(f"https://flagcdn.com/64x48/{code.lower()}.png")
-    if not ret.ok:
-        print(f"[E] Couldn't download logo for code {code}")
-    return ret.content
+# load tzindex module - from the same directory as this file
+dir_ = Path(__file__).absolute().parent
+spec = importlib.util.spec_from_file_location("tzindex", dir_ / "tzindex.py")
+if spec == None:
+    raise RuntimeError("Couldn't find tzindex.py in current dir.")
+tzindex = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(tzindex)  # type: ignore
 
+# lookup tables - built or loaded from the cache on first use
+tz_index = tzindex.TimezoneIndex(cache_path / "index.json")
+local_tz_str = tzlocal.get_localzone().zone
 
-def get_logo_path_for_code_orig(code: str) -> Path:
-    """Return the path to the cached country logo"""
-    return country_logos_path / f"{code}-orig.png"
+# load flags module - from the same directory as this file
+spec = importlib.util.spec_from_file_location("flags", dir_ / "flags.py")
+if spec == None:
+    raise RuntimeError("Couldn't find flags.py in current dir.")
+flags = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(flags)  # type: ignore
 
+# country flags - fetched on demand, for the countries that show up in the results
+flag_cache = flags.FlagCache(country_logos_path)
 
-def get_logo_path_for_code(code: str) -> Path:
-    """Return the path to the cached country logo"""
-    return country_logos_path / f"{code}.png"
+# load tzconvert module - from the same directory as this file
+spec = importlib.util.spec_from_file_location("tzconvert", dir_ / "tzconvert.py")
+if spec == None:
+    raise RuntimeError("Couldn't find tzconvert.py in current dir.")
+tzconvert = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(tzconvert)  # type: ignore
 
+# zones that the user has pinned to the world clock - shown on an empty query
+pinned_zones_path = config_path / "pinned"
+pinned_zones: List[str] = []
 
-def save_logo_for_code(code: str, data: bytes):
-    fname_orig = get_logo_path_for_code_orig(code)
-    fname = get_logo_path_for_code(code)
+world_clock_prefix = "*"
 
-    with open(fname_orig, "wb") as f:
-        f.write(data)
-
-    old_img = Image.open(fname_orig)
-    old_size = old_img.size
-    new_size = (80, 80)
-    new_img = Image.new("RGBA", new_size)
-    new_img.paste((255, 255, 255, 0), (0, 0, *new_size))
-    new_img.paste(
-        old_img, ((new_size[0] - old_size[0]) // 2, (new_size[1] - old_size[1]) // 2)
-    )
-
-    new_img.save(fname)
 
+# supplementary functions ---------------------------------------------------------------------
 
-def download_and_save_logo_for_code(code):
-    save_logo_for_code(code, download_logo_for_code(code))
 
+def load_pinned_zones():
+    pinned_zones.clear()
+    if pinned_zones_path.is_file():
+        with open(pinned_zones_path, "r") as f:
+            pinned_zones.extend(line.strip() for line in f if line.strip())
 
-def download_all_logos():
-    with concurrent.futures.ThreadPoolExecutor(max_workers=100) as executor:
-        future_to_code = {
-            executor.submit(download_and_save_logo_for_code, code): code for code in codes
-        }
-        for future in concurrent.futures.as_completed(future_to_code):
-            code = future_to_code[future]
-            try:
-                future.result()
-                print(f"Fetched logo for country {code}")
-            except Exception as exc:
-                print(f"[W] Fetching logo for {code} generated an exception: {exc}")
 
+def toggle_pinned_zone(city: str):
+    if city in pinned_zones:
+        pinned_zones.remove(city)
+    else:
+        pinned_zones.append(city)
 
-# plugin main functions -----------------------------------------------------------------------
+    save_data("".join(f"{zone}\n" for zone in pinned_zones), pinned_zones_path.name)
 
 
-def get_uniq_elements(seq):
-    """Return only the unique elements off the list - Preserve the order.
+def get_as_item(city: str, dst_dt: datetime):
+    """Return an item - ready to be appended to the items list and be rendered by Albert.
 
-    .. ref:: https://stackoverflow.com/questions/480214/how-do-you-remove-duplicates-from-a-list-whilst-preserving-order
+    :param dst_dt: The time to show, already converted to the timezone of the city
     """
-    seen = set()
-    seen_add = seen.add
-    return [x for x in seq if not (x in seen or seen_add(x))]
-
-
-# supplementary functions ---------------------------------------------------------------------
-
-
-def get_as_item(city: str):
-    """Return an item - ready to be appended to the items list and be rendered by Albert."""
-    code = city_to_code[city]
-
-    icon = str(get_logo_path_for_code(code))
-    utc_dt = pytz.utc.localize(datetime.utcnow())
-    dst_tz = pytz.timezone(city)
-    dst_dt = utc_dt.astimezone(dst_tz)
+    code = tz_index.city_to_code.get(city, "")
 
+    icon = str(flag_cache.get(code)) if code else icon_path
     text = f'{dst_dt.strftime("%Y-%m-%d %H:%M %z (%Z)")}'
-    subtext = f"[{code}] | {city}"
+    subtext = f"[{code}] | {city}" if code else city
+    pin_text = "Unpin from world clock" if city in pinned_zones else "Pin to world clock"
 
     return v0.Item(
         id=f"{md_name}_{code}",
@@ -164,10 +116,43 @@ def get_as_item(city: str):
                     f'https://www.zeitverschiebung.net/en/timezone/{city.replace("/", "--").lower()}'
                 ),
             ),
+            FuncAction(pin_text, lambda city=city: toggle_pinned_zone(city)),
         ],
     )
 
 
+def get_time_at_items(at: time, rest: str) -> list:
+    """Get items for the given time in a source zone, converted into the target zones.
+
+    :param rest: ``[<source zone or city>] [*<country>]`` - the source defaults to the local
+        zone, the targets to the world clock zones
+    """
+    src_str, _, country_str = rest.partition(world_clock_prefix)
+    src_str = src_str.strip()
+
+    src_zone = local_tz_str
+    if src_str:
+        try:
+            src_zone = tzconvert.get_timezone(src_str).zone
+        except pytz.UnknownTimeZoneError:
+            matched = tz_index.search(src_str, limit=1)
+            if not matched:
+                return []
+            src_zone = matched[0]
+
+    if country_str:
+        zones = tz_index.country_zones(country_str)
+    else:
+        zones = [local_tz_str, *pinned_zones]
+
+    # the given time refers to the current day at the source zone
+    src_date = tzconvert.world_clock([src_zone])[0][1].date()
+    return [
+        get_as_item(city, dt)
+        for city, dt in tzconvert.convert_at(datetime.combine(src_date, at), src_zone, zones)
+    ]
+
+
 def sanitize_string(s: str) -> str:
     return s.replace("<", "&lt;")
 
@@ -231,7 +216,10 @@ class Plugin(v0.QueryHandler):
         return "tz "
 
     def synopsis(self):
-        return "city/country name"
+        return (
+            f"city/country name | {world_clock_prefix}country | 15:00 [city]"
+            f" [{world_clock_prefix}country]"
+        )
 
     def initialize(self):
         """Called when the extension is loaded (ticked in the settings) - blocking."""
@@ -240,16 +228,11 @@ class Plugin(v0.QueryHandler):
         for p in (cache_path, config_path, data_path):
             p.mkdir(parents=False, exist_ok=True)
 
-        # fetch all logos at startup
-        country_logos_path.mkdir(exist_ok=True)
-        if not list(country_logos_path.iterdir()):
-            print("Downloading country logos")
-            t = time.time()
-            download_all_logos()
-            print(f"Downloaded country logos - Took {time.time() - t} seconds")
+        flag_cache.load()
+        load_pinned_zones()
 
     def finalize(self):
-        pass
+        flag_cache.shutdown()
 
     def handleQuery(self, query) -> None:
         """Hook that is called by albert with *every new keypress*."""  # noqa
@@ -258,20 +241,36 @@ class Plugin(v0.QueryHandler):
         try:
             query_str = query.string.strip()
 
-            matched = [
-                elem for elem in process.extract(query_str, full_name_to_city.keys(), limit=8)
-            ]
-            v0.debug(matched)
-
-            unique_cities_matched = get_uniq_elements(
-                [full_name_to_city[m[0]] for m in matched]
-            )
+            # time at a zone, converted into the world clock zones
+            time_at = tzconvert.parse_time(query_str)
+            if time_at is not None:
+                query.add(get_time_at_items(*time_at))
+                return
+
+            if not query_str:
+                # world clock - own timezone and the pinned ones
+                unique_cities_matched = [local_tz_str, *pinned_zones]
+            elif query_str.startswith(world_clock_prefix):
+                # world clock - all the zones of a country
+                unique_cities_matched = tz_index.country_zones(
+                    query_str[len(world_clock_prefix) :]
+                )
+            else:
+                unique_cities_matched = tz_index.search(query_str, limit=8)
+            v0.debug(unique_cities_matched)
 
             # add own timezone:
             if local_tz_str in unique_cities_matched:
                 unique_cities_matched.remove(local_tz_str)
                 unique_cities_matched.insert(0, local_tz_str)
-            results.extend([get_as_item(m) for m in unique_cities_matched])
+
+            # convert the same instant into all the matched zones
+            results.extend(
+                [
+                    get_as_item(city, dt)
+                    for city, dt in tzconvert.world_clock(unique_cities_matched)
+                ]
+            )
 
         except Exception:  # user to report error
             print(traceback.format_exc())
@@ -0,0 +1,131 @@
+"""Lazily fetched, content-addressed cache of country flags.
+
+Flags are only downloaded for the country codes that show up in the results, using a small
+worker pool. Until a flag is ready, a transparent placeholder icon is returned instead.
+Processed flags are stored under the hash of the downloaded image, and a small JSON file maps
+each country code to its hash, so a cold start doesn't do any network work.
+"""
+
+import concurrent.futures
+import hashlib
+import io
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Set
+
+import requests
+from PIL import Image
+
+flag_url_template = "https://flagcdn.com/64x48/{code}.png"
+icon_size = (80, 80)
+
+
+def download_flag(code: str) -> bytes:
+    """
+    Download the flag of the given country code.
+
+    .. raises:: requests.HTTPError if the given code is invalid.
+    """
+    ret = requests.get(flag_url_template.format(code=code.lower()), timeout=5)
+    ret.raise_for_status()
+    return ret.content
+
+
+def to_icon(data: bytes) -> Image.Image:
+    """Center the given flag image on a transparent, square canvas."""
+    old_img = Image.open(io.BytesIO(data))
+    old_size = old_img.size
+    new_img = Image.new("RGBA", icon_size, (255, 255, 255, 0))
+    new_img.paste(
+        old_img, ((icon_size[0] - old_size[0]) // 2, (icon_size[1] - old_size[1]) // 2)
+    )
+
+    return new_img
+
+
+class FlagCache:
+    def __init__(self, root: Path, max_workers: int = 4):
+        self._root = root
+        self._index_path = root / "index.json"
+        self._placeholder = root / "placeholder.png"
+        self._max_workers = max_workers
+
+        self._code_to_digest: Dict[str, str] = {}
+        self._pending: Set[str] = set()
+        self._failed: Set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def load(self):
+        """Load the code -> flag mapping from disk. No network work happens here."""
+        self._root.mkdir(parents=False, exist_ok=True)
+        if not self._placeholder.is_file():
+            Image.new("RGBA", icon_size, (255, 255, 255, 0)).save(self._placeholder)
+
+        if self._index_path.is_file():
+            try:
+                with open(self._index_path, "r") as f:
+                    self._code_to_digest = json.load(f)
+            except ValueError:
+                self._code_to_digest = {}
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self._max_workers, thread_name_prefix="timezones-flags"
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def _path_for_digest(self, digest: str) -> Path:
+        return self._root / f"{digest}.png"
+
+    def get(self, code: str) -> Path:
+        """Return the path to the flag for the given code.
+
+        If the flag is not cached yet, schedule its download and return the placeholder. Flags
+        that failed to download are not retried until the next albert session.
+        """
+        digest = self._code_to_digest.get(code)
+        if digest is not None:
+            path = self._path_for_digest(digest)
+            if path.is_file():
+                return path
+
+        with self._lock:
+            if (
+                code not in self._pending
+                and code not in self._failed
+                and self._executor is not None
+            ):
+                self._pending.add(code)
+                self._executor.submit(self._fetch, code)
+
+        return self._placeholder
+
+    def _fetch(self, code: str):
+        try:
+            data = download_flag(code)
+            digest = hashlib.sha256(data).hexdigest()[:16]
+            path = self._path_for_digest(digest)
+            if not path.is_file():
+                tmp_path = path.with_suffix(".tmp")
+                to_icon(data).save(tmp_path, format="PNG")
+                tmp_path.replace(path)
+
+            with self._lock:
+                self._code_to_digest[code] = digest
+                tmp_index_path = self._index_path.with_suffix(".tmp")
+                with open(tmp_index_path, "w") as f:
+                    json.dump(self._code_to_digest, f)
+                tmp_index_path.replace(self._index_path)
+        except Exception as exc:
+            # don't retry for the rest of the session
+            with self._lock:
+                self._failed.add(code)
+            print(f"[W] Fetching flag for {code} generated an exception: {exc}")
+        finally:
+            with self._lock:
+                self._pending.discard(code)
@@ -0,0 +1,230 @@
+"""Convert a single instant into many timezones at once.
+
+The current UTC instant is computed once per query and the tz objects are cached, so that
+rendering N results costs N offset lookups rather than N timezone constructions.
+
+The UTC offsets of every zone are precomputed per calendar year out of the pytz transition
+tables (:class:`YearTransitions`). Conversions then boil down to a bisection over a handful
+of transitions and don't go through the pytz localize/normalize machinery.
+"""
+
+import bisect
+import functools
+import re
+from datetime import datetime, time, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+import pytz
+
+EPOCH = datetime(1970, 1, 1)
+
+
+@functools.lru_cache(maxsize=None)
+def get_timezone(zone: str) -> pytz.BaseTzInfo:
+    return pytz.timezone(zone)
+
+
+def to_timestamp(naive_dt: datetime) -> float:
+    """Seconds since the epoch, treating the given naive datetime as UTC."""
+    return (naive_dt - EPOCH).total_seconds()
+
+
+class YearTransitions:
+    """UTC offsets of a zone throughout a calendar year.
+
+    A couple of days around the year boundaries are covered as well, so that converting
+    a time close to new year's eve into another zone is still handled by the same table.
+    """
+
+    def __init__(self, zone: str, year: int):
+        tz = get_timezone(zone)
+        start = datetime(year, 1, 1) - timedelta(days=2)
+        end = datetime(year + 1, 1, 1) + timedelta(days=2)
+
+        transition_times = getattr(tz, "_utc_transition_times", None)
+        if transition_times:
+            i = max(bisect.bisect_right(transition_times, start) - 1, 0)
+            j = bisect.bisect_right(transition_times, end)
+            self._starts = [to_timestamp(t) for t in transition_times[i:j]]
+            infos = [(info[0], info[2]) for info in tz._transition_info[i:j]]  # type: ignore
+        else:
+            # UTC and fixed-offset zones
+            self._starts = [0.0]
+            infos = [(tz.utcoffset(start), tz.tzname(start))]
+
+        # the first entry applies to anything before the window too
+        self._starts[0] = float("-inf")
+        self._offsets = [offset.total_seconds() for offset, _ in infos]
+        self._tzinfos = [timezone(offset, name) for offset, name in infos]
+
+    def _index_at(self, utc_ts: float) -> int:
+        return bisect.bisect_right(self._starts, utc_ts) - 1
+
+    def fromutc(self, utc_ts: float) -> datetime:
+        """Get the wall time in this zone at the given UTC timestamp."""
+        i = self._index_at(utc_ts)
+        return EPOCH.replace(tzinfo=self._tzinfos[i]) + timedelta(
+            seconds=utc_ts + self._offsets[i]
+        )
+
+    def localize(self, wall_dt: datetime) -> float:
+        """Get the UTC timestamp of the given naive wall time in this zone.
+
+        For ambiguous wall times - e.g., when the clocks go back - the earlier instant is
+        returned. Non-existent wall times are interpreted with the offset before the
+        transition.
+
+        >>> berlin = YearTransitions("Europe/Berlin", 2024)
+        >>> def show(utc_ts):
+        ...     return (EPOCH + timedelta(seconds=utc_ts)).strftime("%H:%M UTC")
+        >>> show(berlin.localize(datetime(2024, 10, 27, 2, 30)))  # ambiguous
+        '00:30 UTC'
+        >>> show(berlin.localize(datetime(2024, 3, 31, 2, 30)))  # non-existent
+        '01:30 UTC'
+        >>> new_york = YearTransitions("America/New_York", 2024)
+        >>> show(new_york.localize(datetime(2024, 11, 3, 1, 30)))  # ambiguous
+        '05:30 UTC'
+        """
+        wall_ts = to_timestamp(wall_dt)
+        candidates = [
+            wall_ts - offset
+            for offset in set(self._offsets)
+            if self._offsets[self._index_at(wall_ts - offset)] == offset
+        ]
+        if candidates:
+            return min(candidates)
+
+        # in the gap of a transition - use the offset of the entry before it
+        for k in range(1, len(self._starts)):
+            gap_start = self._starts[k] + self._offsets[k - 1]
+            if gap_start <= wall_ts < self._starts[k] + self._offsets[k]:
+                return wall_ts - self._offsets[k - 1]
+
+        return wall_ts - self._offsets[self._index_at(wall_ts)]
+
+
+@functools.lru_cache(maxsize=1024)
+def get_year_transitions(zone: str, year: int) -> YearTransitions:
+    return YearTransitions(zone, year)
+
+
+def utc_now() -> datetime:
+    return pytz.utc.localize(datetime.utcnow())
+
+
+def convert_utc(utc_ts: float, zones: Iterable[str]) -> List[Tuple[str, datetime]]:
+    """Convert the given UTC timestamp into each one of the given zones, in a single pass.
+
+    Duplicate zones are dropped, the order is preserved.
+    """
+    year = (EPOCH + timedelta(seconds=utc_ts)).year
+    return [
+        (zone, get_year_transitions(zone, year).fromutc(utc_ts))
+        for zone in dict.fromkeys(zones)
+    ]
+
+
+def world_clock(
+    zones: Iterable[str], utc_dt: Optional[datetime] = None
+) -> List[Tuple[str, datetime]]:
+    """Convert the given instant - now by default - into each one of the given zones.
+
+    Duplicate zones are dropped, the order is preserved.
+
+    >>> utc_dt = pytz.utc.localize(datetime(2024, 7, 1, 12))
+    >>> for zone, dt in world_clock(["Europe/Berlin", "Asia/Tokyo", "Europe/Berlin"], utc_dt):
+    ...     print(zone, dt.strftime("%H:%M %Z"))
+    Europe/Berlin 14:00 CEST
+    Asia/Tokyo 21:00 JST
+    """
+    if utc_dt is None:
+        utc_dt = utc_now()
+
+    return convert_utc(utc_dt.timestamp(), zones)
+
+
+def convert_at(
+    wall_dt: datetime, src_zone: str, zones: Iterable[str]
+) -> List[Tuple[str, datetime]]:
+    """Convert the given naive wall time in ``src_zone`` into each one of the given zones.
+
+    The source zone itself is always the first of the returned entries.
+
+    >>> for zone, dt in convert_at(
+    ...     datetime(2024, 3, 31, 15), "Europe/Berlin", ["America/New_York", "Asia/Kolkata"]
+    ... ):
+    ...     print(zone, dt.strftime("%Y-%m-%d %H:%M %Z"))
+    Europe/Berlin 2024-03-31 15:00 CEST
+    America/New_York 2024-03-31 09:00 EDT
+    Asia/Kolkata 2024-03-31 18:30 IST
+    """
+    utc_ts = get_year_transitions(src_zone, wall_dt.year).localize(wall_dt)
+    return convert_utc(utc_ts, [src_zone, *zones])
+
+
+time_re = re.compile(
+    r"^(?P<hour>\d{1,2})(?::(?P<minute>\d{2})\s*(?P<ampm1>am|pm)?|\s*(?P<ampm2>am|pm))"
+    r"(?:\s+(?P<rest>.*))?$",
+    re.IGNORECASE,
+)
+
+
+def parse_time(query_str: str) -> Optional[Tuple[time, str]]:
+    """Parse a query of the form ``<time> [<rest>]``.
+
+    Return None if the query doesn't start with a time.
+
+    >>> parse_time("15:00 Europe/Berlin")
+    (datetime.time(15, 0), 'Europe/Berlin')
+    >>> parse_time("3pm")
+    (datetime.time(15, 0), '')
+    >>> parse_time("9:30am new york")
+    (datetime.time(9, 30), 'new york')
+    >>> parse_time("berlin") is None
+    True
+    """
+    m = time_re.match(query_str.strip())
+    if m is None:
+        return None
+
+    hour = int(m.group("hour"))
+    minute = int(m.group("minute") or 0)
+    ampm = (m.group("ampm1") or m.group("ampm2") or "").lower()
+    if ampm:
+        if not 1 <= hour <= 12:
+            return None
+        hour = hour % 12 + (12 if ampm == "pm" else 0)
+    if hour > 23 or minute > 59:
+        return None
+
+    return time(hour, minute), (m.group("rest") or "").strip()
+
+
+if __name__ == "__main__":
+    import timeit
+
+    zones = pytz.common_timezones
+    wall_dt = datetime(2024, 3, 31, 15)
+
+    def per_item():
+        for zone in zones:
+            pytz.utc.localize(datetime.utcnow()).astimezone(pytz.timezone(zone))
+
+    def batched():
+        world_clock(zones)
+
+    def per_item_at():
+        utc_dt = pytz.timezone("Europe/Berlin").localize(wall_dt)
+        for zone in zones:
+            pytz.timezone(zone).normalize(utc_dt.astimezone(pytz.timezone(zone)))
+
+    def batched_at():
+        convert_at(wall_dt, "Europe/Berlin", zones)
+
+    n = 20
+    print(f"Converting a single instant into {len(zones)} zones, {n} times")
+    for fn in (per_item, batched, per_item_at, batched_at):
+        t = timeit.timeit(fn, number=n) / n
+        print(
+            f"\t{fn.__name__:12}: {t * 1e3:.2f}ms / pass, {t / len(zones) * 1e6:.2f}us / zone"
+        )
@@ -0,0 +1,204 @@
+"""Precomputed search index over the pytz cities and their countries.
+
+The tables are built on first use - not at import time - and persisted as a compact JSON file
+so that subsequent albert sessions only have to load them. Lookups go through a token index
+over city, country and ISO code; only queries without an exact or prefix match fall back to
+fuzzy scoring.
+"""
+
+import bisect
+import json
+from collections import defaultdict
+from functools import cached_property
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pytz
+from thefuzz import process
+
+# bump this when the format of the persisted index changes
+INDEX_VERSION = 1
+
+
+def get_pretty_city_name(city: str) -> str:
+    return "".join(city.split("/")[-1].split("_"))
+
+
+def normalize(s: str) -> str:
+    """Normalize a token or a query string so that they can be compared.
+
+    >>> normalize("New_York")
+    'newyork'
+    >>> normalize(" United States ")
+    'unitedstates'
+    """
+    return "".join(c for c in s.lower() if c not in " _-")
+
+
+def get_tokens(city: str, code: str, country: str) -> List[str]:
+    """Get the tokens that the given city can be looked up with.
+
+    >>> sorted(get_tokens("America/Argentina/Buenos_Aires", "AR", "Argentina"))
+    ['aires', 'america', 'ar', 'argentina', 'buenos', 'buenosaires']
+    """
+    words = [
+        *city.split("/"),
+        *city.split("/")[-1].split("_"),
+        code,
+        country,
+        *country.split(),
+    ]
+    return list({normalize(w) for w in words if normalize(w)})
+
+
+class TimezoneIndex:
+    """Lookup tables for the pytz cities - built or loaded lazily, on first access."""
+
+    def __init__(self, index_path: Optional[Path] = None):
+        self._index_path = index_path
+
+    # persisted tables ------------------------------------------------------------------------
+    @cached_property
+    def _data(self) -> dict:
+        if self._index_path is not None and self._index_path.is_file():
+            try:
+                with open(self._index_path, "r") as f:
+                    data = json.load(f)
+                if (
+                    data["version"] == INDEX_VERSION
+                    and data["tz_version"] == pytz.OLSON_VERSION
+                ):
+                    return data
+            except (ValueError, KeyError):
+                pass
+
+        data = self._build()
+        if self._index_path is not None:
+            with open(self._index_path, "w") as f:
+                json.dump(data, f, separators=(",", ":"))
+
+        return data
+
+    @staticmethod
+    def _build() -> dict:
+        # pycountry is slow to import - only pay for it when the index has to be rebuilt
+        import pycountry
+
+        code_to_country = {
+            c.alpha_2: c.name
+            for c in pycountry.countries
+            if c.alpha_2 in pytz.country_timezones
+        }
+
+        cities = []
+        city_codes = []
+        tokens = defaultdict(list)
+        for code, code_cities in pytz.country_timezones.items():
+            for city in code_cities:
+                for token in get_tokens(city, code, code_to_country.get(code, "")):
+                    tokens[token].append(len(cities))
+                cities.append(city)
+                city_codes.append(code)
+
+        return {
+            "version": INDEX_VERSION,
+            "tz_version": pytz.OLSON_VERSION,
+            "cities": cities,
+            "codes": city_codes,
+            "countries": code_to_country,
+            "tokens": tokens,
+        }
+
+    # derived tables --------------------------------------------------------------------------
+    @cached_property
+    def cities(self) -> List[str]:
+        return self._data["cities"]
+
+    @cached_property
+    def city_to_code(self) -> Dict[str, str]:
+        return dict(zip(self._data["cities"], self._data["codes"]))
+
+    @cached_property
+    def code_to_cities(self) -> Dict[str, List[str]]:
+        code_to_cities = defaultdict(list)
+        for city, code in self.city_to_code.items():
+            code_to_cities[code].append(city)
+        return dict(code_to_cities)
+
+    @cached_property
+    def country_to_code(self) -> Dict[str, str]:
+        return {country: code for code, country in self._data["countries"].items()}
+
+    @cached_property
+    def full_name_to_city(self) -> Dict[str, str]:
+        return {
+            f"{code}{country.replace(' ', '')}{get_pretty_city_name(city)}": city
+            for country, code in self.country_to_code.items()
+            for city in self.code_to_cities[code]
+        }
+
+    @cached_property
+    def _sorted_tokens(self) -> List[str]:
+        return sorted(self._data["tokens"].keys())
+
+    # lookups ---------------------------------------------------------------------------------
+    def lookup(self, query_str: str) -> List[str]:
+        """Return the cities for which the query is a token or a prefix of a token.
+
+        Exact matches come first, followed by prefix matches ordered by token length.
+        """
+        query_str = normalize(query_str)
+        tokens = self._data["tokens"]
+        sorted_tokens = self._sorted_tokens
+
+        prefixed = []
+        i = bisect.bisect_left(sorted_tokens, query_str)
+        while i < len(sorted_tokens) and sorted_tokens[i].startswith(query_str):
+            prefixed.append(sorted_tokens[i])
+            i += 1
+        prefixed.sort(key=len)  # stable - exact match, if any, is first
+
+        cities = self.cities
+        matched = {}
+        for token in prefixed:
+            for city_id in tokens[token]:
+                matched.setdefault(cities[city_id], None)
+
+        return list(matched)
+
+    def country_zones(self, query_str: str) -> List[str]:
+        """Return all the zones of the countries whose ISO code or name match the query.
+
+        Exact matches take precedence over prefix matches on the country name. An empty query
+        - e.g., just the world clock prefix - matches no country.
+        """
+        query_str = normalize(query_str)
+        if not query_str:
+            return []
+
+        codes = [
+            code
+            for country, code in self.country_to_code.items()
+            if query_str in (normalize(code), normalize(country))
+        ]
+        if not codes:
+            codes = [
+                code
+                for country, code in self.country_to_code.items()
+                if normalize(country).startswith(query_str)
+            ]
+
+        return [city for code in codes for city in self.code_to_cities[code]]
+
+    def search(self, query_str: str, limit: int = 8) -> List[str]:
+        """Up to ``limit`` cities matching the query - exact/prefix first, then fuzzy."""
+        matched = self.lookup(query_str)
+        if matched:
+            return matched[:limit]
+
+        full_name_to_city = self.full_name_to_city
+        matched = [
+            full_name_to_city[m[0]]
+            for m in process.extract(query_str, full_name_to_city.keys(), limit=limit)
+        ]
+        return list(dict.fromkeys(matched))
@@ -1,7 +1,7 @@
 """Words: meaning, synonyms, antonyms, examples."""
 
 import concurrent.futures
-import time
+import importlib.util
 import traceback
 from pathlib import Path
 
@@ -27,36 +27,18 @@ data_path = Path(v0.dataLocation()) / "words"
 pd = PyDictionary()
 
 
-# plugin main functions -----------------------------------------------------------------------
-
-
-class KeystrokeMonitor:
-    def __init__(self):
-        super(KeystrokeMonitor, self)
-        self.thres = 0.5  # s
-        self.prev_time = time.time()
-        self.curr_time = time.time()
-
-    def report(self):
-        self.prev_time = time.time()
-        self.curr_time = time.time()
-        self.report = self.report_after_first
-
-    def report_after_first(self):
-        # update prev, curr time
-        self.prev_time = self.curr_time
-        self.curr_time = time.time()
-
-    def triggered(self) -> bool:
-        return self.curr_time - self.prev_time > self.thres
-
-    def reset(self) -> None:
-        self.report = self.report_after_first
-
+# debouncing ----------------------------------------------------------------------------------
+# load debounce module - from the same directory as this file
+dir_ = Path(__file__).absolute().parent
+spec = importlib.util.spec_from_file_location("debounce", dir_ / "debounce.py")
+if spec == None:
+    raise RuntimeError("Couldn't find debounce.py in current dir.")
+debounce = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(debounce)  # type: ignore
 
 # I 'm only sending a request to Google once the user has stopped typing, otherwise Google
 # blocks my IP.
-keys_monitor = KeystrokeMonitor()
+debouncer = debounce.Debouncer(init_delay=0.5, state_path=cache_path / "debounce")
 
 # supplementary functions ---------------------------------------------------------------------
 
@@ -198,7 +180,8 @@ class Plugin(v0.QueryHandler):
             p.mkdir(parents=False, exist_ok=True)
 
     def finalize(self):
-        pass
+        v0.info(f"{md_name} - {debouncer.stats}")
+        debouncer.save()
 
     def handleQuery(self, query) -> None:
         """Hook that is called by albert with *every new keypress*."""  # noqa
@@ -209,7 +192,7 @@ class Plugin(v0.QueryHandler):
 
             # too small request - don't even send it.
             if len(query_str) < 2:
-                keys_monitor.reset()
+                debouncer.cancel()
                 return
 
             if len(query_str.split()) > 1:
@@ -225,8 +208,7 @@ class Plugin(v0.QueryHandler):
                 return
 
             # determine if we can make the request --------------------------------------------
-            keys_monitor.report()
-            if keys_monitor.triggered():
+            if debouncer.wait(query):
                 results.extend(get_items_for_word(query, query_str))
 
                 if not results:
@@ -1,14 +1,18 @@
 """Fetch xkcd comics like a boss."""
 
 from datetime import datetime, timedelta
+from functools import partial
 from pathlib import Path
+from threading import Lock
+from typing import Dict, List, Optional, Tuple
 import json
+import re
 import subprocess
 import sys
 import traceback
 
 import albert as v0
-from fuzzywuzzy import process
+from fuzzywuzzy import fuzz, process, utils
 
 md_name = "Xkcd"
 md_description = "Xkcd Comics Fetcher"
@@ -24,6 +28,72 @@ settings_path = Path(v0.cacheLocation()) / "xkcd"
 last_update_path = settings_path / "last_update"
 xkcd_dict = Path.home() / ".xkcd_dict.json"
 
+# number of comics per page, when there's no query
+page_size = 50
+page_re = re.compile(r"#(\d+)")
+
+
+class XkcdIndex:
+    """The comics of the xkcd-dl dictionary, along with their preprocessed titles.
+
+    The dictionary is only read again when its modification time or size change.
+    """
+
+    def __init__(self, path: Path):
+        self._path = path
+        self._key: Optional[Tuple[int, int]] = None
+        self._lock = Lock()
+        # (number, metadata) - newest first
+        self.comics: List[Tuple[str, dict]] = []
+        # position in comics -> preprocessed title
+        self.titles: Dict[int, str] = {}
+
+    def refresh(self):
+        st = self._path.stat()
+        key = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if key == self._key:
+                return
+
+            with open(self._path, "r", encoding="utf-8") as f:
+                d = json.load(f)
+
+            comics = sorted(
+                d.items(), key=lambda item: int(item[0]) if item[0].isdigit() else 0
+            )
+            comics.reverse()
+            # replace both at once - the queries read them without the lock
+            self.comics, self.titles = comics, {
+                i: utils.full_process(v["description"]) for i, (_, v) in enumerate(comics)
+            }
+            self._key = key
+
+    def page(self, n: int) -> List[Tuple[str, dict]]:
+        """The n-th - 1-based - page of the comics."""
+        return self.comics[(n - 1) * page_size : n * page_size]
+
+    @property
+    def n_pages(self) -> int:
+        return max((len(self.comics) + page_size - 1) // page_size, 1)
+
+    def search(self, query_str: str, limit: int = 20) -> List[Tuple[str, dict]]:
+        comics, titles = self.comics, self.titles
+        query_str = utils.full_process(query_str)
+        if not query_str or not titles:
+            return []
+
+        matched = process.extract(
+            query_str,
+            titles,
+            processor=None,
+            scorer=partial(fuzz.WRatio, full_process=False),
+            limit=limit,
+        )
+        return [comics[m[2]] for m in matched]
+
+
+xkcd_index = XkcdIndex(xkcd_dict)
+
 
 def get_as_item(k: str, v: dict):
     return v0.Item(
@@ -39,6 +109,16 @@ def get_as_item(k: str, v: dict):
     )
 
 
+def get_page_item(query, page: int):
+    return v0.Item(
+        id=f"{md_name}_page",
+        icon=[icon_path],
+        text=f"More comics - page {page} of {xkcd_index.n_pages}",
+        subtext=f"Or type #<page>, e.g., #{page}",
+        completion=f"{query.trigger}#{page}",
+    )
+
+
 def update_date_file():
     now = (datetime.now() - datetime(1970, 1, 1)).total_seconds()
     with open(last_update_path, "w") as f:
@@ -107,22 +187,21 @@ class Plugin(v0.QueryHandler):
             update_xkcd_db()
 
         try:
-            with open(xkcd_dict, "r", encoding="utf-8") as f:
-                d = json.load(f)
-
-            if len(query.string) in [0, 1]:  # Display all items
-                for k, v in d.items():
+            # only reads the dictionary if it changed
+            xkcd_index.refresh()
+
+            query_str = query.string.strip()
+            page_match = page_re.fullmatch(query_str)
+            if len(query_str) in [0, 1] or page_match:  # Display a page of the items
+                page = int(page_match.group(1)) if page_match else 1
+                page = min(max(page, 1), xkcd_index.n_pages)
+                for k, v in xkcd_index.page(page):
                     results.append(get_as_item(k, v))
+                if page < xkcd_index.n_pages:
+                    results.append(get_page_item(query, page + 1))
             else:  # fuzzy search
-                desc_to_item = {item[1]["description"]: item for item in d.items()}
-                matched = process.extract(
-                    query.string.strip(), list(desc_to_item.keys()), limit=20
-                )
-                for m in [elem[0] for elem in matched]:
-                    # bypass a unicode issue - use .get
-                    item = desc_to_item.get(m)
-                    if item:
-                        results.append(get_as_item(*item))
+                for k, v in xkcd_index.search(query_str, limit=20):
+                    results.append(get_as_item(k, v))
 
         except Exception:  # user to report error
             v0.critical(traceback.format_exc())